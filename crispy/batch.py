@@ -0,0 +1,484 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+"""
+Run Quanty calculations without the graphical interface:
+
+    python -m crispy.batch jobs.json -o results.pkl -j 32
+
+The jobs are given in a JSON file, as a list of objects, or as an object
+with a list of "jobs" and the "defaults" shared by all of them:
+
+    {
+        "defaults": {"element": "Ni", "charge": "2+", "symmetry": "Oh",
+                     "experiment": "XAS", "edge": "L2,3 (2p)"},
+        "jobs": [
+            {"temperature": 10},
+            {"temperature": 300, "spectra": ["Isotropic", "Linear Dichroism"]},
+            {"Crystal Field/Initial Hamiltonian/10Dq(3d)": 1.2}
+        ]
+    }
+
+or in a CSV file with one job per row; the cells are parsed as JSON when
+possible, and the empty cells are ignored. The keys are the attributes of
+QuantyCalculation; they are set after the calculation is created from the
+element, charge, symmetry, experiment, and edge. The keys with slashes are
+the paths of Hamiltonian parameters (see set_parameter), and "spectra" is
+the list of spectra to calculate.
+
+Each job runs in its own directory. The window of energies of each job can
+also be split into parts (see crispy.modules.quanty.split), and the spectra
+of each job can be calculated separately; the parts are calculated by
+concurrent Quanty processes. At most the given number of Quanty processes,
+counting the parts, run at the same time. The calculations are written to
+a results file, which can be loaded in the graphical interface.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import argparse
+import csv
+import datetime
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from silx.resources import resource_filename
+
+from .gui.quanty import QuantyCalculation
+from .modules.quanty.renderer import parameter_name, registry
+
+
+# The keys of a job used to create the calculation.
+TREE_KEYS = ('element', 'charge', 'symmetry', 'experiment', 'edge')
+
+# The settings that are otherwise taken from the preferences dialog.
+DEFAULTS = {'verbosity': '0x0000', 'denseBorder': '2000'}
+
+
+def find_executable(name=None):
+    """
+    Return the path of the Quanty executable, looked for in the PATH and in
+    the directory of the executables bundled with Crispy, or None.
+    """
+    if name is None:
+        name = 'Quanty.exe' if sys.platform == 'win32' else 'Quanty'
+
+    directories = os.environ.get('PATH', '').split(os.pathsep)
+    try:
+        directories.append(resource_filename('quanty:bin'))
+    except (IOError, ValueError):
+        pass
+
+    for directory in directories:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+def _parse_cell(value):
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def read_jobs(path):
+    """Read the jobs from a JSON or a CSV file."""
+    if path.lower().endswith('.csv'):
+        with open(path) as fp:
+            return [
+                dict((key, _parse_cell(value))
+                     for key, value in row.items() if value)
+                for row in csv.DictReader(fp)]
+
+    with open(path) as fp:
+        data = json.load(fp)
+
+    if isinstance(data, list):
+        return data
+
+    defaults = data.get('defaults', dict())
+    jobs = list()
+    for job in data['jobs']:
+        merged = dict(defaults)
+        merged.update(job)
+        jobs.append(merged)
+    return jobs
+
+
+def set_parameter(calculation, path, value):
+    """
+    Set the value of a Hamiltonian parameter given by its path, e.g.
+    Atomic/Initial Hamiltonian/F2(3d,3d). The parameter can also be written
+    without Greek letters, e.g. Atomic/Final Hamiltonian/zeta(2p). For the
+    parameters with scale factors, the value is the unscaled value, or a
+    list with the value and the scale factor.
+    """
+    try:
+        term, configuration, name = path.split('/')
+        parameters = calculation.hamiltonianData[term][configuration]
+    except (KeyError, ValueError):
+        raise ValueError('Invalid parameter path: {}.'.format(path))
+
+    for parameter in parameters:
+        if parameter_name(parameter) == parameter_name(name):
+            break
+    else:
+        raise ValueError('Invalid parameter path: {}.'.format(path))
+
+    data = parameters[parameter]
+    if isinstance(data, list) and not isinstance(value, list):
+        value = [value, data[1]]
+    parameters[parameter] = value
+
+
+def create_calculation(job):
+    """Create a calculation from the description of a job."""
+    job = dict(job)
+    kwargs = dict((key, job.pop(key)) for key in TREE_KEYS if key in job)
+    calculation = QuantyCalculation(**kwargs)
+
+    # Make sure that the description is complete; otherwise the calculation
+    # silently uses the first element, edge, etc.
+    for key, value in kwargs.items():
+        if getattr(calculation, key) != value:
+            raise ValueError('Invalid {}: {}.'.format(key, value))
+
+    for key, value in DEFAULTS.items():
+        setattr(calculation, key, value)
+
+    spectra = job.pop('spectra', None)
+    if spectra is not None:
+        if not isinstance(spectra, list):
+            spectra = [spectra]
+        for name in spectra:
+            if name not in calculation.spectra.toCalculate:
+                raise ValueError('Invalid spectrum: {}.'.format(name))
+        calculation.spectra.toCalculateChecked = spectra
+
+    for key, value in job.items():
+        if '/' in key:
+            set_parameter(calculation, key, value)
+        elif key in calculation._defaults:
+            attribute = getattr(calculation, key)
+            if isinstance(attribute, dict) and isinstance(value, dict):
+                attribute.update(value)
+            else:
+                setattr(calculation, key, value)
+        else:
+            raise ValueError('Invalid attribute: {}.'.format(key))
+
+    return calculation
+
+
+def check_templates(calculations):
+    """
+    Check the templates of the calculations against the parameter tree (see
+    TemplateRegistry.validate); this is done once for all of them. Return
+    the calculations, with those that cannot run replaced by ValueError
+    exceptions: their template does not exist, or their input has
+    placeholders without values.
+    """
+    problems = registry.problems
+
+    checked = list()
+    for calculation in calculations:
+        problem = None
+        if not isinstance(calculation, Exception):
+            problem = problems.get(calculation.templateName)
+
+        if problem is not None and problem['absent']:
+            calculation = ValueError('The template {} does not exist.'.format(
+                calculation.templateName))
+        elif problem is not None and problem['missing']:
+            # The placeholders can be missing for other edges only.
+            calculation.renderInput()
+            if calculation.unknownPlaceholders:
+                calculation = ValueError(
+                    'The input has placeholders without values: {}.'.format(
+                        ', '.join(calculation.unknownPlaceholders)))
+        checked.append(calculation)
+    return checked
+
+
+def run_calculation(calculation, executable, directory, parts=1,
+                    split_spectra=False, semaphore=None):
+    """
+    Run a calculation in a directory, and load its spectra. The executable
+    is the path of Quanty, or a list with a command and its arguments, e.g.
+    to run Quanty with mpirun. The standard output is also written to
+    output.txt in the directory. Raise a RuntimeError if Quanty fails, and
+    a ValueError if the input has placeholders without values.
+
+    If parts is larger than one, the window of energies is split into
+    parts, and if split_spectra is True, each of the spectra is calculated
+    separately (see QuantyCalculation.renderParts). The parts run in
+    subdirectories of the directory; their spectra are then merged. Each
+    Quanty process holds the semaphore, if given, while it runs, which
+    bounds the number of processes shared by several calculations;
+    otherwise all the parts run at the same time.
+    """
+    calculation.saveInput(directory)
+    if calculation.unknownPlaceholders:
+        raise ValueError(
+            'The input has placeholders without values: {}.'.format(
+                ', '.join(calculation.unknownPlaceholders)))
+    inputs = calculation.renderParts(parts, split_spectra)
+
+    if isinstance(executable, (list, tuple)):
+        command = list(executable)
+    else:
+        command = [executable]
+    command.append(calculation.baseName + '.lua')
+
+    if len(inputs) == 1:
+        directories = [directory]
+    else:
+        directories = list()
+        for index, (text, _) in enumerate(inputs):
+            partDirectory = os.path.join(directory, 'part{}'.format(index))
+            os.mkdir(partDirectory)
+            calculation.writeInput(partDirectory, text)
+            directories.append(partDirectory)
+
+    if semaphore is None:
+        semaphore = threading.BoundedSemaphore(len(directories))
+
+    def run(partDirectory):
+        outputPath = os.path.join(partDirectory, 'output.txt')
+        with semaphore:
+            with open(outputPath, 'wb') as fp:
+                process = subprocess.Popen(
+                    command, cwd=partDirectory, stdout=fp,
+                    stderr=subprocess.STDOUT)
+            return process.wait()
+
+    calculation.startingTime = datetime.datetime.now()
+    if len(directories) == 1:
+        returnCodes = [run(directory)]
+    else:
+        # The threads wait for a free process, and then for Quanty.
+        pool = ThreadPool(len(directories))
+        try:
+            returnCodes = pool.map(run, directories)
+        finally:
+            pool.close()
+            pool.join()
+    calculation.endingTime = datetime.datetime.now()
+
+    outputs = list()
+    for partDirectory in directories:
+        with open(os.path.join(partDirectory, 'output.txt'), 'rb') as fp:
+            outputs.append(fp.read().decode('utf-8', 'replace'))
+    calculation.output = ''.join(outputs)
+
+    for returnCode in returnCodes:
+        if returnCode != 0:
+            raise RuntimeError(
+                'Quanty has finished unsuccessfully (exit code {}).'.format(
+                    returnCode))
+
+    if len(inputs) > 1:
+        windows = [window for _, window in inputs]
+        calculation.mergeParts(directories, windows, directory)
+
+    calculation.spectra.loadFromDisk(
+        calculation, cache=False, directory=directory)
+    return calculation
+
+
+def run_calculations(calculations, executable, directory, processes=None,
+                     keep=False, callback=None, parts=1,
+                     split_spectra=False):
+    """
+    Run the calculations, each in a new subdirectory of the given directory,
+    with at most the given number of Quanty processes at the same time; each
+    calculation can be split into parts (see run_calculation), which run
+    as separate Quanty processes, and count against the same limit. The
+    directories of the successful
+    calculations are removed, unless keep is True. The calculations can also
+    be exceptions, which are passed through.
+
+    Return a list with each calculation, or the exception raised while
+    running it. The callback, if given, is called with the index of each
+    calculation and its result as soon as it finishes.
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    calculations = list(calculations)
+
+    def run(index):
+        calculation = calculations[index]
+        if isinstance(calculation, Exception):
+            return index, calculation
+
+        jobDirectory = tempfile.mkdtemp(
+            prefix='{:05d}_{}_'.format(index, calculation.baseName),
+            dir=directory)
+        try:
+            result = run_calculation(
+                calculation, executable, jobDirectory, parts, split_spectra,
+                semaphore)
+        except (IOError, OSError, RuntimeError, ValueError) as e:
+            return index, e
+
+        if not keep:
+            shutil.rmtree(jobDirectory, ignore_errors=True)
+        return index, result
+
+    results = [None] * len(calculations)
+    # The threads only wait for the Quanty processes. The semaphore bounds
+    # the number of processes, including the parts of the calculations.
+    processes = max(1, processes)
+    semaphore = threading.BoundedSemaphore(processes)
+    pool = ThreadPool(processes)
+    try:
+        for index, result in pool.imap_unordered(
+                run, range(len(calculations))):
+            results[index] = result
+            if callback is not None:
+                callback(index, result)
+    finally:
+        pool.close()
+        pool.join()
+
+    return results
+
+
+def run_jobs(jobs, executable, directory, processes=None, keep=False,
+             callback=None, parts=1, split_spectra=False):
+    """
+    Create the calculations of the jobs and run them (see run_calculations).
+    The jobs that are not valid, or whose templates are not complete (see
+    check_templates), are reported as ValueError exceptions.
+    """
+    # The calculations are created and checked beforehand, so that invalid
+    # jobs are reported before any calculation runs.
+    calculations = list()
+    for job in jobs:
+        try:
+            calculations.append(create_calculation(job))
+        except ValueError as e:
+            calculations.append(e)
+    calculations = check_templates(calculations)
+
+    return run_calculations(
+        calculations, executable, directory, processes, keep, callback, parts,
+        split_spectra)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m crispy.batch',
+        description='Run Quanty calculations without the interface.')
+    parser.add_argument('jobs', help='JSON or CSV file with the jobs')
+    parser.add_argument(
+        '-o', '--output', default='results.pkl',
+        help='results file, which can be loaded in Crispy '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '-j', '--processes', type=int, default=None,
+        help='maximum number of Quanty processes running at the same '
+             'time, including the parts of the jobs (default: number of '
+             'CPUs)')
+    parser.add_argument(
+        '-p', '--parts', type=int, default=1,
+        help='number of parts of the window of incident energies of each '
+             'job, calculated by concurrent Quanty processes '
+             '(default: %(default)s)')
+    parser.add_argument(
+        '--split-spectra', action='store_true',
+        help='calculate each of the spectra of a job by a concurrent Quanty '
+             'process')
+    parser.add_argument(
+        '-d', '--directory', default=None,
+        help='directory of the jobs (default: next to the results file)')
+    parser.add_argument(
+        '--quanty', default=None, help='path of the Quanty executable')
+    parser.add_argument(
+        '--keep', action='store_true',
+        help='keep the directories of the successful jobs')
+    args = parser.parse_args(argv)
+
+    executable = args.quanty or find_executable()
+    if executable is None:
+        parser.error('the Quanty executable was not found; use --quanty')
+
+    directory = args.directory
+    if directory is None:
+        directory = os.path.splitext(os.path.abspath(args.output))[0] + '_jobs'
+
+    jobs = read_jobs(args.jobs)
+
+    def report(index, result):
+        if isinstance(result, Exception):
+            status = 'failed: {}'.format(result)
+        else:
+            delta = result.endingTime - result.startingTime
+            status = '{} done in {:.2f} s'.format(
+                result.baseName, delta.total_seconds())
+        print('Job {} of {}: {}'.format(index + 1, len(jobs), status))
+        sys.stdout.flush()
+
+    results = run_jobs(jobs, executable, directory, args.processes,
+                       args.keep, report, args.parts, args.split_spectra)
+
+    calculations = [result for result in results
+                    if not isinstance(result, Exception)]
+    for index, calculation in enumerate(calculations):
+        calculation.index = index + 1
+    with open(args.output, 'wb') as fp:
+        pickle.dump(calculations, fp, pickle.HIGHEST_PROTOCOL)
+
+    failed = len(results) - len(calculations)
+    print('{} of {} jobs succeeded; the results are in {}.'.format(
+        len(calculations), len(results), args.output))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
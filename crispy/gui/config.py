@@ -50,6 +50,11 @@ class Config(object):
         return QSettings(
             QSettings.IniFormat, QSettings.UserScope, self.name, 'settings')
 
+    def cacheLocation(self):
+        location = QStandardPaths.GenericCacheLocation
+        root = QStandardPaths.writableLocation(location)
+        return os.path.join(root, self.name)
+
     def removeOldFiles(self):
         configLocation = QStandardPaths.GenericConfigLocation
         root = QStandardPaths.standardLocations(configLocation)[0]
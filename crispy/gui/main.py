@@ -48,6 +48,7 @@ from silx.resources import resource_filename as resourceFileName
 
 from .config import Config
 from .quanty import QuantyDockWidget, QuantyPreferencesDialog
+from .sweep import QuantySweepDialog
 from ..version import version
 
 
@@ -160,6 +161,12 @@ class MainWindow(QMainWindow):
         # Preferences dialog.
         self.preferencesDialog = QuantyPreferencesDialog(parent=self)
 
+        # Parameter sweep dialog.
+        self.sweepDialog = QuantySweepDialog(
+            self.quantyDockWidget, parent=self)
+        self.quantyOpenSweepDialogAction.triggered.connect(
+            self.quantyOpenSweepDialog)
+
     def quantyModuleShow(self):
         self.quantyDockWidget.setVisible(True)
         self.menuModulesQuanty.insertAction(
@@ -175,6 +182,10 @@ class MainWindow(QMainWindow):
     def quantyOpenPreferencesDialog(self):
         self.preferencesDialog.show()
 
+    def quantyOpenSweepDialog(self):
+        self.sweepDialog.show()
+        self.sweepDialog.raise_()
+
     def openAboutDialog(self):
         self.aboutDialog.show()
 
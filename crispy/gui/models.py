@@ -228,6 +228,102 @@ class ResultsModel(QAbstractItemModel):
         self.endResetModel()
 
 
+class JobsModel(QAbstractItemModel):
+    """
+    Model of the queue of calculations. The items are the jobs themselves,
+    which must have a name, a status, and an elapsed method returning the
+    number of seconds since they started, or None.
+    """
+
+    def __init__(self, parent=None):
+        super(JobsModel, self).__init__(parent=parent)
+        self.header = ['Name', 'Status', 'Elapsed']
+        self.modelData = list()
+
+    def index(self, row, column, parent=QModelIndex()):
+        return self.createIndex(row, column)
+
+    def parent(self, index):
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.modelData)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.header)
+
+    def data(self, index, role):
+        if not index.isValid():
+            return
+        item = self.modelData[index.row()]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return item.name
+            elif column == 1:
+                return item.status
+            elif column == 2:
+                elapsed = item.elapsed()
+                if elapsed is None:
+                    return ''
+                minutes, seconds = divmod(int(elapsed), 60)
+                hours, minutes = divmod(minutes, 60)
+                return '{}:{:02d}:{:02d}'.format(hours, minutes, seconds)
+        elif role == Qt.TextAlignmentRole and column == 2:
+            return Qt.AlignRight | Qt.AlignVCenter
+
+    def headerData(self, section, orientation, role):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.header[section]
+
+    def flags(self, index):
+        if not index.isValid():
+            return
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def appendItems(self, items):
+        if not isinstance(items, list):
+            items = [items]
+        row = self.rowCount()
+        self.beginInsertRows(QModelIndex(), row, row + len(items) - 1)
+        self.modelData.extend(items)
+        self.endInsertRows()
+
+    def getItem(self, index):
+        return self.modelData[index.row()]
+
+    def getSelectedItems(self, indexes):
+        rows = sorted({index.row() for index in indexes})
+        return [self.modelData[row] for row in rows]
+
+    def updateItem(self, item):
+        try:
+            row = self.modelData.index(item)
+        except ValueError:
+            return
+        first = self.index(row, 0)
+        last = self.index(row, self.columnCount() - 1)
+        self.dataChanged.emit(first, last)
+
+    def updateElapsed(self):
+        if not self.modelData:
+            return
+        column = self.columnCount() - 1
+        first = self.index(0, column)
+        last = self.index(self.rowCount() - 1, column)
+        self.dataChanged.emit(first, last)
+
+    def removeItems(self, items):
+        for item in items:
+            try:
+                row = self.modelData.index(item)
+            except ValueError:
+                continue
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.modelData[row]
+            self.endRemoveRows()
+
+
 class HamiltonianItem(object):
     """Class implementing a tree item to be used in a tree model."""
 
@@ -32,21 +32,27 @@ __date__ = '01/02/2019'
 
 import copy
 import datetime
+import functools
 import gzip
+import itertools
 import json
-import glob
 import numpy as np
 import os
 try:
     import cPickle as pickle
 except ImportError:
     import pickle
+import multiprocessing
 import re
+import shutil
 import subprocess
 import sys
+import tempfile
+import time
 
 from PyQt5.QtCore import (
-    QItemSelectionModel, QProcess, Qt, QPoint, QStandardPaths, QSize)
+    QItemSelectionModel, QObject, QProcess, Qt, QPoint, QStandardPaths, QSize,
+    QThread, QTimer, pyqtSignal)
 from PyQt5.QtGui import QIcon, QFontDatabase
 from PyQt5.QtWidgets import (
     QDockWidget, QFileDialog, QAction, QMenu, QWidget,
@@ -55,44 +61,211 @@ from PyQt5.uic import loadUi
 from silx.resources import resource_filename as resourceFileName
 
 from .config import Config
-from .models import HamiltonianModel, ResultsModel, SpectraModel
-from ..utils.broaden import broaden
+from .models import (
+    HamiltonianModel, JobsModel, ResultsModel, SpectraModel)
+from ..modules.quanty.cache import ResultCache
+from ..modules.quanty.parser import (
+    OutputParser, SpecWatcher, load_specs as loadSpecs)
+from ..modules.quanty.renderer import (
+    configuration_suffix as configurationSuffix, get_template as getTemplate,
+    has_scale_factor as hasScaleFactor, parameter_name as parameterName,
+    term_suffix as termSuffix)
+from ..modules.quanty.split import (
+    split_window as splitWindow, stitch_spec as stitchSpec)
+from ..utils.broaden import (
+    RealTransform, broaden, broaden_variable, energy_dependent_fwhm,
+    evaluate_sticks, lorentzian_difference)
 from ..utils.odict import odict
 from ..utils.profiling import timeit # noqa
 from ..version import version
 
+# The trapz function of NumPy was renamed to trapezoid in version 2.0.
+try:
+    trapezoid = np.trapezoid
+except AttributeError:
+    trapezoid = np.trapz
+
+
+class Axis(object):
+    """
+    Uniform axis, described by its first value, the step and the number of
+    points. The values are calculated only when they are needed, e.g. for
+    plotting; shifting the axis changes only its first value.
+    """
+
+    __slots__ = ('start', 'step', 'size')
+
+    def __init__(self, start, step, size):
+        self.start = float(start)
+        self.step = float(step)
+        self.size = int(size)
+
+    @classmethod
+    def linspace(cls, start, stop, num):
+        """Create the axis equivalent to np.linspace(start, stop, num)."""
+        if num > 1:
+            step = (stop - start) / (num - 1)
+        else:
+            step = 0.0
+        return cls(start, step, num)
+
+    def __getstate__(self):
+        return (self.start, self.step, self.size)
+
+    def __setstate__(self, state):
+        self.start, self.step, self.size = state
+
+    def __repr__(self):
+        return 'Axis(start={}, step={}, size={})'.format(
+            self.start, self.step, self.size)
+
+    def __eq__(self, other):
+        if not isinstance(other, Axis):
+            return NotImplemented
+        return self.__getstate__() == other.__getstate__()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash(self.__getstate__())
+
+    def __len__(self):
+        return self.size
+
+    def __add__(self, value):
+        return Axis(self.start + value, self.step, self.size)
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.start + self.step * np.arange(self.size)
+        if dtype is not None:
+            values = values.astype(dtype)
+        return values
+
+    @property
+    def shape(self):
+        return (self.size, )
+
+    @property
+    def stop(self):
+        return self.start + self.step * (self.size - 1)
+
+    def min(self):
+        return min(self.start, self.stop)
+
+    def max(self):
+        return max(self.start, self.stop)
+
+    def reversed(self):
+        return Axis(self.stop, -self.step, self.size)
+
+
+def limits(values):
+    """Return the minimum, the maximum and the size of an axis or array."""
+    if values is None:
+        return None
+    return (values.min(), values.max(), values.shape[0])
+
 
 class Spectrum(object):
+    """
+    Base class of the spectra. The axes can be arrays or uniform Axis
+    objects. The shifts of the axes and the scale factor of the intensities
+    are stored, and applied only when the values are read.
+    """
+
+    __slots__ = (
+        'xLabel', 'yLabel', 'name', 'shortName', 'legend',
+        '_x', '_xShift', '_xLimits', '_y', '_yLimits', '_factor')
 
     _defaults = {
         'xLabel': None,
         'yLabel': None,
-        'xScale': None,
-        'yScale': None,
-        'axesScale': None,
-        'origin': None,
         'name': None,
         'shortName': None,
         'legend': None,
     }
 
     def __init__(self, x, y, **kwargs):
+        self.reset()
         self.x = x
         self.y = y
-        self.__dict__.update(self._defaults)
-        self.__dict__.update(kwargs)
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def reset(self):
+        for key, value in self._defaults.items():
+            setattr(self, key, value)
+        for key in self.slots():
+            if key.startswith('_'):
+                setattr(self, key, None)
+        self._xShift = 0.0
+        self._factor = 1.0
+
+    @classmethod
+    def slots(cls):
+        slots = list()
+        for klass in cls.__mro__:
+            slots.extend(getattr(klass, '__slots__', ()))
+        return slots
+
+    def __getstate__(self):
+        state = dict()
+        for key in self.slots():
+            try:
+                state[key] = getattr(self, key)
+            except AttributeError:
+                pass
+        return state
+
+    def __setstate__(self, state):
+        self.reset()
+        for key, value in state.items():
+            try:
+                setattr(self, key, value)
+            except AttributeError:
+                # Attributes of the spectra pickled by older versions that
+                # are now read-only properties.
+                pass
+
+    @property
+    def xAxis(self):
+        """The shifted x axis, without calculating its values."""
+        if self._x is None or not self._xShift:
+            return self._x
+        return self._x + self._xShift
+
+    @property
+    def x(self):
+        if self._x is None:
+            return None
+        return np.asarray(self.xAxis)
+
+    @x.setter
+    def x(self, values):
+        self._x = values
+        self._xShift = 0.0
+        self._xLimits = None
 
     @property
     def xScale(self):
-        if self.x is None:
+        if self._x is None:
             return None
-        return np.abs(self.x.min() - self.x.max()) / self.x.shape[0]
+        if self._xLimits is None:
+            self._xLimits = limits(self._x)
+        xMin, xMax, size = self._xLimits
+        return np.abs(xMin - xMax) / size
 
     @property
     def yScale(self):
-        if self.y is None:
+        yLimits = self.yLimits
+        if yLimits is None:
             return None
-        return np.abs(self.y.min() - self.y.max()) / self.y.shape[0]
+        yMin, yMax, size = yLimits
+        return np.abs(yMin - yMax) / size
 
     @property
     def axesScale(self):
@@ -100,24 +273,29 @@ class Spectrum(object):
 
     @property
     def origin(self):
-        if self.x is None or self.y is None:
+        if self._x is None or self.yLimits is None:
             return (None, None)
-        return (self.x.min(), self.y.min())
+        if self._xLimits is None:
+            self._xLimits = limits(self._x)
+        return (self._xLimits[0] + self._xShift, self.yLimits[0])
 
 
 class Spectrum1D(Spectrum):
 
-    def __init__(self, x, y, **kwargs):
-        super(Spectrum1D, self).__init__(x, y, **kwargs)
-        self._y = y
+    __slots__ = ()
 
     @property
     def y(self):
-        return self._y
+        if self._y is None or self._factor == 1.0:
+            return self._y
+        return self._y * self._factor
 
     @y.setter
     def y(self, values):
+        self._factor = 1.0
+        self._yLimits = None
         if values is None:
+            self._y = None
             return
         # Check for very small values.
         valuesMax = np.max(np.abs(values))
@@ -125,33 +303,63 @@ class Spectrum1D(Spectrum):
             values = np.zeros_like(values)
         self._y = values
 
-    def broaden(self, broadenings):
+    @property
+    def yLimits(self):
+        if self._y is None:
+            return None
+        if self._yLimits is None:
+            self._yLimits = limits(self._y)
+        yMin, yMax, size = self._yLimits
+        yMin, yMax = sorted((yMin * self._factor, yMax * self._factor))
+        return (yMin, yMax, size)
+
+    def broaden(self, broadenings, transform=None):
         for kind in broadenings:
             if kind == 'gaussian':
                 fwhm, = broadenings[kind]
                 fwhm = fwhm / self.xScale
+            elif kind == 'voigt':
+                # The FWHM is a (Gaussian, Lorentzian) pair.
+                fwhm, = broadenings[kind]
+                fwhm = np.array(fwhm, dtype=np.float64) / self.xScale
+            elif kind == 'lorentzian':
+                # The widths follow the convention used for the Lorentzian
+                # broadening of the calculation, and can be energy dependent.
+                widths, = broadenings[kind]
+                if len(widths) > 1:
+                    fwhm = energy_dependent_fwhm(self.x, widths) / self.xScale
+                    self.y = broaden_variable(self.y, fwhm, kind)
+                    continue
+                fwhm = float(widths[0]) / self.xScale
+            else:
+                continue
+
+            # Use the stored transform of the spectrum, if available.
+            if transform is not None and len(broadenings) == 1:
+                self.y = transform.broaden(fwhm, kind)
+            else:
                 self.y = broaden(self.y, fwhm, kind)
 
     def shift(self, values):
-        if self.x is None or values is None:
+        if self._x is None or values is None:
             return
         value, _ = values
-        self.x = self.x + value
+        self._xShift += value
 
     def scale(self, value):
-        if self.y is None or value is None:
+        if self._y is None or value is None:
             return
-        self.y = self.y * value
+        self._factor *= value
 
     def normalize(self, value):
-        if value == 'None' or self.y is None:
+        if value == 'None' or self._y is None:
             return
         elif value == 'Maximum':
-            yMax = np.abs(self.y).max()
-            self.y = self.y / yMax
+            yMax = np.abs(self._y).max()
+            self._factor /= np.abs(self._factor) * yMax
         elif value == 'Area':
-            area = np.abs(np.trapz(self.y, self.x))
-            self.y = self.y / area
+            area = np.abs(trapezoid(self._y, self.x))
+            self._factor /= np.abs(self._factor) * area
 
     def plot(self, plotWidget=None):
         if plotWidget is None:
@@ -163,38 +371,107 @@ class Spectrum1D(Spectrum):
 
 class Spectrum2D(Spectrum):
 
+    __slots__ = ('_yShift', '_z')
+
     def __init__(self, x, y, z, **kwargs):
         super(Spectrum2D, self).__init__(x, y, **kwargs)
         self.z = z
 
-    def broaden(self, broadenings):
-        if self.z is None or broadenings is None:
+    def reset(self):
+        super(Spectrum2D, self).reset()
+        self._yShift = 0.0
+
+    @property
+    def yAxis(self):
+        """The shifted y axis, without calculating its values."""
+        if self._y is None or not self._yShift:
+            return self._y
+        return self._y + self._yShift
+
+    @property
+    def y(self):
+        if self._y is None:
+            return None
+        return np.asarray(self.yAxis)
+
+    @y.setter
+    def y(self, values):
+        self._y = values
+        self._yShift = 0.0
+        self._yLimits = None
+
+    @property
+    def yLimits(self):
+        if self._y is None:
+            return None
+        if self._yLimits is None:
+            self._yLimits = limits(self._y)
+        yMin, yMax, size = self._yLimits
+        return (yMin + self._yShift, yMax + self._yShift, size)
+
+    @property
+    def z(self):
+        if self._z is None or self._factor == 1.0:
+            return self._z
+        return self._z * self._factor
+
+    @z.setter
+    def z(self, values):
+        self._z = values
+        self._factor = 1.0
+
+    def broaden(self, broadenings, transform=None):
+        if self._z is None or broadenings is None:
             return
+
         for kind in broadenings:
             if kind == 'gaussian':
                 xFwhm, yFwhm = broadenings[kind]
-                xFwhm = xFwhm / self.xScale
-                yFwhm = yFwhm / self.yScale
-                self.z = broaden(self.z, [xFwhm, yFwhm], kind)
+                fwhm = [xFwhm / self.xScale, yFwhm / self.yScale]
+            elif kind == 'voigt':
+                # The FWHM of each axis is a (Gaussian, Lorentzian) pair.
+                xFwhm, yFwhm = broadenings[kind]
+                fwhm = [np.array(xFwhm, dtype=np.float64) / self.xScale,
+                        np.array(yFwhm, dtype=np.float64) / self.yScale]
+            elif kind == 'lorentzian':
+                # Only constant widths are supported for images.
+                xWidths, yWidths = broadenings[kind]
+                if len(xWidths) > 1 or len(yWidths) > 1:
+                    raise ValueError(
+                        'The Lorentzian broadening of 2D spectra cannot be '
+                        'energy dependent.')
+                # Voigt kernels without a Gaussian part are used, because,
+                # unlike the Lorentzian ones, they allow a zero width along
+                # one of the axes.
+                kind = 'voigt'
+                fwhm = [[0.0, float(xWidths[0]) / self.xScale],
+                        [0.0, float(yWidths[0]) / self.yScale]]
+            else:
+                continue
+
+            if transform is not None and len(broadenings) == 1:
+                self.z = transform.broaden(fwhm, kind)
+            else:
+                self.z = broaden(self.z, fwhm, kind, separable=True)
 
     def shift(self, values):
-        if self.x is None or self.y is None or values is None:
+        if self._x is None or self._y is None or values is None:
             return
         xValue, yValue = values
-        self.x = self.x + xValue
-        self.y = self.y + yValue
+        self._xShift += xValue
+        self._yShift += yValue
 
     def scale(self, value):
-        if self.z is None or value is None:
+        if self._z is None or value is None:
             return
-        self.z = self.z * value
+        self._factor *= value
 
     def normalize(self, value):
-        if value == 'None' or self.z is None:
+        if value == 'None' or self._z is None:
             return
         elif value == 'Maximum':
-            zMax = np.abs(self.z).max()
-            self.z = self.z / zMax
+            zMax = np.abs(self._z).max()
+            self._factor /= np.abs(self._factor) * zMax
 
     def plot(self, plotWidget=None):
         if plotWidget is None:
@@ -206,12 +483,258 @@ class Spectrum2D(Spectrum):
             reset=False)
 
 
+class SpectrumStack(object):
+    """
+    Spectra calculated on the same grid, stored as the rows of a single
+    contiguous array, with shape (spectra, points) for 1D spectra and
+    (spectra, y points, x points) for 2D spectra, as the z values of
+    Spectrum2D. The axes are shared by all rows. As for the individual
+    spectra, the shifts and the scale factors are applied only when the
+    values are read.
+    """
+
+    __slots__ = (
+        'names', 'shortNames', 'xLabel', 'yLabel',
+        '_x', '_xShift', '_y', '_yShift', '_data', '_factors')
+
+    _defaults = {
+        'xLabel': None,
+        'yLabel': None,
+    }
+
+    def __init__(self, x, data, y=None, names=None, shortNames=None,
+                 **kwargs):
+        for key, value in self._defaults.items():
+            setattr(self, key, value)
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+        self._x = x
+        self._xShift = 0.0
+        self._y = y
+        self._yShift = 0.0
+
+        data = np.asarray(data)
+        if data.ndim not in (2, 3):
+            raise ValueError('The data must be a 2D or a 3D array.')
+
+        # Check for very small values.
+        size = data.shape[0]
+        valuesMax = np.abs(data.reshape(size, -1)).max(axis=1)
+        small = valuesMax < np.finfo(np.float32).eps
+        if small.any():
+            data = data.copy()
+            data[small] = 0.0
+
+        self._data = data
+        self._factors = np.ones(size)
+
+        if names is None:
+            names = [None] * size
+        if shortNames is None:
+            shortNames = [None] * size
+        self.names = list(names)
+        self.shortNames = list(shortNames)
+
+    @classmethod
+    def fromSpectra(cls, spectra):
+        """Create a stack from a list of spectra sharing the same axes."""
+        first = spectra[0]
+        names = [spectrum.name for spectrum in spectra]
+        shortNames = [spectrum.shortName for spectrum in spectra]
+        if isinstance(first, Spectrum2D):
+            data = np.stack([spectrum.z for spectrum in spectra])
+            y = first.yAxis
+        else:
+            data = np.stack([spectrum.y for spectrum in spectra])
+            y = None
+        return cls(first.xAxis, data, y, names, shortNames,
+                   xLabel=first.xLabel, yLabel=first.yLabel)
+
+    def __getstate__(self):
+        return dict((key, getattr(self, key)) for key in self.__slots__)
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def __len__(self):
+        return self._data.shape[0]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, key):
+        """
+        Return a spectrum, given its index or its name. The spectrum is a
+        view of a row of the stack; no data is copied.
+        """
+        if not isinstance(key, (int, np.integer)):
+            key = self.names.index(key)
+
+        kwargs = {
+            'name': self.names[key],
+            'shortName': self.shortNames[key],
+            'xLabel': self.xLabel,
+            'yLabel': self.yLabel,
+        }
+
+        if self.ndim == 1:
+            spectrum = Spectrum1D(None, None, **kwargs)
+            spectrum._y = self._data[key]
+        else:
+            spectrum = Spectrum2D(None, None, None, **kwargs)
+            spectrum._y = self._y
+            spectrum._yShift = self._yShift
+            spectrum._z = self._data[key]
+        spectrum._x = self._x
+        spectrum._xShift = self._xShift
+        spectrum._factor = self._factors[key]
+        return spectrum
+
+    @property
+    def ndim(self):
+        """The number of dimensions of the spectra."""
+        return self._data.ndim - 1
+
+    @property
+    def xAxis(self):
+        if not self._xShift:
+            return self._x
+        return self._x + self._xShift
+
+    @property
+    def x(self):
+        return np.asarray(self.xAxis)
+
+    @property
+    def yAxis(self):
+        if self._y is None or not self._yShift:
+            return self._y
+        return self._y + self._yShift
+
+    @property
+    def y(self):
+        if self._y is None:
+            return None
+        return np.asarray(self.yAxis)
+
+    @property
+    def data(self):
+        """The raw data, i.e. without the scale factors."""
+        return self._data
+
+    @property
+    def values(self):
+        """The data multiplied by the scale factors of the rows."""
+        if np.all(self._factors == 1.0):
+            return self._data
+        shape = (-1, ) + (1, ) * self.ndim
+        return self._data * self._factors.reshape(shape)
+
+    def broaden(self, broadenings, transform=None):
+        """
+        Broaden all the spectra. The transform, if given, is the Fourier
+        transform of the data along the axes of the spectra.
+        """
+        if self.ndim == 1:
+            spectrum = Spectrum1D(self.xAxis, self._data)
+            spectrum.broaden(broadenings, transform)
+            self._data = spectrum.y
+        elif transform is not None and len(broadenings) == 1:
+            # Use a spectrum to convert the widths to units of the grid.
+            spectrum = Spectrum2D(self.xAxis, self.yAxis, self._data[0])
+            spectrum.broaden(broadenings, transform)
+            self._data = spectrum.z
+        else:
+            rows = list()
+            for row in self._data:
+                spectrum = Spectrum2D(self.xAxis, self.yAxis, row)
+                spectrum.broaden(broadenings)
+                rows.append(spectrum.z)
+            self._data = np.stack(rows)
+
+    def shift(self, values):
+        if values is None:
+            return
+        xValue, yValue = values
+        self._xShift += xValue
+        if self.ndim == 2:
+            self._yShift += yValue
+
+    def scale(self, value):
+        if value is None:
+            return
+        self._factors = self._factors * value
+
+    def normalize(self, value):
+        if value == 'None':
+            return
+        elif value == 'Maximum':
+            norms = np.abs(self._data.reshape(len(self), -1)).max(axis=1)
+        elif value == 'Area' and self.ndim == 1:
+            norms = np.abs(trapezoid(self._data, self.x, axis=-1))
+        else:
+            return
+        # Leave the spectra that are zero unchanged.
+        norms = np.where(norms > 0.0, norms, 1.0)
+        self._factors = np.sign(self._factors) / norms
+
+    def plot(self, plotWidget=None, names=None, prefix=None):
+        """Plot the spectra with the given names, or all of them."""
+        for spectrum in self:
+            if names is not None and spectrum.name not in names:
+                continue
+            if prefix is not None:
+                spectrum.legend = '{}-{}'.format(prefix, spectrum.shortName)
+            spectrum.plot(plotWidget)
+
+
+class StickSpectrum(object):
+    """
+    Spectrum given by the poles of the Green's function, i.e. a list of
+    energies and weights (transition strengths). Unlike the spectra
+    calculated by Quanty, it can be evaluated on any energy grid and with
+    any broadening.
+    """
+
+    _defaults = {
+        'name': None,
+        'shortName': None,
+    }
+
+    def __init__(self, energies, weights, **kwargs):
+        self.energies = np.asarray(energies, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.__dict__.update(self._defaults)
+        self.__dict__.update(kwargs)
+
+    def evaluate(self, x, lorentzian, gaussian=None):
+        """
+        Evaluate the spectrum on the x grid. The Lorentzian broadening
+        follows the convention of the calculation, and can be energy
+        dependent. If a Gaussian FWHM is given, Voigt line shapes are used.
+        """
+        values = np.asarray(x)
+        fwhm = energy_dependent_fwhm(values, lorentzian, self.energies)
+        if gaussian:
+            fwhm = np.column_stack((np.full(fwhm.shape, gaussian), fwhm))
+            y = evaluate_sticks(
+                values, self.energies, self.weights, fwhm, 'voigt')
+        else:
+            y = evaluate_sticks(
+                values, self.energies, self.weights, fwhm, 'lorentzian')
+        return Spectrum1D(x, y, name=self.name, shortName=self.shortName)
+
+
 class QuantySpectra(object):
 
     _defaults = {
         'scale': 1.0,
         'shift': [0.0, 0.0],
         'broadenings': dict(),
+        'appliedLorentzian': None,
         'normalization': 'None',
         'toCalculateChecked': None,
         '_toCalculateChecked': None,
@@ -220,6 +743,23 @@ class QuantySpectra(object):
         'toPlot': None,
     }
 
+    suffixes = {
+        'Isotropic': 'iso',
+        'Circular Dichroism (R-L)': 'cd',
+        'Right Polarized (R)': 'r',
+        'Left Polarized (L)': 'l',
+        'Linear Dichroism (V-H)': 'ld',
+        'Vertical Polarized (V)': 'v',
+        'Horizontal Polarized (H)': 'h',
+    }
+
+    # The dichroic spectra are not calculated by Quanty, but derived from
+    # their components as the difference of the first and the second one.
+    components = {
+        'cd': ('r', 'l'),
+        'ld': ('v', 'h'),
+    }
+
     def __init__(self):
         self.__dict__.update(self._defaults)
 
@@ -267,109 +807,348 @@ class QuantySpectra(object):
     def toPlotChecked(self, values):
         self._toPlotChecked = values
 
+    # The post-processing stages, in the order in which they are applied.
+    stages = ('broaden', 'scale', 'shift', 'normalize')
+
+    def __getstate__(self):
+        # The transform and the intermediate results of the processing can
+        # be recalculated; don't store them.
+        state = self.__dict__.copy()
+        state.pop('_transform', None)
+        state.pop('_stages', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault('appliedLorentzian', None)
+        # The results saved by earlier versions store the spectra as lists.
+        raw = getattr(self, 'raw', None)
+        if isinstance(raw, list) and raw:
+            self.raw = SpectrumStack.fromSpectra(raw)
+            self.process()
+
+    def transform(self):
+        """
+        Return the Fourier transform of the raw spectra. The transform is
+        calculated only once, so that changing the broadening costs only a
+        kernel transform and an inverse FFT.
+        """
+        transform = getattr(self, '_transform', None)
+        if transform is None:
+            if self.raw.ndim == 1:
+                axes = (-1, )
+            else:
+                axes = (-2, -1)
+            transform = RealTransform(self.raw.data, axes=axes)
+            self._transform = transform
+        return transform
+
+    def parameters(self, stage):
+        """Return the parameters that determine the output of a stage."""
+        if stage == 'broaden':
+            return self.postBroadenings()
+        elif stage == 'scale':
+            return self.scale
+        elif stage == 'shift':
+            return list(self.shift)
+        elif stage == 'normalize':
+            return self.normalization
+
+    def postBroadenings(self, broadenings=None):
+        """
+        Return the broadenings applied to the raw spectra, given those
+        requested, by default the broadenings of the spectra.
+
+        The 'lorentzian' entry contains the total Lorentzian broadening of
+        each axis, following the convention of the calculation. Only the
+        part that was not already applied by Quanty, i.e. the difference
+        with appliedLorentzian, is added to the spectra; the axes for which
+        appliedLorentzian is None are not broadened further. If this part
+        is constant, it is combined with the Gaussian broadening into a
+        Voigt profile. A ValueError is raised if the requested broadening
+        cannot be obtained from the raw spectra.
+        """
+        if broadenings is None:
+            broadenings = self.broadenings
+        broadenings = copy.deepcopy(broadenings)
+
+        widths = broadenings.pop('lorentzian', None)
+        if widths is None:
+            return broadenings
+
+        applied = self.appliedLorentzian
+        if applied is None:
+            applied = [[0.0]] * len(widths)
+
+        axes = (self.raw.x, self.raw.y)
+        widths = [[0.0] if appliedValues is None
+                  else lorentzian_difference(axis, values, appliedValues)
+                  for axis, values, appliedValues
+                  in zip(axes, widths, applied)]
+
+        if all(values == [0.0] for values in widths):
+            return broadenings
+
+        constant = all(len(values) == 1 for values in widths)
+        if not constant and len(widths) > 1:
+            raise ValueError(
+                'The Lorentzian broadening of 2D spectra cannot be energy '
+                'dependent.')
+
+        gaussian = broadenings.pop('gaussian', None)
+        if gaussian is not None and constant:
+            broadenings['voigt'] = tuple(
+                (fwhm, values[0]) for fwhm, values in zip(gaussian, widths))
+        else:
+            if gaussian is not None:
+                broadenings['gaussian'] = gaussian
+            broadenings['lorentzian'] = tuple(widths)
+
+        return broadenings
+
+    def runStage(self, stage, stack):
+        """
+        Apply a processing stage to a stack of spectra and return the
+        result. The input stack is not modified. The stack methods replace
+        the arrays instead of changing them in place, therefore a shallow
+        copy is sufficient; e.g. a shift changes only the offset of the
+        energy axis, while the data is shared with the input.
+        """
+        parameters = self.parameters(stage)
+
+        if stage == 'broaden' and not parameters:
+            return stack
+        elif stage == 'scale' and parameters == self._defaults['scale']:
+            return stack
+        elif stage == 'shift' and parameters == self._defaults['shift']:
+            return stack
+        elif stage == 'normalize' and parameters == 'None':
+            return stack
+
+        stack = copy.copy(stack)
+
+        if stage == 'broaden':
+            stack.broaden(parameters, self.transform())
+        else:
+            getattr(stack, stage)(parameters)
+
+        return stack
+
+    def recomputedStages(self):
+        """Return the stages that were recomputed by the last processing."""
+        return list(getattr(self, '_recomputed', list()))
+
     def process(self):
+        """
+        Process the raw spectra. The output of each stage is cached together
+        with the parameters used to calculate it; a stage is recomputed only
+        if its parameters, or those of an earlier stage, have changed.
+        """
         try:
-            self.processed = copy.deepcopy(self.raw)
+            stack = self.raw
         except AttributeError:
             return
 
-        for spectrum in self.processed:
-            if self.broadenings:
-                spectrum.broaden(self.broadenings)
-            if self.scale != self._defaults['scale']:
-                spectrum.scale(self.scale)
-            if self.shift != self._defaults['shift']:
-                spectrum.shift(self.shift)
-            spectrum.normalize(self.normalization)
+        try:
+            cache = self._stages
+        except AttributeError:
+            cache = self._stages = dict()
+
+        self._recomputed = list()
+        dirty = False
+        for stage in self.stages:
+            parameters = self.parameters(stage)
+            try:
+                cachedParameters, output = cache[stage]
+            except KeyError:
+                dirty = True
+            else:
+                dirty = dirty or cachedParameters != parameters
+
+            if dirty:
+                output = self.runStage(stage, stack)
+                cache[stage] = (parameters, output)
+                self._recomputed.append(stage)
+
+            stack = output
 
-    def loadFromDisk(self, calculation):
+        self.processed = stack
+
+    def shortName(self, spectrumName):
+        suffix = self.suffixes[spectrumName]
+        if len(suffix) > 2:
+            return suffix.title()
+        else:
+            return suffix.upper()
+
+    def reset(self):
+        self._transform = None
+        self._stages = dict()
+
+    def specPath(self, calculation, spectrumName, directory=None):
+        suffix = self.suffixes[spectrumName]
+        path = '{}_{}.spec'.format(calculation.baseName, suffix)
+        if directory is not None:
+            path = os.path.join(directory, path)
+        return path
+
+    def specPaths(self, calculation, directory=None):
         """
-        Read the spectra from the files generated by Quanty and store them
-        as a list of spectum objects.
+        Return the paths of the files with the spectra to plot, in the given
+        directory, or relative to the current directory. The dichroic
+        spectra are derived from their components and have no files.
         """
+        paths = list()
+        for spectrumName in self.toPlot:
+            if self.suffixes[spectrumName] not in self.components:
+                paths.append(
+                    self.specPath(calculation, spectrumName, directory))
+        return paths
 
-        suffixes = {
-            'Isotropic': 'iso',
-            'Circular Dichroism (R-L)': 'cd',
-            'Right Polarized (R)': 'r',
-            'Left Polarized (L)': 'l',
-            'Linear Dichroism (V-H)': 'ld',
-            'Vertical Polarized (V)': 'v',
-            'Horizontal Polarized (H)': 'h',
-        }
+    def loadFromDisk(self, calculation, cache=True, spectra=None,
+                     directory=None):
+        """
+        Read the spectra from the files generated by Quanty in the given
+        directory, and store them in a stack of spectra. The files are read
+        concurrently. If cache is True, the parsed files are also stored in
+        binary sidecars, which are used when the files are read again.
+
+        The spectra can also be read beforehand, e.g. in a background
+        thread or while the calculation is running, and passed as a
+        dictionary indexed by the paths of the files in the directory. Only
+        the spectra that are available are loaded.
+        """
+        self.reset()
 
-        self.raw = list()
+        if spectra is None:
+            paths = self.specPaths(calculation, directory)
+            spectra = dict(zip(paths, loadSpecs(paths, cache)))
+
+        available = set()
         for spectrumName in self.toPlot:
-            suffix = suffixes[spectrumName]
-            path = '{}_{}.spec'.format(calculation.baseName, suffix)
+            if self.specPath(calculation, spectrumName, directory) in spectra:
+                available.add(self.suffixes[spectrumName])
+
+        # The dichroic spectra require both their components.
+        for suffix, components in self.components.items():
+            if all(component in available for component in components):
+                available.add(suffix)
+
+        names = [name for name in self.toPlot
+                 if self.suffixes[name] in available]
+        shortNames = [self.shortName(name) for name in names]
+        suffixes = [self.suffixes[name] for name in names]
+
+        data = None
+        for index, spectrumName in enumerate(names):
+            if suffixes[index] in self.components:
+                continue
 
-            try:
-                data = np.loadtxt(path, skiprows=5)
-            except (OSError, IOError) as e:
-                raise e
+            values = spectra[
+                self.specPath(calculation, spectrumName, directory)]
+            if calculation.experiment in ['XAS', 'XPS', 'XES']:
+                values = values[:, 0]
 
-            rows, columns = data.shape
+            if data is None:
+                data = np.empty((len(names), ) + values.shape)
+            data[index] = values
 
-            if calculation.experiment in ['XAS', 'XPS', 'XES']:
+            if calculation.experiment == 'XES':
+                data[index] /= np.abs(data[index].max())
 
-                xMin = calculation.xMin
-                xMax = calculation.xMax
-                xNPoints = calculation.xNPoints
+        if data is None:
+            return
 
-                if calculation.experiment == 'XES':
-                    x = np.linspace(xMin, xMax, xNPoints + 1)
-                    x = x[::-1]
-                    y = data[:, 2]
-                    y = y / np.abs(y.max())
-                else:
-                    x = np.linspace(xMin, xMax, xNPoints + 1)
-                    y = data[:, 2::2].flatten()
+        for index, suffix in enumerate(suffixes):
+            if suffix in self.components:
+                first, second = self.components[suffix]
+                np.subtract(data[suffixes.index(first)],
+                            data[suffixes.index(second)], out=data[index])
+
+        xMin = calculation.xMin
+        xMax = calculation.xMax
+        xNPoints = calculation.xNPoints
+        x = Axis.linspace(xMin, xMax, xNPoints + 1)
+
+        if calculation.experiment in ['XAS', 'XPS', 'XES']:
+            if calculation.experiment in ['XAS', ]:
+                xLabel = 'Absorption Energy (eV)'
+            elif calculation.experiment in ['XPS', ]:
+                xLabel = 'Binding Energy (eV)'
+            elif calculation.experiment in ['XES', ]:
+                xLabel = 'Emission Energy (eV)'
+                x = x.reversed()
+            yLabel = 'Intensity (a.u.)'
+
+            self.raw = SpectrumStack(
+                x, data, names=names, shortNames=shortNames,
+                xLabel=xLabel, yLabel=yLabel)
+
+            self.broadenings = {'gaussian': (calculation.xGaussian, ), }
+        else:
+            yMin = calculation.yMin
+            yMax = calculation.yMax
+            yNPoints = calculation.yNPoints
+            y = Axis.linspace(yMin, yMax, yNPoints + 1)
 
-                spectrum = Spectrum1D(x, y)
-                spectrum.name = spectrumName
-                if len(suffix) > 2:
-                    spectrum.shortName = suffix.title()
-                else:
-                    spectrum.shortName = suffix.upper()
+            self.raw = SpectrumStack(
+                x, data, y, names=names, shortNames=shortNames,
+                xLabel='Incident Energy (eV)',
+                yLabel='Energy Transfer (eV)')
 
-                if calculation.experiment in ['XAS', ]:
-                    spectrum.xLabel = 'Absorption Energy (eV)'
-                elif calculation.experiment in ['XPS', ]:
-                    spectrum.xLabel = 'Binding Energy (eV)'
-                elif calculation.experiment in ['XES', ]:
-                    spectrum.xLabel = 'Emission Energy (eV)'
-                spectrum.yLabel = 'Intensity (a.u.)'
+            self.broadenings = {'gaussian': (calculation.xGaussian,
+                                             calculation.yGaussian), }
 
-                self.broadenings = {'gaussian': (calculation.xGaussian, ), }
-            else:
-                xMin = calculation.xMin
-                xMax = calculation.xMax
-                xNPoints = calculation.xNPoints
-
-                yMin = calculation.yMin
-                yMax = calculation.yMax
-                yNPoints = calculation.yNPoints
-
-                x = np.linspace(xMin, xMax, xNPoints + 1)
-                y = np.linspace(yMin, yMax, yNPoints + 1)
-                z = data[:, 2::2]
-
-                spectrum = Spectrum2D(x, y, z)
-                spectrum.name = spectrumName
-                if len(suffix) > 2:
-                    spectrum.shortName = suffix.title()
-                else:
-                    spectrum.shortName = suffix.upper()
+        # The Lorentzian broadening was applied by Quanty.
+        self.appliedLorentzian = calculation.appliedLorentzian()
+        self.broadenings['lorentzian'] = copy.deepcopy(
+            self.appliedLorentzian)
 
-                spectrum.xLabel = 'Incident Energy (eV)'
-                spectrum.yLabel = 'Energy Transfer (eV)'
+        # Process the spectra once they where read from disk.
+        self.process()
 
-                self.broadenings = {'gaussian': (calculation.xGaussian,
-                                                 calculation.yGaussian), }
+    def loadSticks(self, calculation, sticks):
+        """
+        Evaluate stick spectra on the energy grid of the calculation. The
+        sticks argument is a dictionary of StickSpectrum objects, indexed by
+        the names of the spectra. The dichroic spectra are derived from
+        their components, as for the spectra read from disk, and don't
+        require sticks of their own. The Lorentzian broadening of the
+        calculation is used for the line shapes; the Gaussian broadening is
+        applied during the processing.
+        """
+        self.sticks = sticks
+        self.reset()
 
-            self.raw.append(spectrum)
+        x = Axis.linspace(
+            calculation.xMin, calculation.xMax, calculation.xNPoints + 1)
 
-        # Process the spectra once they where read from disk.
+        names = self.toPlot
+        suffixes = [self.suffixes[name] for name in names]
+        data = np.empty((len(names), x.size))
+        for index, spectrumName in enumerate(names):
+            if suffixes[index] in self.components:
+                continue
+            spectrum = sticks[spectrumName].evaluate(
+                x, calculation.xLorentzian)
+            data[index] = spectrum.y
+
+        for index, suffix in enumerate(suffixes):
+            if suffix in self.components:
+                first, second = self.components[suffix]
+                np.subtract(data[suffixes.index(first)],
+                            data[suffixes.index(second)], out=data[index])
+
+        self.raw = SpectrumStack(
+            x, data, names=names,
+            shortNames=[self.shortName(name) for name in names],
+            xLabel='{} (eV)'.format(calculation.xLabel),
+            yLabel='Intensity (a.u.)')
+
+        self.appliedLorentzian = (list(calculation.xLorentzian), )
+        self.broadenings = {
+            'gaussian': (calculation.xGaussian, ),
+            'lorentzian': (list(calculation.xLorentzian), ), }
         self.process()
 
 
@@ -395,7 +1174,7 @@ class ExperimentalData(object):
             self.spectra = None
         else:
             self.spectra = dict()
-            spectrum = Spectrum1D(x, y, normalize='None')
+            spectrum = Spectrum1D(x, y)
             self.spectra['Expt'] = spectrum
 
 
@@ -439,10 +1218,12 @@ class QuantyCalculation(object):
         'templateName': None,
         'startingTime': None,
         'endingTime': None,
+        'timings': None,
         'verbosity': None,
         'denseBorder': None,
         'isChecked': True,
         'input': None,
+        'unknownPlaceholders': None,
         'output': None,
     }
 
@@ -550,17 +1331,10 @@ class QuantyCalculation(object):
 
                 parameters = node['parameters']['variable']
                 for parameter in parameters:
-                    if 'Atomic' in term or 'Hybridization' in term:
-                        if parameter[0] in ('F', 'G'):
-                            scaleFactor = 0.8
-                            data = [parameters[parameter], scaleFactor]
-                        elif parameter[0] == 'ζ':
-                            scaleFactor = 1.0
-                            data = [parameters[parameter], scaleFactor]
-                        else:
-                            data = parameters[parameter]
-                    else:
-                        data = parameters[parameter]
+                    data = parameters[parameter]
+                    if hasScaleFactor(term, parameter):
+                        scaleFactor = 1.0 if parameter[0] == 'ζ' else 0.8
+                        data = [data, scaleFactor]
 
                     self.hamiltonianData[term][label][parameter] = data
 
@@ -574,35 +1348,48 @@ class QuantyCalculation(object):
                 else:
                     self.hamiltonianState[term] = 0
 
-    def termSuffix(self, term):
-        term = term.lower()
-        replacements = [(' ', '_'), ('-', '_'), ('(', ''), (')', '')]
-        for replacement in replacements:
-            term = term.replace(*replacement)
-        return term
-
-    def saveInput(self):
-        templatePath = resourceFileName(
-            'quanty:' + os.path.join('templates',
-                                     '{}'.format(self.templateName)))
+    def setScaleFactors(self, fk=None, gk=None, zeta=None):
+        """
+        Set the scale factors of the Slater integrals and of the spin-orbit
+        coupling, and apply them to the parameters of the atomic and
+        hybridization terms.
+        """
+        if fk is not None:
+            self.fk = fk
+        if gk is not None:
+            self.gk = gk
+        if zeta is not None:
+            self.zeta = zeta
 
-        with open(templatePath) as p:
-            self.template = p.read()
+        terms = self.hamiltonianData
 
-        self.input = copy.deepcopy(self.template)
+        for term in terms:
+            if not ('Atomic' in term or 'Hybridization' in term):
+                continue
+            configurations = terms[term]
+            for configuration in configurations:
+                parameters = configurations[configuration]
+                for parameter in parameters:
+                    # Change the scale factors if the parameter has one.
+                    try:
+                        value, _ = parameters[parameter]
+                    except TypeError:
+                        continue
+                    if parameter.startswith('F'):
+                        parameters[parameter] = [value, self.fk]
+                    elif parameter.startswith('G'):
+                        parameters[parameter] = [value, self.gk]
+                    elif parameter.startswith('ζ'):
+                        parameters[parameter] = [value, self.zeta]
 
+    def energyReplacements(self):
+        """
+        Return the replacements of the window of energies along the x axis,
+        i.e. the incident energies or, for XES, the emitted energies, and
+        of its Lorentzian broadening.
+        """
         replacements = odict()
 
-        replacements['$DenseBorder'] = self.denseBorder
-        replacements['$Verbosity'] = self.verbosity
-        replacements['$NConfigurations'] = self.nConfigurations
-
-        subshell = self.configurations[0][1][:2]
-        subshell_occupation = self.configurations[0][1][2:]
-        replacements['$NElectrons_{}'.format(subshell)] = subshell_occupation
-
-        replacements['$T'] = self.temperature
-
         replacements['$Emin1'] = self.xMin
         replacements['$Emax1'] = self.xMax
         replacements['$NE1'] = self.xNPoints
@@ -628,6 +1415,47 @@ class QuantyCalculation(object):
             else:
                 replacements['$Egamma1'] = self.xLorentzian[2]
 
+        return replacements
+
+    def appliedLorentzian(self):
+        """
+        Return the Lorentzian broadening applied by Quanty along each axis,
+        following the convention of the Lorentzian broadening of the
+        calculation. For XES only the first value of the broadening is
+        used. For RIXS the broadening along the incident energy is the
+        lifetime of the intermediate states, which is set by the template;
+        it is None, since it cannot be changed after the calculation.
+        """
+        replacements = self.energyReplacements()
+        if self.experiment in ['XAS', 'XPS', ]:
+            return (list(self.xLorentzian), )
+        elif self.experiment in ['XES', ]:
+            return ([replacements['$Gamma1']], )
+        else:
+            return (None, [self.yLorentzian[0]])
+
+    def renderInput(self, overrides=None):
+        """
+        Render the input of the calculation from its template. The
+        replacements in overrides, if given, take precedence over those of
+        the calculation.
+        """
+        template = getTemplate(self.templateName)
+
+        replacements = odict()
+
+        replacements['$DenseBorder'] = self.denseBorder
+        replacements['$Verbosity'] = self.verbosity
+        replacements['$NConfigurations'] = self.nConfigurations
+
+        subshell = self.configurations[0][1][:2]
+        subshell_occupation = self.configurations[0][1][2:]
+        replacements['$NElectrons_{}'.format(subshell)] = subshell_occupation
+
+        replacements['$T'] = self.temperature
+
+        replacements.update(self.energyReplacements())
+
         s = '{{{0:.8g}, {1:.8g}, {2:.8g}}}'
 
         k1 = np.array(self.k1)
@@ -662,20 +1490,10 @@ class QuantyCalculation(object):
         for term in self.hamiltonianData:
             configurations = self.hamiltonianData[term]
             for configuration, parameters in configurations.items():
-                if 'Initial' in configuration:
-                    suffix = 'i'
-                elif 'Intermediate' in configuration:
-                    suffix = 'm'
-                elif 'Final' in configuration:
-                    suffix = 'f'
+                suffix = configurationSuffix(configuration)
                 for parameter, data in parameters.items():
                     # Convert to parameters name from Greek letters.
-                    parameter = parameter.replace('ζ', 'zeta')
-                    parameter = parameter.replace('Δ', 'Delta')
-                    parameter = parameter.replace('σ', 'sigma')
-                    parameter = parameter.replace('τ', 'tau')
-                    parameter = parameter.replace('μ', 'mu')
-                    parameter = parameter.replace('ν', 'nu')
+                    parameter = parameterName(parameter)
 
                     scaleFactor = None
                     try:
@@ -703,8 +1521,7 @@ class QuantyCalculation(object):
             if checkState > 0:
                 checkState = 1
 
-            termSuffix = self.termSuffix(term)
-            replacements['$H_{}'.format(termSuffix)] = checkState
+            replacements['$H_{}'.format(termSuffix(term))] = checkState
 
             try:
                 parameters = self.fixedTermsParameters[term]
@@ -718,19 +1535,675 @@ class QuantyCalculation(object):
         replacements['$Experiment'] = self.experiment
         replacements['$BaseName'] = self.baseName
 
-        for replacement in replacements:
-            self.input = self.input.replace(
-                replacement, str(replacements[replacement]))
+        if overrides is not None:
+            replacements.update(overrides)
+
+        self.input = template.render(replacements)
+        self.unknownPlaceholders = template.missing(replacements)
 
         # with open('{}.json'.format(self.baseName), 'w') as f:
         #     json.dump(replacements, f, indent=2)
 
-        with open(self.baseName + '.lua', 'w') as f:
-            f.write(self.input)
+    def splitWindow(self, parts):
+        """
+        Split the window of energies along the x axis into the given number
+        of parts (see split.split_window).
+        """
+        replacements = self.energyReplacements()
+        emin = replacements['$Emin1']
+        emax = replacements['$Emax1']
+        intervals = replacements['$NE1']
+
+        if self.experiment in ('RIXS', 'XES'):
+            # The resonant spectra are calculated independently at each
+            # energy of the window.
+            return splitWindow(emin, emax, intervals, parts)
+
+        # The spectra are broadened by a convolution with a Lorentzian,
+        # whose tails are truncated at the limits of the window. The parts
+        # overlap by twenty times its largest width, which leaves less than
+        # one percent of its area outside of a part.
+        fwhm = max(replacements['$Gmin1'], replacements['$Gmax1'])
+        fwhm = fwhm - replacements['$Gamma1']
+        margin = 0
+        if fwhm > 0 and intervals > 0:
+            step = (emax - emin) / intervals
+            margin = int(np.ceil(20 * fwhm / abs(step)))
+        return splitWindow(emin, emax, intervals, parts, margin)
+
+    def renderParts(self, parts=1, spectra=False):
+        """
+        Render the inputs of the calculation split into parts along the x
+        axis; the window of each part is a subset of the window of the
+        calculation. If spectra is True, each of the selected spectra is
+        also calculated separately. Return a list of (input, window) pairs,
+        with a single pair if the calculation is not split; the window is
+        None if the x axis is not split.
+        """
+        windows = self.splitWindow(parts)
+        if len(windows) == 1:
+            windows = [None]
+
+        names = [None]
+        if spectra and len(self.spectra.toCalculateChecked) > 1:
+            names = self.spectra.toCalculateChecked
+
+        if windows == [None] and names == [None]:
+            return [(self.input, None)]
+
+        replacements = self.energyReplacements()
+        egamma = replacements['$Egamma1']
+
+        inputs = list()
+        for name, window in itertools.product(names, windows):
+            overrides = odict()
+            if name is not None:
+                overrides['$spectra'] = '\'{}\''.format(name)
+            if window is not None:
+                overrides['$Emin1'] = window.emin
+                overrides['$Emax1'] = window.emax
+                overrides['$NE1'] = window.intervals
+                # The Lorentzian broadening changes at Egamma1. If this
+                # energy is outside of the part, the broadening is constant
+                # within it.
+                if egamma <= window.emin:
+                    overrides['$Gmin1'] = replacements['$Gmax1']
+                    overrides['$Egamma1'] = (window.emin + window.emax) / 2
+                elif egamma >= window.emax:
+                    overrides['$Gmax1'] = replacements['$Gmin1']
+                    overrides['$Egamma1'] = (window.emin + window.emax) / 2
+            self.renderInput(overrides)
+            inputs.append((self.input, window))
+        self.renderInput()
+
+        return inputs
+
+    def mergeParts(self, directories, windows, directory):
+        """
+        Merge the spectra written in the directories of the parts of the
+        calculation into files in the given directory. The spectra of the
+        parts of the window are stitched together; those calculated by a
+        single part are moved.
+        """
+        # The spectra at the incident energies of the resonant spectra are
+        # in the columns of the files.
+        axis = 1 if self.experiment == 'RIXS' else 0
+        for path in self.spectra.specPaths(self, directory):
+            name = os.path.basename(path)
+            sources = list()
+            for partDirectory, window in zip(directories, windows):
+                source = os.path.join(partDirectory, name)
+                if os.path.exists(source):
+                    sources.append((source, window))
+            if sources:
+                stitchSpec(sources, path, axis)
+
+    def saveInput(self, directory=None):
+        """
+        Render the input of the calculation, and write it to a file in the
+        given directory, or in the current directory.
+        """
+        self.renderInput()
+        self.writeInput(directory)
+
+    def writeInput(self, directory=None, text=None):
+        """Write the rendered input, or the given text, to a file."""
+        path = self.baseName + '.lua'
+        if directory is not None:
+            path = os.path.join(directory, path)
+
+        if text is None:
+            text = self.input
+
+        with open(path, 'w') as f:
+            f.write(text)
 
         self.output = str()
 
 
+_resultCaches = dict()
+
+
+def getResultCache():
+    """
+    Return the cache of the results of the calculations. The instance is
+    shared by all the jobs, so that its lock serializes their accesses.
+    """
+    path = os.path.join(Config().cacheLocation(), 'results')
+    try:
+        return _resultCaches[path]
+    except KeyError:
+        cache = _resultCaches[path] = ResultCache(path)
+        return cache
+
+
+class CacheRestoreThread(QThread):
+    """
+    Copy the files of a cached calculation to a directory in a background
+    thread. The restored signal is emitted with the standard output of the
+    calculation, or with None if it is not in the cache.
+    """
+
+    restored = pyqtSignal(object)
+
+    def __init__(self, cache, key, directory, parent=None):
+        super(CacheRestoreThread, self).__init__(parent)
+        self.cache = cache
+        self.key = key
+        self.directory = directory
+
+    def run(self):
+        self.restored.emit(self.cache.restore(self.key, self.directory))
+
+
+class SpectraLoaderThread(QThread):
+    """
+    Read the files with the spectra in a background thread, so that the
+    interface stays responsive. The loaded signal is emitted with a
+    dictionary of spectra indexed by the paths of the files, or with the
+    error raised while reading them.
+    """
+
+    loaded = pyqtSignal(object)
+
+    def __init__(self, paths, cache=True, merge=None, read=None, store=None,
+                 parent=None):
+        super(SpectraLoaderThread, self).__init__(parent)
+        self.paths = paths
+        self.cache = cache
+        # Called before reading the files, e.g. to merge those of the parts
+        # of a calculation.
+        self.merge = merge
+        # Called with the paths to read the files instead of loadSpecs,
+        # e.g. to leave out the files that cannot be read yet.
+        self.read = read
+        # Called once the files are read, e.g. to store them in the cache
+        # of the results.
+        self.store = store
+
+    def run(self):
+        try:
+            if self.merge is not None:
+                self.merge()
+            if self.read is not None:
+                spectra = self.read(self.paths)
+            else:
+                spectra = dict(
+                    zip(self.paths, loadSpecs(self.paths, self.cache)))
+            if self.store is not None:
+                self.store()
+        except (IOError, OSError, ValueError) as e:
+            spectra = e
+        self.loaded.emit(spectra)
+
+
+class QuantyJob(QObject):
+    """
+    A Quanty calculation submitted to the queue. The job runs Quanty in a
+    new scratch directory, created in the given directory, follows its
+    output and the spectra written to disk, and loads the spectra once the
+    calculation has finished; the result is the calculation in state.
+
+    Since every job has its own working directory, jobs with the same name
+    can run at the same time. Unless removeFiles is False, the working
+    directory is removed when the job is done; it is kept if the job fails.
+
+    The calculation can be split into parts (see
+    QuantyCalculation.renderParts), given as a list of (input, window). The
+    parts run at the same time, each in a subdirectory of the working
+    directory, and their spectra are merged before they are loaded.
+
+    The changed signal is emitted when the status of the job changes; the
+    output of Quanty and the messages for the status bar are emitted as
+    they arrive.
+    """
+
+    changed = pyqtSignal(object)
+    outputReceived = pyqtSignal(str)
+    messageChanged = pyqtSignal(str)
+
+    def __init__(self, state, command, directory, cache=None,
+                 removeFiles=True, parts=None, parent=None):
+        super(QuantyJob, self).__init__(parent)
+        self.state = state
+        self.command = command
+        self.directory = directory
+        self.workingDirectory = None
+        self.cache = cache
+        self.removeFiles = removeFiles
+
+        if parts is None:
+            parts = [(self.state.input, None)]
+        self.parts = parts
+        self.partDirectories = list()
+        self.partOutputs = [str() for _ in self.parts]
+
+        self.status = 'Queued'
+        self.appendResult = True
+        self.cancelled = False
+        self.startTime = None
+        self.stopTime = None
+        self.processes = list()
+        self.outputParser = None
+        self.specWatcher = None
+        self.restoreThread = None
+        self.loaderThread = None
+        self.partialLoaderThread = None
+        self.partialSpectra = dict()
+        self.partialUpdated = False
+        self.restored = False
+
+        self.cacheKey = None
+        if self.cache is not None:
+            text = ''.join(text for text, _ in self.parts)
+            self.cacheKey = self.cache.key(text, self.command)
+
+    @property
+    def name(self):
+        return self.state.baseName
+
+    def isActive(self):
+        return self.status in ('Running', 'Loading')
+
+    def isDone(self):
+        return self.status in ('Finished', 'Failed', 'Cancelled')
+
+    def elapsed(self):
+        if self.startTime is None:
+            return None
+        if self.stopTime is None:
+            return time.time() - self.startTime
+        return self.stopTime - self.startTime
+
+    def isRunning(self):
+        return any(process.state() != QProcess.NotRunning
+                   for process in self.processes)
+
+    def setStatus(self, status, message=None):
+        # The spectra read while the calculation is running are not needed
+        # anymore; wait for the thread reading them to finish.
+        if status != 'Running' and self.partialLoaderThread is not None:
+            self.partialLoaderThread.wait()
+        self.status = status
+        if self.isDone() and self.startTime is not None:
+            self.stopTime = time.time()
+        if message is not None:
+            self.messageChanged.emit(message)
+        self.changed.emit(self)
+
+    def fail(self, message):
+        # Stop the other parts of the calculation.
+        self.setStatus('Failed', message)
+        for process in self.processes:
+            process.kill()
+
+    def specPaths(self):
+        return self.state.spectra.specPaths(
+            self.state, self.workingDirectory)
+
+    def watchedPaths(self):
+        # The spectra of the parts of a window are complete only when they
+        # are stitched together.
+        if any(window is not None for _, window in self.parts):
+            return list()
+        return [os.path.join(directory, os.path.basename(path))
+                for directory in self.partDirectories
+                for path in self.specPaths()]
+
+    def start(self):
+        self.startTime = time.time()
+        self.state.startingTime = datetime.datetime.now()
+
+        try:
+            self.workingDirectory = tempfile.mkdtemp(
+                prefix='{}_'.format(self.state.baseName), dir=self.directory)
+            self.state.writeInput(self.workingDirectory)
+            if len(self.parts) == 1:
+                self.partDirectories = [self.workingDirectory]
+            else:
+                for index, (text, _) in enumerate(self.parts):
+                    directory = os.path.join(
+                        self.workingDirectory, 'part{}'.format(index))
+                    os.mkdir(directory)
+                    self.state.writeInput(directory, text)
+                    self.partDirectories.append(directory)
+        except (IOError, OSError):
+            self.setStatus('Failed', 'Failed to write the Quanty input file.')
+            return
+
+        # Reuse the results of an identical calculation, if there is one.
+        # The files are copied from the cache in a background thread.
+        if self.cacheKey is not None:
+            self.setStatus('Loading')
+            self.restoreThread = CacheRestoreThread(
+                self.cache, self.cacheKey, self.workingDirectory, parent=self)
+            self.restoreThread.restored.connect(self.cacheRestored)
+            self.restoreThread.start()
+            return
+
+        self.startProcesses()
+
+    def cacheRestored(self, output):
+        self.restoreThread.wait()
+        self.restoreThread = None
+
+        if self.cancelled:
+            self.removeWorkingDirectory()
+            self.setStatus('Cancelled')
+            return
+
+        if output is None:
+            self.startProcesses()
+            return
+
+        self.restored = True
+        self.state.endingTime = self.state.startingTime
+        self.state.timings = None
+        self.state.output = output
+        self.outputReceived.emit(output)
+        self.messageChanged.emit(
+            'The results of an identical calculation were loaded from the '
+            'cache.')
+        self.loadSpectra()
+
+    def startProcesses(self):
+        # Follow the progress of the calculation: parse the output as it
+        # arrives, and read the spectra as soon as their files are written.
+        self.outputParser = OutputParser()
+        self.specWatcher = SpecWatcher(self.watchedPaths())
+
+        for index, directory in enumerate(self.partDirectories):
+            process = QProcess(self)
+            process.setWorkingDirectory(directory)
+            process.readyReadStandardOutput.connect(
+                functools.partial(self.handleOutput, index))
+            process.errorOccurred.connect(self.handleError)
+            process.finished.connect(
+                functools.partial(self.processFinished, index))
+            self.processes.append(process)
+
+        message = 'Running "Quanty {}" in {}.'.format(
+            self.state.baseName + '.lua', self.workingDirectory)
+        if len(self.processes) > 1:
+            message = 'Running "Quanty {}" in {} parts in {}.'.format(
+                self.state.baseName + '.lua', len(self.processes),
+                self.workingDirectory)
+        self.setStatus('Running', message)
+
+        for process in self.processes:
+            process.start(self.command, (self.state.baseName + '.lua', ))
+
+    def cancel(self):
+        if self.status == 'Queued':
+            self.setStatus('Cancelled')
+        elif self.status == 'Loading':
+            # The job is cancelled once the files are copied from the cache,
+            # or once the spectra are read.
+            self.cancelled = True
+        elif self.status == 'Running':
+            self.cancelled = True
+            for process in self.processes:
+                process.kill()
+
+    def poll(self):
+        """
+        Start reading, in a background thread, the spectra written since the
+        previous call. Return True if new spectra were read since then.
+        """
+        if self.status != 'Running':
+            return False
+
+        updated = self.partialUpdated
+        self.partialUpdated = False
+
+        # Only the status of the files is checked here; they are read once
+        # they are complete, and only once.
+        if self.partialLoaderThread is None:
+            paths = self.specWatcher.ready()
+            if paths:
+                self.partialLoaderThread = SpectraLoaderThread(
+                    paths, read=self.specWatcher.read, parent=self)
+                self.partialLoaderThread.loaded.connect(
+                    self.partialSpectraLoaded)
+                self.partialLoaderThread.start()
+
+        return updated
+
+    def partialSpectraLoaded(self, spectra):
+        thread = self.partialLoaderThread
+        self.partialLoaderThread = None
+        thread.wait()
+        thread.deleteLater()
+
+        if self.status != 'Running' or isinstance(spectra, Exception):
+            return
+
+        self.specWatcher.update(thread.paths, spectra)
+        # The files of the parts are moved to the working directory.
+        for path, values in spectra.items():
+            path = os.path.join(
+                self.workingDirectory, os.path.basename(path))
+            self.partialSpectra[path] = values
+        self.partialUpdated = self.partialUpdated or bool(spectra)
+
+    def partialResult(self):
+        """Return the spectra calculated so far, or None."""
+        if not self.partialSpectra:
+            return None
+        spectra = QuantySpectra()
+        spectra.toCalculateChecked = self.state.spectra.toCalculateChecked
+        spectra.loadFromDisk(
+            self.state, spectra=self.partialSpectra,
+            directory=self.workingDirectory)
+        if not hasattr(spectra, 'raw'):
+            return None
+        return spectra
+
+    def handleOutput(self, index):
+        data = self.processes[index].readAllStandardOutput().data()
+        data = data.decode('utf-8')
+
+        # The output of the other parts is shown when they finish.
+        if index > 0:
+            self.partOutputs[index] += data
+            return
+
+        events = self.outputParser.feed(data)
+        if 'analysis' in events:
+            seconds = self.outputParser.timings()['eigensystem']
+            message = ('The initial Hamiltonian of {} was analyzed in {:.2f} '
+                       'seconds. Calculating the spectra.'.format(
+                           self.name, seconds))
+            self.messageChanged.emit(message)
+
+        data = data.rstrip()
+        self.state.output = self.state.output + data
+        self.outputReceived.emit(data)
+
+    def handleError(self, error):
+        # The finished signal is not emitted if Quanty could not start.
+        if error == QProcess.FailedToStart and not self.isDone():
+            self.fail('Quanty could not be started.')
+
+    def processFinished(self, index, *args):
+        # The parts stopped after a failure are ignored.
+        if self.isDone():
+            return
+
+        # Evaluate the exit code and status of the process. The exit code
+        # is platform dependent when the process is killed.
+        process = self.processes[index]
+        exitStatus = process.exitStatus()
+        exitCode = process.exitCode()
+
+        if self.cancelled:
+            if not self.isRunning():
+                self.removeWorkingDirectory()
+                self.setStatus('Cancelled', 'Quanty was stopped.')
+            return
+        elif exitStatus == QProcess.CrashExit:
+            self.fail('Quanty has crashed.')
+            return
+        elif exitCode != 0:
+            process.setReadChannel(QProcess.StandardError)
+            error = process.readAllStandardError().data()
+            self.outputReceived.emit(
+                self.partOutputs[index] + error.decode('utf-8'))
+            message = ('Quanty has finished unsuccessfully. Check the '
+                       'logging window, and the files in {}, for more '
+                       'details.'.format(self.workingDirectory))
+            self.fail(message)
+            return
+
+        if index > 0:
+            self.outputReceived.emit(self.partOutputs[index].rstrip())
+
+        if self.isRunning():
+            return
+
+        self.state.endingTime = datetime.datetime.now()
+        self.outputParser.finish()
+        self.state.timings = self.outputParser.timings()
+        self.state.output = ''.join(
+            [self.state.output] + self.partOutputs[1:])
+
+        delta = (self.state.endingTime - self.state.startingTime)
+        self.messageChanged.emit(
+            'Quanty has finished successfully in {}.'.format(
+                formatDuration(delta.total_seconds())))
+
+        self.loadSpectra()
+
+    def loadSpectra(self):
+        # Load the spectra from disk in a background thread. The spectra
+        # read while the calculation was running are not read again. There
+        # is no need to cache files that are removed afterwards.
+        self.setStatus('Loading')
+        paths = [path for path in self.specPaths()
+                 if path not in self.partialSpectra]
+        merge = None
+        if len(self.parts) > 1 and not self.restored:
+            windows = [window for _, window in self.parts]
+            merge = functools.partial(
+                self.state.mergeParts, self.partDirectories, windows,
+                self.workingDirectory)
+        # Keep the results, to skip identical calculations in the future.
+        store = None
+        if self.cacheKey is not None and not self.restored:
+            store = self.storeResult
+        self.loaderThread = SpectraLoaderThread(
+            paths, cache=not self.removeFiles, merge=merge, store=store,
+            parent=self)
+        self.loaderThread.loaded.connect(self.spectraLoaded)
+        self.loaderThread.start()
+
+    def spectraLoaded(self, spectra):
+        if self.cancelled:
+            self.removeWorkingDirectory()
+            self.setStatus('Cancelled')
+            return
+
+        if isinstance(spectra, Exception):
+            message = 'The spectra could not be loaded: {}'.format(spectra)
+            self.setStatus('Failed', message)
+            return
+
+        spectra.update(self.partialSpectra)
+        self.state.spectra.loadFromDisk(
+            self.state, spectra=spectra, directory=self.workingDirectory)
+
+        self.removeWorkingDirectory()
+        self.setStatus('Finished')
+
+    def storeResult(self):
+        # Called in the thread loading the spectra.
+        paths = [path for path in self.specPaths() if os.path.exists(path)]
+        self.cache.store(self.cacheKey, paths, self.state.output)
+
+    def removeWorkingDirectory(self):
+        if self.removeFiles and self.workingDirectory is not None:
+            shutil.rmtree(self.workingDirectory, ignore_errors=True)
+
+
+class QuantyJobQueue(QObject):
+    """
+    Queue of Quanty jobs. At most maxJobs jobs are active at the same time.
+    The jobChanged signal is emitted when the status of a job changes.
+    """
+
+    jobChanged = pyqtSignal(object)
+
+    def __init__(self, maxJobs=1, parent=None):
+        super(QuantyJobQueue, self).__init__(parent)
+        self.maxJobs = maxJobs
+        self.jobs = list()
+        self._starting = False
+
+    def submit(self, job):
+        self.jobs.append(job)
+        job.changed.connect(self.updateJob)
+        self.startJobs()
+
+    def isActive(self):
+        return bool(self.jobs)
+
+    def activeJobs(self):
+        return [job for job in self.jobs if job.isActive()]
+
+    def startJobs(self):
+        # Jobs failing to start change their status while the queue is
+        # scanned; they are handled when the scan is done.
+        if self._starting:
+            return
+        self._starting = True
+        try:
+            active = self.activeJobs()
+            for job in list(self.jobs):
+                if len(active) >= self.maxJobs:
+                    break
+                if job.status != 'Queued':
+                    continue
+                job.start()
+                if job.isActive():
+                    active.append(job)
+        finally:
+            self._starting = False
+
+        self.jobs = [job for job in self.jobs if not job.isDone()]
+
+    def updateJob(self, job):
+        if job.isDone():
+            try:
+                self.jobs.remove(job)
+            except ValueError:
+                pass
+        self.jobChanged.emit(job)
+        if job.isDone():
+            self.startJobs()
+
+    def cancel(self, jobs=None):
+        """Cancel the given jobs, or all the jobs."""
+        if jobs is None:
+            jobs = list(self.jobs)
+        # Cancel the queued jobs first, so that they are not started when
+        # the running ones stop.
+        for job in sorted(jobs, key=lambda job: job.status != 'Queued'):
+            job.cancel()
+
+
+def formatDuration(delta):
+    hours, reminder = divmod(delta, 3600)
+    minutes, seconds = divmod(reminder, 60)
+    seconds = round(seconds, 2)
+    if hours > 0:
+        return '{:.0f} hours {:.0f} minutes and {} seconds'.format(
+            hours, minutes, seconds)
+    elif minutes > 0:
+        return '{:.0f} minutes and {} seconds'.format(minutes, seconds)
+    else:
+        return '{} seconds'.format(seconds)
+
+
 class QuantyDockWidget(QDockWidget):
 
     def __init__(self, parent=None):
@@ -893,6 +2366,29 @@ class QuantyDockWidget(QDockWidget):
             self.resultsView.setContextMenuPolicy(Qt.CustomContextMenu)
             self.resultsView.customContextMenuRequested[QPoint].connect(
                 self.showResultsContextMenu)
+            self.selectNewResults = True
+
+        if not hasattr(self, 'jobsModel'):
+            # Create the queue of calculations, and the model of its jobs.
+            self.jobQueue = QuantyJobQueue(self.getMaxJobs(), parent=self)
+            self.jobQueue.jobChanged.connect(self.updateJob)
+            self.jobsModel = JobsModel(parent=self)
+
+            self.jobsView.setModel(self.jobsModel)
+            self.jobsView.resizeColumnsToContents()
+            self.jobsView.horizontalHeader().setStretchLastSection(True)
+            self.jobsView.horizontalHeader().setSectionsMovable(False)
+            self.jobsView.horizontalHeader().setSectionsClickable(False)
+            if sys.platform == 'darwin':
+                self.jobsView.horizontalHeader().setMaximumHeight(17)
+
+            self.jobsView.setContextMenuPolicy(Qt.CustomContextMenu)
+            self.jobsView.customContextMenuRequested[QPoint].connect(
+                self.showJobsContextMenu)
+
+            # Follow the running calculations.
+            self.jobsTimer = QTimer(self)
+            self.jobsTimer.timeout.connect(self.updatePartialSpectra)
 
         if not hasattr(self, 'resultDetailsDialog'):
             self.resultDetailsDialog = QuantyResultDetailsDialog(parent=self)
@@ -1345,32 +2841,9 @@ class QuantyDockWidget(QDockWidget):
             self.zetaLineEdit.setValue(self.state.zeta)
             return
 
-        self.state.fk = fk
-        self.state.gk = gk
-        self.state.zeta = zeta
-
         # TODO: This should be already updated to the most recent data.
         # self.state.hamiltonianData = self.hamiltonianModel.getModelData()
-        terms = self.state.hamiltonianData
-
-        for term in terms:
-            if not ('Atomic' in term or 'Hybridization' in term):
-                continue
-            configurations = terms[term]
-            for configuration in configurations:
-                parameters = configurations[configuration]
-                for parameter in parameters:
-                    # Change the scale factors if the parameter has one.
-                    try:
-                        value, _ = parameters[parameter]
-                    except TypeError:
-                        continue
-                    if parameter.startswith('F'):
-                        terms[term][configuration][parameter] = [value, fk]
-                    elif parameter.startswith('G'):
-                        terms[term][configuration][parameter] = [value, gk]
-                    elif parameter.startswith('ζ'):
-                        terms[term][configuration][parameter] = [value, zeta]
+        self.state.setScaleFactors(fk, gk, zeta)
         self.hamiltonianModel.updateModelData(self.state.hamiltonianData)
         # I have no idea why this is needed. Both views should update after
         # the above function call.
@@ -1471,23 +2944,26 @@ class QuantyDockWidget(QDockWidget):
         self.state.denseBorder = self.getDenseBorder()
 
         path = self.getCurrentPath()
-        try:
-            os.chdir(path)
-        except OSError as e:
+        if not os.path.isdir(path):
             message = ('The specified folder doesn\'t exist. Use the \'Save '
                        'Input As...\' button to save the input file to an '
                        'alternative location.')
             self.getStatusBar().showMessage(message, 2 * self.timeout)
-            raise e
+            raise OSError(message)
 
         # The folder might exist, but is not writable.
         try:
-            self.state.saveInput()
+            self.state.saveInput(path)
         except (IOError, OSError) as e:
             message = 'Failed to write the Quanty input file.'
             self.getStatusBar().showMessage(message, self.timeout)
             raise e
 
+        if self.state.unknownPlaceholders:
+            message = 'The input file has placeholders without values: {}.'
+            self.getLoggerWidget().appendPlainText(message.format(
+                ', '.join(self.state.unknownPlaceholders)))
+
     def saveInputAs(self):
         path, _ = QFileDialog.getSaveFileName(
             self, 'Save Quanty Input',
@@ -1572,6 +3048,17 @@ class QuantyDockWidget(QDockWidget):
             self.quantyToolBox.setCurrentWidget(self.resultsPage)
 
     def runCalculation(self):
+        self.submitCalculations([self.state])
+
+    def submitCalculations(self, states, appendResults=True, changed=None):
+        """
+        Queue the calculations of the given states, and return their jobs,
+        or None if Quanty cannot run or if an input file has placeholders
+        without values. The jobs run copies of the states. If
+        appendResults is True, the finished calculations are appended to
+        the results. If given, changed is connected to the changed signal
+        of the jobs before they are started.
+        """
         path = self.getQuantyPath()
 
         if path:
@@ -1580,7 +3067,7 @@ class QuantyDockWidget(QDockWidget):
             message = ('The path to the Quanty executable is not set. '
                        'Please use the preferences menu to set it.')
             self.getStatusBar().showMessage(message, 2 * self.timeout)
-            return
+            return None
 
         # Test the executable.
         with open(os.devnull, 'w') as f:
@@ -1591,122 +3078,161 @@ class QuantyDockWidget(QDockWidget):
                     message = ('The Quanty executable is not working '
                                'properly. Is the PATH set correctly?')
                     self.getStatusBar().showMessage(message, 2 * self.timeout)
-                    return
+                    return None
                 else:
                     raise e
 
-        # Write the input file to disk.
-        try:
-            self.saveInput()
-        except (IOError, OSError) as e:
-            return
+        directory = self.getCurrentPath()
+        if not os.path.isdir(directory):
+            message = ('The specified folder doesn\'t exist. Use the \'Save '
+                       'Input As...\' button to save the input file to an '
+                       'alternative location.')
+            self.getStatusBar().showMessage(message, 2 * self.timeout)
+            return None
 
-        # Disable the widget while the calculation is running.
-        self.enableWidget(False)
+        cache = getResultCache() if self.doCacheResults() else None
+        self.jobQueue.maxJobs = self.getMaxJobs()
+
+        # The jobs run copies of the states, so that the parameters can be
+        # changed while they are queued or running.
+        copies = list()
+        for state in states:
+            state.verbosity = self.getVerbosity()
+            state.denseBorder = self.getDenseBorder()
+            state = copy.deepcopy(state)
+            state.renderInput()
+            copies.append(state)
+
+        # Quanty cannot run an input with placeholders left in it.
+        for state in copies:
+            if state.unknownPlaceholders:
+                message = ('The input file of {} has placeholders without '
+                           'values: {}.').format(
+                    state.baseName, ', '.join(state.unknownPlaceholders))
+                self.getLoggerWidget().appendPlainText(message)
+                message = ('The calculation was not started, because the '
+                           'template of {} is not complete.').format(
+                    state.baseName)
+                self.getStatusBar().showMessage(message, 2 * self.timeout)
+                return None
+
+        jobs = list()
+        for state in copies:
+            parts = state.renderParts(
+                self.getEnergyParts(), self.doSplitSpectra())
+            job = QuantyJob(state, command, directory, cache=cache,
+                            removeFiles=self.doRemoveFiles(), parts=parts,
+                            parent=self)
+            job.appendResult = appendResults
+            job.outputReceived.connect(self.getLoggerWidget().appendPlainText)
+            job.messageChanged.connect(self.showJobMessage)
+            if changed is not None:
+                job.changed.connect(changed)
+            jobs.append(job)
+
+        self.jobsModel.appendItems(jobs)
+        self.jobsView.resizeColumnsToContents()
+
+        for job in jobs:
+            self.jobQueue.submit(job)
+
+        queued = [job.name for job in jobs if job.status == 'Queued']
+        if queued:
+            message = 'Queued calculations: {}.'.format(', '.join(queued))
+            self.getStatusBar().showMessage(message, self.timeout)
 
-        self.state.startingTime = datetime.datetime.now()
+        if not self.jobsTimer.isActive():
+            self.jobsTimer.start(500)
 
-        # Run Quanty using QProcess.
-        self.process = QProcess()
+        return jobs
 
-        self.process.start(command, (self.state.baseName + '.lua', ))
-        message = (
-            'Running "Quanty {}" in {}.'.format(
-                self.state.baseName + '.lua', os.getcwd()))
-        self.getStatusBar().showMessage(message)
+    def showJobMessage(self, message):
+        self.getStatusBar().showMessage(message, self.timeout)
 
-        if sys.platform == 'win32' and self.process.waitForStarted():
-            self.updateCalculationPushButton()
-        else:
-            self.process.started.connect(self.updateCalculationPushButton)
-        self.process.readyReadStandardOutput.connect(self.handleOutputLogging)
-        self.process.finished.connect(self.processCalculation)
-
-    def updateCalculationPushButton(self, kind='stop'):
-        self.calculationPushButton.disconnect()
-
-        if kind == 'run':
-            icon = QIcon(resourceFileName('icons:play.svg'))
-            self.calculationPushButton.setIcon(icon)
-            self.calculationPushButton.setText('Run')
-            self.calculationPushButton.setToolTip('Run Quanty.')
-
-            self.calculationPushButton.clicked.connect(self.runCalculation)
-        elif kind == 'stop':
-            icon = QIcon(resourceFileName('icons:stop.svg'))
-            self.calculationPushButton.setIcon(icon)
-            self.calculationPushButton.setText('Stop')
-            self.calculationPushButton.setToolTip('Stop Quanty.')
-            self.calculationPushButton.clicked.connect(self.stopCalculation)
-        else:
-            pass
+    def cancelSelectedJobs(self):
+        indexes = self.jobsView.selectionModel().selectedRows()
+        jobs = self.jobsModel.getSelectedItems(indexes)
+        self.jobQueue.cancel(jobs)
 
-    def stopCalculation(self):
-        self.process.kill()
-
-    def processCalculation(self, *args):
-        startingTime = self.state.startingTime
-
-        # When did I finish?
-        endingTime = datetime.datetime.now()
-        self.state.endingTime = endingTime
-
-        # Re-enable the widget when the calculation has finished.
-        self.enableWidget(True)
-
-        # Reset the calculation button.
-        self.updateCalculationPushButton('run')
-
-        # Evaluate the exit code and status of the process.
-        exitStatus = self.process.exitStatus()
-        exitCode = self.process.exitCode()
-
-        if exitStatus == 0 and exitCode == 0:
-            message = ('Quanty has finished successfully in ')
-            delta = (endingTime - startingTime).total_seconds()
-            hours, reminder = divmod(delta, 3600)
-            minutes, seconds = divmod(reminder, 60)
-            seconds = round(seconds, 2)
-            if hours > 0:
-                message += '{} hours {} minutes and {} seconds.'.format(
-                    hours, minutes, seconds)
-            elif minutes > 0:
-                message += '{} minutes and {} seconds.'.format(
-                    minutes, seconds)
-            else:
-                message += '{} seconds.'.format(seconds)
-            self.getStatusBar().showMessage(message, self.timeout)
-        elif exitStatus == 0 and exitCode == 1:
-            self.handleErrorLogging()
-            message = (
-                'Quanty has finished unsuccessfully. '
-                'Check the logging window for more details.')
-            self.getStatusBar().showMessage(message, self.timeout)
+    def cancelAllJobs(self):
+        self.jobQueue.cancel()
+
+    def removeFinishedJobs(self):
+        jobs = [job for job in self.jobsModel.modelData if job.isDone()]
+        self.jobsModel.removeItems(jobs)
+        for job in jobs:
+            job.deleteLater()
+
+    def updatePartialSpectra(self):
+        self.jobsModel.updateElapsed()
+
+        if not self.jobQueue.isActive():
+            self.jobsTimer.stop()
             return
-        # exitCode is platform dependent; exitStatus is always 1.
-        elif exitStatus == 1:
-            message = 'Quanty was stopped.'
-            self.getStatusBar().showMessage(message, self.timeout)
+
+        # Plot the spectra of the running calculations that are available
+        # on top of the results.
+        updated = [job for job in self.jobQueue.activeJobs() if job.poll()]
+        if not updated:
             return
 
+        self.updatePlotWidget()
+        for job in self.jobQueue.activeJobs():
+            partial = job.partialResult()
+            if partial is None:
+                continue
+            partial.processed.plot(
+                plotWidget=self.getPlotWidget(),
+                prefix='Running-{}'.format(job.name))
+
+            if job in updated:
+                names = ', '.join(partial.processed.shortNames)
+                message = 'Calculated spectra of {}: {}.'.format(
+                    job.name, names)
+                self.getStatusBar().showMessage(message)
+
+    def updateJob(self, job):
+        self.jobsModel.updateItem(job)
+
+        if job.status == 'Finished' and job.appendResult:
+            self.loadCalculation(job.state)
+        elif job.isDone() and job.partialSpectra:
+            # Remove the partial spectra from the plot.
+            self.updatePlotWidget()
+
+    def loadCalculation(self, state):
+        # Log the duration of the phases of the calculation.
+        if state.timings:
+            timings = ', '.join(
+                '{} {:.2f} s'.format(phase, seconds)
+                for phase, seconds in state.timings.items())
+            self.getLoggerWidget().appendPlainText(
+                'Timings of {}: {}.'.format(state.baseName, timings))
+
         # Scroll to the bottom of the logger widget.
         scrollBar = self.getLoggerWidget().verticalScrollBar()
         scrollBar.setValue(scrollBar.maximum())
 
-        # Load the spectra from disk.
-        self.state.spectra.loadFromDisk(self.state)
-
         # If the calculated spectrum is an image, uncheck all the other
         # calculations. This way the current result can be disaplyed in the
         # plot widget.
-        if self.state.experiment in ['RIXS', ]:
+        if state.experiment in ['RIXS', ]:
             self.resultsModel.uncheckAllItems()
 
         # Once all processing is done, store the state in the
         # results model. Upon finishing this, a signal is emitted by the
         # model which triggers some updates to be performed.
-        self.state.isChecked = True
-        self.resultsModel.appendItems(self.state)
+        # The new result is selected, and replaces the parameters in the
+        # widget, only if they were not changed since the calculation was
+        # submitted, and no other calculation is pending.
+        state.isChecked = True
+        self.selectNewResults = (
+            not self.jobQueue.isActive() and not self.isStateModified(state))
+        self.resultsModel.appendItems(state)
+
+        if not self.selectNewResults:
+            self.selectNewResults = True
+            return
 
         # If the "Hamiltonian Setup" page is currently selected, when the
         # current widget is set to the "Results Page", the former is not
@@ -1715,13 +3241,6 @@ class QuantyDockWidget(QDockWidget):
         self.quantyToolBox.setCurrentWidget(self.resultsPage)
         self.resultsView.setFocus()
 
-        # Remove files if requested.
-        if self.doRemoveFiles():
-            os.remove('{}.lua'.format(self.state.baseName))
-            spectra = glob.glob('{}_*.spec'.format(self.state.baseName))
-            for spectrum in spectra:
-                os.remove(spectrum)
-
     def selectedHamiltonianTermChanged(self):
         index = self.hamiltonianTermsView.currentIndex()
         self.hamiltonianParametersView.setRootIndex(index)
@@ -1772,6 +3291,37 @@ class QuantyDockWidget(QDockWidget):
 
         self.resultsContextMenu.exec_(self.resultsView.mapToGlobal(position))
 
+    def showJobsContextMenu(self, position):
+        icon = QIcon(resourceFileName('icons:stop.svg'))
+        self.cancelSelectedJobsAction = QAction(
+            icon, 'Cancel Selected Calculations', self,
+            triggered=self.cancelSelectedJobs)
+        self.cancelAllJobsAction = QAction(
+            icon, 'Cancel All Calculations', self,
+            triggered=self.cancelAllJobs)
+
+        icon = QIcon(resourceFileName('icons:trash.svg'))
+        self.removeFinishedJobsAction = QAction(
+            icon, 'Remove Finished Calculations', self,
+            triggered=self.removeFinishedJobs)
+
+        self.jobsContextMenu = QMenu('Jobs Context Menu', self)
+        self.jobsContextMenu.addAction(self.cancelSelectedJobsAction)
+        self.jobsContextMenu.addAction(self.cancelAllJobsAction)
+        self.jobsContextMenu.addSeparator()
+        self.jobsContextMenu.addAction(self.removeFinishedJobsAction)
+
+        indexes = self.jobsView.selectionModel().selectedRows()
+        jobs = self.jobsModel.getSelectedItems(indexes)
+        if not [job for job in jobs if not job.isDone()]:
+            self.cancelSelectedJobsAction.setEnabled(False)
+        if not self.jobQueue.isActive():
+            self.cancelAllJobsAction.setEnabled(False)
+        if not [job for job in self.jobsModel.modelData if job.isDone()]:
+            self.removeFinishedJobsAction.setEnabled(False)
+
+        self.jobsContextMenu.exec_(self.jobsView.mapToGlobal(position))
+
     def updateResultsView(self, index):
         """
         Update the selection to contain only the result specified by
@@ -1785,12 +3335,23 @@ class QuantyDockWidget(QDockWidget):
         :type index: QModelIndex
         """
 
+        if not self.selectNewResults:
+            self.resultsView.resizeColumnsToContents()
+            return
+
         flags = (QItemSelectionModel.Clear | QItemSelectionModel.Rows |
                  QItemSelectionModel.Select)
         self.resultsView.selectionModel().select(index, flags)
         self.resultsView.resizeColumnsToContents()
         self.resultsView.setFocus()
 
+    def isStateModified(self, state):
+        """Check if the parameters changed since the state was copied."""
+        if not isinstance(self.state, QuantyCalculation):
+            return True
+        self.state.renderInput()
+        return self.state.input != state.input
+
     def getLastSelectedResultsModelIndex(self):
         rows = self.resultsView.selectionModel().selectedRows()
         try:
@@ -1848,11 +3409,9 @@ class QuantyDockWidget(QDockWidget):
             else:
                 if len(results) > 1 and result.experiment in ['RIXS', ]:
                     continue
-                for spectrum in result.spectra.processed:
-                    spectrum.legend = '{}-{}'.format(
-                        result.index, spectrum.shortName)
-                    if spectrum.name in result.spectra.toPlotChecked:
-                        spectrum.plot(plotWidget=pw)
+                result.spectra.processed.plot(
+                    plotWidget=pw, names=result.spectra.toPlotChecked,
+                    prefix=result.index)
 
     def showResultDetailsDialog(self):
         self.resultDetailsDialog.show()
@@ -1879,18 +3438,6 @@ class QuantyDockWidget(QDockWidget):
                            'that the file is properly formatted.')
                 self.getStatusBar().showMessage(message, self.timeout)
 
-    def handleOutputLogging(self):
-        self.process.setReadChannel(QProcess.StandardOutput)
-        data = self.process.readAllStandardOutput().data()
-        data = data.decode('utf-8').rstrip()
-        self.getLoggerWidget().appendPlainText(data)
-        self.state.output = self.state.output + data
-
-    def handleErrorLogging(self):
-        self.process.setReadChannel(QProcess.StandardError)
-        data = self.process.readAllStandardError().data()
-        self.getLoggerWidget().appendPlainText(data.decode('utf-8'))
-
     def updateMainWindowTitle(self, name=None):
         if name is None:
             title = 'Crispy'
@@ -1932,6 +3479,19 @@ class QuantyDockWidget(QDockWidget):
     def doRemoveFiles(self):
         return self.settings.value('Quanty/RemoveFiles', True, type=bool)
 
+    def getMaxJobs(self):
+        return self.settings.value(
+            'Quanty/MaxJobs', multiprocessing.cpu_count(), type=int)
+
+    def getEnergyParts(self):
+        return self.settings.value('Quanty/EnergyParts', 1, type=int)
+
+    def doSplitSpectra(self):
+        return self.settings.value('Quanty/SplitSpectra', False, type=bool)
+
+    def doCacheResults(self):
+        return self.settings.value('Quanty/CacheResults', True, type=bool)
+
 
 class QuantyPreferencesDialog(QDialog):
 
@@ -1942,6 +3502,7 @@ class QuantyPreferencesDialog(QDialog):
         loadUi(path, baseinstance=self, package='crispy.gui')
 
         self.pathBrowsePushButton.clicked.connect(self.setExecutablePath)
+        self.clearCachePushButton.clicked.connect(self.clearResultCache)
 
         ok = self.buttonBox.button(QDialogButtonBox.Ok)
         ok.clicked.connect(self.acceptSettings)
@@ -2023,8 +3584,23 @@ class QuantyPreferencesDialog(QDialog):
             removeFiles = False
         self.removeFilesCheckBox.setChecked(removeFiles)
 
+        cacheResults = self.settings.value('CacheResults', True, type=bool)
+        self.cacheResultsCheckBox.setChecked(cacheResults)
+
+        maxJobs = self.settings.value(
+            'MaxJobs', multiprocessing.cpu_count(), type=int)
+        self.maxJobsSpinBox.setValue(maxJobs)
+
+        energyParts = self.settings.value('EnergyParts', 1, type=int)
+        self.energyPartsSpinBox.setValue(energyParts)
+
+        splitSpectra = self.settings.value('SplitSpectra', False, type=bool)
+        self.splitSpectraCheckBox.setChecked(splitSpectra)
+
         self.settings.endGroup()
 
+        self.updateResultCacheInfo()
+
     def saveSettings(self):
         if self.settings is None:
             return
@@ -2035,6 +3611,13 @@ class QuantyPreferencesDialog(QDialog):
         self.settings.setValue('DenseBorder', self.denseBorderLineEdit.text())
         self.settings.setValue(
             'RemoveFiles', self.removeFilesCheckBox.isChecked())
+        self.settings.setValue(
+            'CacheResults', self.cacheResultsCheckBox.isChecked())
+        self.settings.setValue('MaxJobs', self.maxJobsSpinBox.value())
+        self.settings.setValue(
+            'EnergyParts', self.energyPartsSpinBox.value())
+        self.settings.setValue(
+            'SplitSpectra', self.splitSpectraCheckBox.isChecked())
         self.settings.setValue('Size', self.size())
         self.settings.setValue('Position', self.pos())
         self.settings.endGroup()
@@ -2055,6 +3638,16 @@ class QuantyPreferencesDialog(QDialog):
         if path:
             self.pathLineEdit.setText(path)
 
+    def updateResultCacheInfo(self):
+        info = getResultCache().info()
+        text = '{} hits, {} misses, {:.1f} MB'.format(
+            info['hits'], info['misses'], info['size'] / 2**20)
+        self.resultCacheInfoLabel.setText(text)
+
+    def clearResultCache(self):
+        getResultCache().clear()
+        self.updateResultCacheInfo()
+
 
 class QuantyResultDetailsDialog(QDialog):
 
@@ -2092,7 +3685,9 @@ class QuantyResultDetailsDialog(QDialog):
         self.xShiftLineEdit.returnPressed.connect(self.updateShift)
         self.yShiftLineEdit.returnPressed.connect(self.updateShift)
         self.xGaussianLineEdit.returnPressed.connect(self.updateBroadening)
+        self.xLorentzianLineEdit.returnPressed.connect(self.updateBroadening)
         self.yGaussianLineEdit.returnPressed.connect(self.updateBroadening)
+        self.yLorentzianLineEdit.returnPressed.connect(self.updateBroadening)
 
         self.summaryPlainTextEdit.setFont(font)
         self.inputPlainTextEdit.setFont(font)
@@ -2122,11 +3717,13 @@ class QuantyResultDetailsDialog(QDialog):
                 self.axesTabWidget.setTabText(1, self.state.yLabel)
             self.scaleLineEdit.setEnabled(False)
             self.normalizationComboBox.setEnabled(False)
+            self.xLorentzianLineEdit.setEnabled(False)
         else:
             self.axesTabWidget.removeTab(1)
             self.axesTabWidget.setTabText(0, self.state.xLabel)
             self.scaleLineEdit.setEnabled(True)
             self.normalizationComboBox.setEnabled(True)
+            self.xLorentzianLineEdit.setEnabled(True)
 
         xShift, yShift = self.state.spectra.shift
         self.xShiftLineEdit.setValue(xShift)
@@ -2215,53 +3812,121 @@ class QuantyResultDetailsDialog(QDialog):
         self.updateResultsModelData()
 
     def updateBroadening(self):
-        self.updateXGaussian()
+        parent = self.parent()
+        spectra = self.state.spectra
+        rixs = self.state.experiment in ['RIXS', ]
+
+        # The results saved by earlier versions don't store the Lorentzian
+        # broadening applied by Quanty.
+        if spectra.appliedLorentzian is None:
+            spectra.appliedLorentzian = self.state.appliedLorentzian()
+
+        # Read all the broadenings before changing the state, so that it
+        # is left unchanged if one of them is rejected.
+        xGaussian = self.getXGaussian()
+        xLorentzian = self.getXLorentzian()
+        if xGaussian is None or xLorentzian is None:
+            return
 
-        if self.state.experiment in ['RIXS', ]:
-            self.updateYGaussian()
-            broadenings = {
-                'gaussian': (
-                    self.state.xGaussian,
-                    self.state.yGaussian),
-                'lorentzian': (
-                    self.state.xLorentzian,
-                    self.state.yLorentzian)}
+        yGaussian = self.state.yGaussian
+        yLorentzian = self.state.yLorentzian
+        if rixs:
+            yGaussian = self.getYGaussian()
+            yLorentzian = self.getYLorentzian()
+            if yGaussian is None or yLorentzian is None:
+                return
+
+        if rixs:
+            # The Lorentzian broadening along the incident energy is set by
+            # the template, and is not changed here.
+            gaussian = (xGaussian, yGaussian)
+            lorentzian = (spectra.appliedLorentzian[0], yLorentzian)
         else:
-            broadenings = {
-                'gaussian': (
-                    self.state.xGaussian, ),
-                'lorentzian': (
-                    self.state.xLorentzian, )}
+            gaussian = (xGaussian, )
+            lorentzian = (xLorentzian, )
+
+        broadenings = {'gaussian': gaussian, }
+        if (xLorentzian != self.state.xLorentzian
+                or yLorentzian != self.state.yLorentzian):
+            broadenings['lorentzian'] = lorentzian
+        elif 'lorentzian' in spectra.broadenings:
+            broadenings['lorentzian'] = spectra.broadenings['lorentzian']
+
+        # Only the part of the Lorentzian broadening that was not applied by
+        # Quanty is added to the spectra; check that this is possible.
+        try:
+            spectra.postBroadenings(broadenings)
+        except ValueError as e:
+            parent.getStatusBar().showMessage(str(e), parent.timeout)
+            self.xGaussianLineEdit.setValue(self.state.xGaussian)
+            self.xLorentzianLineEdit.setList(self.state.xLorentzian)
+            self.yGaussianLineEdit.setValue(self.state.yGaussian)
+            self.yLorentzianLineEdit.setList(self.state.yLorentzian)
+            return
 
-        self.state.spectra.broadenings = copy.deepcopy(broadenings)
-        self.state.spectra.process()
+        self.state.xGaussian = xGaussian
+        self.state.xLorentzian = xLorentzian
+        parent.xGaussianLineEdit.setValue(xGaussian)
+        parent.xLorentzianLineEdit.setList(xLorentzian)
+        if rixs:
+            self.state.yGaussian = yGaussian
+            self.state.yLorentzian = yLorentzian
+            parent.yGaussianLineEdit.setValue(yGaussian)
+            parent.yLorentzianLineEdit.setList(yLorentzian)
+
+        spectra.broadenings = copy.deepcopy(broadenings)
+        spectra.process()
         self.updateResultsModelData()
 
-    def updateXGaussian(self):
+    def getXGaussian(self):
+        return self.getGaussian(self.xGaussianLineEdit, self.state.xGaussian)
+
+    def getYGaussian(self):
+        return self.getGaussian(self.yGaussianLineEdit, self.state.yGaussian)
+
+    def getGaussian(self, lineEdit, value):
         parent = self.parent()
-        xGaussian = self.xGaussianLineEdit.getValue()
+        gaussian = lineEdit.getValue()
 
-        if xGaussian < 0:
+        if gaussian < 0:
             message = 'The broadening cannot be negative.'
             parent.getStatusBar().showMessage(message, parent.timeout)
-            self.xGaussianLineEdit.setValue(self.state.xGaussian)
-            return
+            lineEdit.setValue(value)
+            return None
 
-        parent.xGaussianLineEdit.setValue(xGaussian)
-        self.state.xGaussian = xGaussian
+        return gaussian
 
-    def updateYGaussian(self):
+    def getXLorentzian(self):
+        return self.getLorentzian(
+            self.xLorentzianLineEdit, self.state.xLorentzian)
+
+    def getYLorentzian(self):
+        return self.getLorentzian(
+            self.yLorentzianLineEdit, self.state.yLorentzian)
+
+    def getLorentzian(self, lineEdit, values):
         parent = self.parent()
-        yGaussian = self.yGaussianLineEdit.getValue()
+        try:
+            lorentzian = lineEdit.getList()
+        except ValueError:
+            message = 'Invalid data for the Lorentzian brodening.'
+            parent.getStatusBar().showMessage(message, parent.timeout)
+            lineEdit.setList(values)
+            return None
 
-        if yGaussian < 0:
+        if len(lorentzian) > 3:
+            message = 'The broadening can have at most three elements.'
+            parent.getStatusBar().showMessage(message, parent.timeout)
+            lineEdit.setList(values)
+            return None
+
+        if min(lorentzian[:2]) < 0:
             message = 'The broadening cannot be negative.'
             parent.getStatusBar().showMessage(message, parent.timeout)
-            self.yGaussianLineEdit.setValue(self.state.yGaussian)
-            return
+            lineEdit.setList(values)
+            return None
 
-        parent.yGaussianLineEdit.setValue(yGaussian)
-        self.state.yGaussian = yGaussian
+        return lorentzian
 
     def enableWidget(self, flag):
         self.summaryPlainTextEdit.setEnabled(flag)
@@ -2271,7 +3936,9 @@ class QuantyResultDetailsDialog(QDialog):
         self.xShiftLineEdit.setEnabled(flag)
         self.yShiftLineEdit.setEnabled(flag)
         self.xGaussianLineEdit.setEnabled(flag)
+        self.xLorentzianLineEdit.setEnabled(flag)
         self.yGaussianLineEdit.setEnabled(flag)
+        self.yLorentzianLineEdit.setEnabled(flag)
         self.inputPlainTextEdit.setEnabled(flag)
         self.outputPlainTextEdit.setEnabled(flag)
 
@@ -0,0 +1,218 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import numpy as np
+import os
+
+from PyQt5.QtWidgets import QDialog, QFileDialog
+from PyQt5.uic import loadUi
+from silx.resources import resource_filename as resourceFileName
+
+from ..sweep import Sweep, parameter_paths as parameterPaths
+
+
+class QuantySweepDialog(QDialog):
+    """
+    Dialog to sweep one or two parameters of the current calculation of
+    the Quanty dock widget. The calculations run in the queue of the dock
+    widget; once they are done, the map of the first parameter versus the
+    energy is plotted.
+    """
+
+    def __init__(self, dockWidget, parent=None):
+        super(QuantySweepDialog, self).__init__(parent)
+
+        path = resourceFileName('uis:quanty/sweep.ui')
+        loadUi(path, baseinstance=self, package='crispy.gui')
+
+        self.dockWidget = dockWidget
+        self.sweep = None
+        self.stack = None
+        self.jobs = dict()
+
+        self.firstParameterComboBox.currentTextChanged.connect(
+            self.updateFirstRange)
+        self.secondParameterComboBox.currentTextChanged.connect(
+            self.updateSecondRange)
+        self.secondParameterCheckBox.toggled.connect(
+            self.enableSecondParameter)
+        self.enableSecondParameter(False)
+
+        self.runPushButton.clicked.connect(self.runSweep)
+        self.savePushButton.clicked.connect(self.saveSweep)
+        self.buttonBox.rejected.connect(self.close)
+
+    def showEvent(self, event):
+        self.populateWidget()
+        super(QuantySweepDialog, self).showEvent(event)
+
+    def populateWidget(self):
+        paths = parameterPaths(self.dockWidget.state)
+        for comboBox in (self.firstParameterComboBox,
+                         self.secondParameterComboBox):
+            current = comboBox.currentText()
+            comboBox.blockSignals(True)
+            comboBox.clear()
+            comboBox.addItems(paths)
+            if current in paths:
+                comboBox.setCurrentText(current)
+            comboBox.blockSignals(False)
+        self.updateFirstRange()
+        self.updateSecondRange()
+
+    def enableSecondParameter(self, flag):
+        self.secondParameterComboBox.setEnabled(flag)
+        self.secondStartLineEdit.setEnabled(flag)
+        self.secondStopLineEdit.setEnabled(flag)
+        self.secondPointsLineEdit.setEnabled(flag)
+
+    def currentValue(self, path):
+        """Return the current value of the parameter, without scale factor."""
+        state = self.dockWidget.state
+        if '/' not in path:
+            return getattr(state, path)
+        term, configuration, parameter = path.split('/')
+        value = state.hamiltonianData[term][configuration][parameter]
+        if isinstance(value, list):
+            value = value[0]
+        return value
+
+    def updateRange(self, path, startLineEdit, stopLineEdit):
+        # Start the range of new parameters at their current value.
+        if not path:
+            return
+        value = self.currentValue(path)
+        startLineEdit.setValue(value)
+        stopLineEdit.setValue(value)
+
+    def updateFirstRange(self):
+        self.updateRange(
+            self.firstParameterComboBox.currentText(),
+            self.firstStartLineEdit, self.firstStopLineEdit)
+
+    def updateSecondRange(self):
+        self.updateRange(
+            self.secondParameterComboBox.currentText(),
+            self.secondStartLineEdit, self.secondStopLineEdit)
+
+    def getParameters(self):
+        rows = [(self.firstParameterComboBox, self.firstStartLineEdit,
+                 self.firstStopLineEdit, self.firstPointsLineEdit)]
+        if self.secondParameterCheckBox.isChecked():
+            rows.append((self.secondParameterComboBox,
+                         self.secondStartLineEdit, self.secondStopLineEdit,
+                         self.secondPointsLineEdit))
+
+        parameters = list()
+        for comboBox, startLineEdit, stopLineEdit, pointsLineEdit in rows:
+            points = pointsLineEdit.getValue()
+            if points < 1:
+                raise ValueError('The number of points must be positive.')
+            values = np.linspace(
+                startLineEdit.getValue(), stopLineEdit.getValue(), points)
+            parameters.append((comboBox.currentText(), values))
+        return parameters
+
+    def runSweep(self):
+        try:
+            self.sweep = Sweep(self.dockWidget.state, self.getParameters())
+        except ValueError as e:
+            self.statusLabel.setText(str(e))
+            return
+
+        self.stack = None
+        self.savePushButton.setEnabled(False)
+
+        # The jobs are followed from the start, since some of them can
+        # finish, or fail, while they are submitted.
+        self.jobs = dict()
+        jobs = self.dockWidget.submitCalculations(
+            self.sweep.calculations(), appendResults=False,
+            changed=self.updateJob)
+        if jobs is None:
+            self.statusLabel.setText('The calculations could not be started.')
+            return
+
+        self.jobs = dict((job, index) for index, job in enumerate(jobs))
+        self.updateStatus()
+        for job in jobs:
+            self.updateJob(job)
+
+    def updateJob(self, job):
+        if job not in self.jobs or not job.isDone():
+            return
+
+        index = self.jobs.pop(job)
+        if job.status == 'Finished':
+            self.sweep.setResult(index, job.state)
+        else:
+            self.sweep.setResult(index, RuntimeError(job.status))
+        self.updateStatus()
+
+        if self.sweep.isComplete():
+            self.plotSweep()
+
+    def updateStatus(self):
+        done = sum(result is not None for result in self.sweep.results)
+        failed = sum(isinstance(result, Exception)
+                     for result in self.sweep.results)
+        message = '{} of {} calculations done'.format(done, self.sweep.size)
+        if failed:
+            message += ', {} failed'.format(failed)
+        self.statusLabel.setText(message + '.')
+
+    def plotSweep(self):
+        try:
+            self.stack = self.sweep.stack()
+        except ValueError as e:
+            self.statusLabel.setText(str(e))
+            return
+        self.savePushButton.setEnabled(True)
+
+        try:
+            image = self.stack.image()
+        except ValueError:
+            # The maps of sweeps of 2D spectra are not plotted.
+            return
+        plotWidget = self.dockWidget.getPlotWidget()
+        plotWidget.reset()
+        image.plot(plotWidget=plotWidget)
+
+    def saveSweep(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, 'Save Sweep',
+            os.path.join(self.dockWidget.getCurrentPath(), '{}.npz'.format(
+                self.dockWidget.state.baseName)), 'NumPy File (*.npz)')
+
+        if path:
+            self.dockWidget.setCurrentPath(path)
+            self.stack.save(path)
@@ -0,0 +1,237 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+
+def executable_identity(path):
+    """
+    Return a string identifying an executable: its real path, size and
+    modification time. A new version of Quanty changes the identity. If the
+    executable cannot be found, e.g. it is given by name, only the path is
+    used.
+    """
+    path = os.path.realpath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return path
+    return '{}:{}:{!r}'.format(path, stat.st_size, stat.st_mtime)
+
+
+class ResultCache(object):
+    """
+    Content-addressed cache of the results of Quanty calculations. The key
+    of a calculation is the hash of its input together with the identity of
+    the executable (see key); the entry is a directory with the .spec files
+    and the standard output of the calculation.
+
+    Entries are evicted in least recently used order when the size of the
+    cache exceeds maxsize bytes. The number of hits and misses is kept in
+    the cache directory, so it survives between sessions.
+    """
+
+    OUTPUT = 'output.txt'
+    STATISTICS = 'statistics.json'
+
+    def __init__(self, directory, maxsize=512 * 2**20):
+        self.directory = directory
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text, executable):
+        """
+        Return the key of a calculation, from the text of its input and the
+        path of the executable.
+        """
+        digest = hashlib.sha256()
+        digest.update(executable_identity(executable).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def entries(self):
+        """Return the paths of the entries, least recently used first."""
+        entries = list()
+        try:
+            prefixes = os.listdir(self.directory)
+        except OSError:
+            return entries
+
+        for prefix in prefixes:
+            directory = os.path.join(self.directory, prefix)
+            if len(prefix) != 2 or not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                # Skip the entries that are being written.
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError:
+                    continue
+                entries.append((mtime, path))
+        return [path for _, path in sorted(entries)]
+
+    @staticmethod
+    def _size(path):
+        size = 0
+        for name in os.listdir(path):
+            try:
+                size += os.path.getsize(os.path.join(path, name))
+            except OSError:
+                pass
+        return size
+
+    def size(self):
+        """Return the size of the cached results, in bytes."""
+        return sum(self._size(path) for path in self.entries())
+
+    def statistics(self):
+        try:
+            with open(os.path.join(self.directory, self.STATISTICS)) as fp:
+                return json.load(fp)
+        except (IOError, OSError, ValueError):
+            return {'hits': 0, 'misses': 0}
+
+    def _count(self, name):
+        statistics = self.statistics()
+        statistics[name] = statistics.get(name, 0) + 1
+        try:
+            self._makedirs(self.directory)
+            path = os.path.join(self.directory, self.STATISTICS)
+            with open(path, 'w') as fp:
+                json.dump(statistics, fp)
+        except (IOError, OSError):
+            pass
+
+    def info(self):
+        statistics = self.statistics()
+        return {
+            'hits': statistics.get('hits', 0),
+            'misses': statistics.get('misses', 0),
+            'entries': len(self.entries()),
+            'size': self.size(),
+            'maxsize': self.maxsize,
+        }
+
+    @staticmethod
+    def _makedirs(path):
+        try:
+            os.makedirs(path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def __contains__(self, key):
+        return os.path.isdir(self.path(key))
+
+    def restore(self, key, directory):
+        """
+        Copy the .spec files of a cached calculation to a directory, and
+        return its standard output, or None if the calculation is not in the
+        cache.
+        """
+        with self._lock:
+            path = self.path(key)
+            try:
+                names = os.listdir(path)
+                with open(os.path.join(path, self.OUTPUT), 'rb') as fp:
+                    output = fp.read().decode('utf-8')
+                for name in names:
+                    if name != self.OUTPUT:
+                        shutil.copy(os.path.join(path, name), directory)
+                # Mark the entry as the most recently used.
+                os.utime(path, None)
+            except (IOError, OSError):
+                self._count('misses')
+                return None
+
+            self._count('hits')
+            return output
+
+    def store(self, key, paths, output):
+        """
+        Add the .spec files and the standard output of a calculation to the
+        cache, and evict the least recently used entries if needed.
+        """
+        with self._lock:
+            path = self.path(key)
+            if os.path.isdir(path):
+                os.utime(path, None)
+                return
+
+            # The entry is written to a temporary directory first, so that
+            # an incomplete entry is never used.
+            temporaryPath = '{}.{}.tmp'.format(path, os.getpid())
+            try:
+                self._makedirs(temporaryPath)
+                for name in paths:
+                    shutil.copy(name, temporaryPath)
+                outputPath = os.path.join(temporaryPath, self.OUTPUT)
+                with open(outputPath, 'wb') as fp:
+                    fp.write(output.encode('utf-8'))
+                os.rename(temporaryPath, path)
+            except (IOError, OSError):
+                shutil.rmtree(temporaryPath, ignore_errors=True)
+                return
+
+            self._evict()
+
+    def _evict(self):
+        entries = [(path, self._size(path)) for path in self.entries()]
+        size = sum(entrySize for _, entrySize in entries)
+        for path, entrySize in entries:
+            if size <= self.maxsize:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            size -= entrySize
+
+    def clear(self):
+        """Remove all the entries and reset the statistics."""
+        with self._lock:
+            for path in self.entries():
+                shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.remove(os.path.join(self.directory, self.STATISTICS))
+            except OSError:
+                pass
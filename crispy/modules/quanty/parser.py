@@ -0,0 +1,463 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import functools
+import glob
+import hashlib
+import multiprocessing
+import numpy as np
+import os
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+
+# Number of lines of the header of the .spec files written by Quanty.
+SPEC_HEADER_LINES = 5
+
+
+def read_spec_header(fp):
+    """
+    Read the header of a .spec file written by Quanty. The file object must
+    be opened in binary mode; it is left at the beginning of the data.
+
+    The header looks like:
+
+        #Spectra: 1
+        Emin______Emax      -1.483413864938448E+01  2.516586135061552E+01
+        EminPole__EmaxPole  -4.750265030879186E+00  1.541361602383059E+01
+        dE________Gamma      4.000000000000000E-02  1.000000000000000E-01
+        Energy               Re[0]                  Im[0]
+
+    The data has one line for each energy, and a pair of columns, the real
+    and the imaginary part, for each spectrum.
+    """
+    lines = [fp.readline().decode('ascii') for _ in range(SPEC_HEADER_LINES)]
+
+    try:
+        header = {
+            'spectra': int(lines[0].split(':')[1]),
+            'emin': float(lines[1].split()[1]),
+            'emax': float(lines[1].split()[2]),
+            'eminPole': float(lines[2].split()[1]),
+            'emaxPole': float(lines[2].split()[2]),
+            'dE': float(lines[3].split()[1]),
+            'gamma': float(lines[3].split()[2]),
+        }
+    except (IndexError, ValueError):
+        raise ValueError('Invalid header of the .spec file.')
+
+    points = (header['emax'] - header['emin']) / header['dE']
+    header['points'] = int(round(points)) + 1
+    return header
+
+
+def _fixed_width_columns(data, spectra):
+    """
+    Return the imaginary parts of the spectra from the data of a .spec file,
+    or None if the lines don't have fixed width columns. Only the characters
+    of the required columns are converted to numbers.
+    """
+    end = data.find(b'\n')
+    if end < 0:
+        return None
+
+    line = data[:end + 1]
+    content = line.rstrip(b'\r\n')
+    if not content.strip():
+        return None
+
+    # The width of the energy column and of the columns of the spectra.
+    energy = content.split()[0]
+    energyWidth = content.index(energy) + len(energy)
+    width, remainder = divmod(len(content) - energyWidth, 2 * spectra)
+    if width == 0 or remainder != 0:
+        return None
+
+    # Make sure that the last line ends like the others.
+    eol = line[len(content):]
+    if not data.endswith(eol):
+        data = data.rstrip(b'\r\n') + eol
+    if len(data) % len(line) != 0:
+        return None
+
+    lines = np.frombuffer(data, dtype=np.uint8).reshape(-1, len(line))
+    # Each line must end in the same place.
+    if np.any(lines[:, -1] != ord('\n')):
+        return None
+
+    columns = lines[:, energyWidth:energyWidth + 2 * spectra * width]
+    columns = columns.reshape(-1, spectra, 2, width)[:, :, 1, :]
+    columns = np.ascontiguousarray(columns)
+    return columns.view('S{}'.format(width)).reshape(-1, spectra)
+
+
+def read_spec(path, out=None):
+    """
+    Read the spectra from a .spec file written by Quanty. The result is the
+    imaginary part of the spectra, i.e. the intensities, as an array of
+    shape (energies, spectra); it is equivalent to:
+
+        np.loadtxt(path, skiprows=5)[:, 2::2]
+
+    Quanty writes fixed width columns; in this case only the characters of
+    the imaginary parts are converted to numbers. If out is given, the
+    result is written in it; it must have the same number of elements.
+    """
+    with open(path, 'rb') as fp:
+        header = read_spec_header(fp)
+        spectra = header['spectra']
+        columns = _fixed_width_columns(fp.read(), spectra)
+
+    if columns is None:
+        columns = np.loadtxt(
+            path, skiprows=SPEC_HEADER_LINES, ndmin=2,
+            usecols=range(2, 2 * spectra + 1, 2))
+
+    # The file can still be written by Quanty.
+    if columns.shape[0] < header['points']:
+        raise ValueError('The .spec file is incomplete.')
+
+    if out is None:
+        return columns.astype(np.float64)
+
+    if out.size != columns.size:
+        raise ValueError('The output array has the wrong number of elements.')
+    out[...] = columns.reshape(out.shape)
+    return out
+
+
+def read_spec_columns(path):
+    """
+    Read all the columns of a .spec file written by Quanty. Return the
+    header (see read_spec_header), the energies, and the complex spectra as
+    an array of shape (energies, spectra).
+    """
+    with open(path, 'rb') as fp:
+        header = read_spec_header(fp)
+
+    columns = np.loadtxt(path, skiprows=SPEC_HEADER_LINES, ndmin=2)
+    if columns.shape[1] != 2 * header['spectra'] + 1:
+        raise ValueError('Invalid number of columns in the .spec file.')
+
+    spectra = columns[:, 1::2] + 1j * columns[:, 2::2]
+    return header, columns[:, 0], spectra
+
+
+def write_spec(path, header, energies, spectra):
+    """
+    Write spectra in the format of the .spec files written by Quanty. The
+    header gives the positions of the poles, the step and the broadening
+    (see read_spec_header); the spectra are complex, with shape (energies,
+    spectra). Quanty writes 16 significant digits, so the values read from
+    its files are written back unchanged.
+    """
+    spectra = np.asarray(spectra, dtype=np.complex128).reshape(
+        len(energies), -1)
+
+    lines = list()
+    lines.append('#Spectra: {}'.format(spectra.shape[1]))
+    lines.append('Emin______Emax      {:22.15E} {:22.15E}'.format(
+        energies[0], energies[-1]))
+    lines.append('EminPole__EmaxPole  {:22.15E} {:22.15E}'.format(
+        header['eminPole'], header['emaxPole']))
+    lines.append('dE________Gamma     {:22.15E} {:22.15E}'.format(
+        header['dE'], header['gamma']))
+    lines.append('Energy            ' + ''.join(
+        '  {:<21}  {:<21}'.format('Re[{}]'.format(i), 'Im[{}]'.format(i))
+        for i in range(spectra.shape[1])))
+
+    columns = np.empty((len(energies), 2 * spectra.shape[1]))
+    columns[:, 0::2] = spectra.real
+    columns[:, 1::2] = spectra.imag
+    fmt = '{:22.15E}' + ' {:22.15E}' * columns.shape[1]
+    for energy, row in zip(energies, columns):
+        lines.append(fmt.format(energy, *row))
+
+    with open(path, 'w') as fp:
+        fp.write('\n'.join(lines) + '\n')
+
+
+def spec_cache_path(path):
+    """
+    Return the path of the binary sidecar of a .spec file. The name of the
+    sidecar depends on the absolute path, the size and the modification
+    time of the file; the sidecar of a modified file is never used.
+    """
+    stat = os.stat(path)
+    key = '{}:{}:{!r}'.format(
+        os.path.abspath(path), stat.st_size, stat.st_mtime)
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    directory, name = os.path.split(path)
+    return os.path.join(directory, '.{}.{}.npy'.format(name, digest))
+
+
+def remove_spec_cache(path):
+    """Remove the binary sidecars of a .spec file."""
+    directory, name = os.path.split(path)
+    pattern = os.path.join(directory, '.{}.*.npy'.format(name))
+    for sidecar in glob.glob(pattern):
+        try:
+            os.remove(sidecar)
+        except OSError:
+            pass
+
+
+def load_spec(path, cache=True, mmap_mode='r'):
+    """
+    Same as read_spec, but the parsed spectra are stored in a binary sidecar
+    next to the .spec file (see spec_cache_path). When the file is read
+    again, the sidecar is memory-mapped instead of parsing the text. The
+    sidecars of earlier versions of the file are removed.
+    """
+    if not cache:
+        return read_spec(path)
+
+    cachePath = spec_cache_path(path)
+    try:
+        return np.load(cachePath, mmap_mode=mmap_mode)
+    except (IOError, OSError, ValueError):
+        pass
+
+    data = read_spec(path)
+
+    remove_spec_cache(path)
+    # Write to a temporary file first, so that a partially written sidecar
+    # is never used.
+    temporaryPath = '{}.{}.tmp'.format(cachePath, os.getpid())
+    try:
+        with open(temporaryPath, 'wb') as fp:
+            np.save(fp, data)
+        os.rename(temporaryPath, cachePath)
+    except (IOError, OSError):
+        try:
+            os.remove(temporaryPath)
+        except OSError:
+            pass
+
+    return data
+
+
+def load_specs(paths, cache=True, processes=None):
+    """
+    Load several .spec files concurrently, using a pool of threads (see
+    load_spec). The spectra are returned in the order of the paths. The
+    number of threads defaults to the number of files, but is at most the
+    number of processors.
+    """
+    paths = list(paths)
+    if processes is None:
+        processes = min(len(paths), multiprocessing.cpu_count())
+
+    if processes < 2:
+        return [load_spec(path, cache) for path in paths]
+
+    pool = ThreadPool(processes)
+    try:
+        return pool.map(functools.partial(load_spec, cache=cache), paths)
+    finally:
+        pool.close()
+        pool.join()
+
+
+class OutputParser(object):
+    """
+    Incremental parser of the standard output of Quanty. The output is fed
+    as it arrives, in chunks that don't have to end with complete lines.
+
+    The parser records the duration of the phases of the calculation: the
+    'eigensystem' phase lasts until the analysis of the initial Hamiltonian
+    is printed, and the 'spectra' phase until the end of the calculation.
+    The table with the analysis is available as a list of rows, each a
+    dictionary indexed by the column names.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.start = self.clock()
+        self.phases = OrderedDict()
+        self.phase = None
+        self.analysis = None
+        self.lines = list()
+        self._buffer = ''
+        self._table = None
+        self.begin_phase('eigensystem')
+
+    def begin_phase(self, name):
+        now = self.clock()
+        if self.phase is not None:
+            self.phases[self.phase][1] = now
+        self.phases[name] = [now, None]
+        self.phase = name
+
+    def finish(self):
+        """Mark the end of the calculation."""
+        if self._buffer:
+            self.feed('\n')
+        if self.phase is not None:
+            self.phases[self.phase][1] = self.clock()
+            self.phase = None
+
+    def timings(self):
+        """Return the duration of each phase, in seconds."""
+        now = self.clock()
+        timings = OrderedDict()
+        for name, (start, stop) in self.phases.items():
+            timings[name] = (stop if stop is not None else now) - start
+        return timings
+
+    def feed(self, text):
+        """
+        Parse a chunk of the output, and return the list of events that it
+        triggered, e.g. ['analysis'] once the table with the analysis of the
+        initial Hamiltonian is complete.
+        """
+        events = list()
+        lines = (self._buffer + text).split('\n')
+        self._buffer = lines.pop()
+        for line in lines:
+            line = line.rstrip('\r')
+            self.lines.append(line)
+            event = self._parse_line(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _parse_line(self, line):
+        if line.startswith('Analysis of the initial Hamiltonian'):
+            self._table = {'columns': None, 'rows': list(), 'rules': 0}
+            return
+
+        table = self._table
+        if table is None:
+            return
+
+        if line.startswith('='):
+            table['rules'] += 1
+            # The table is delimited by three horizontal rules.
+            if table['rules'] == 3:
+                self.analysis = table['rows']
+                self._table = None
+                self.begin_phase('spectra')
+                return 'analysis'
+        elif table['rules'] == 1:
+            table['columns'] = line.split()
+        elif table['rules'] == 2 and line.strip():
+            row = OrderedDict()
+            for column, value in zip(table['columns'], line.split()):
+                try:
+                    row[column] = int(value)
+                except ValueError:
+                    row[column] = float(value)
+            table['rows'].append(row)
+
+
+class SpecWatcher(object):
+    """
+    Watch for the .spec files of a running calculation. Each call of poll
+    returns the files that were completely written since the previous call,
+    together with their spectra, and records when they became available.
+    Files left by an earlier calculation are ignored until they change.
+
+    The polling can also be done in two steps, so that the files are read
+    in another thread: ready checks, using only the status of the files,
+    which ones can be read; read reads them without changing the watcher,
+    and update records the result.
+    """
+
+    def __init__(self, paths, clock=time.time):
+        self.paths = list(paths)
+        self.clock = clock
+        self.start = self.clock()
+        self.times = OrderedDict()
+        self._stats = dict()
+        self._failed = dict()
+        self._initial = dict()
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            self._initial[path] = (stat.st_size, stat.st_mtime)
+
+    @property
+    def pending(self):
+        return [path for path in self.paths if path not in self.times]
+
+    def ready(self):
+        """Return the pending files that can be read."""
+        paths = list()
+        for path in self.pending:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            # Wait until the file doesn't change between two calls; a
+            # complete file is also required to have all the energies.
+            # Files that could not be read are retried once they change.
+            key = (stat.st_size, stat.st_mtime)
+            if self._initial.get(path) == key:
+                continue
+            if self._stats.get(path) != key:
+                self._stats[path] = key
+                continue
+            if self._failed.get(path) == key:
+                continue
+
+            paths.append(path)
+        return paths
+
+    @staticmethod
+    def read(paths):
+        """Read the files; those that cannot be read are left out."""
+        spectra = OrderedDict()
+        for path in paths:
+            try:
+                spectra[path] = read_spec(path)
+            except (IOError, OSError, ValueError):
+                continue
+        return spectra
+
+    def update(self, paths, spectra):
+        """Record the spectra read from the files returned by ready."""
+        for path in paths:
+            if path in spectra:
+                self.times[path] = self.clock() - self.start
+            else:
+                self._failed[path] = self._stats.get(path)
+
+    def poll(self):
+        paths = self.ready()
+        spectra = self.read(paths)
+        self.update(paths, spectra)
+        return spectra
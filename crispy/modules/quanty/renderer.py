@@ -0,0 +1,360 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import glob
+import gzip
+import json
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+from silx.resources import resource_filename
+
+
+# The placeholders start with a dollar sign, and can contain parentheses,
+# e.g. $F2(3d,3d)_i_value.
+PLACEHOLDER = re.compile(r'(\$(?:[A-Za-z0-9_]|\([^()\s]*\))+)')
+
+# The placeholders of the Hamiltonian parameters, e.g. $zeta(3d)_i_value,
+# $F2(3d,3d)_f_scale, or $H_crystal_field.
+PARAMETER_PLACEHOLDER = re.compile(r'^\$(?:H_.*|.*_[imf]_(?:value|scale))$')
+
+# Names of the Greek letters used in the names of the parameters.
+GREEK_LETTERS = (
+    ('ζ', 'zeta'), ('Δ', 'Delta'), ('σ', 'sigma'), ('τ', 'tau'),
+    ('μ', 'mu'), ('ν', 'nu'))
+
+CONFIGURATION_SUFFIXES = (('Initial', 'i'), ('Intermediate', 'm'),
+                          ('Final', 'f'))
+
+
+_parameter_names = dict()
+
+
+def parameter_name(parameter):
+    """Return the name of a parameter as used in the templates."""
+    try:
+        return _parameter_names[parameter]
+    except KeyError:
+        pass
+    name = parameter
+    for letter, replacement in GREEK_LETTERS:
+        name = name.replace(letter, replacement)
+    _parameter_names[parameter] = name
+    return name
+
+
+def term_suffix(term):
+    """
+    Return the suffix of a Hamiltonian term as used in the templates, e.g.
+    3d_ligands_hybridization_lmct for 3d-Ligands Hybridization (LMCT).
+    """
+    term = term.lower()
+    replacements = [(' ', '_'), ('-', '_'), ('(', ''), (')', '')]
+    for replacement in replacements:
+        term = term.replace(*replacement)
+    return term
+
+
+def configuration_suffix(label):
+    """Return the suffix of the parameters of a configuration, e.g. i."""
+    for name, suffix in CONFIGURATION_SUFFIXES:
+        if name in label:
+            return suffix
+    raise ValueError('Unknown configuration: {}.'.format(label))
+
+
+def has_scale_factor(term, parameter):
+    """Return True if the parameter of the term has a scale factor."""
+    if 'Atomic' in term or 'Hybridization' in term:
+        return parameter[0] in ('F', 'G', 'ζ')
+    return False
+
+
+def term_placeholders(terms, term, symmetry, suffix):
+    """
+    Return the placeholders of the parameters of a Hamiltonian term, for
+    the terms of a configuration in the parameter tree.
+    """
+    placeholders = set()
+    placeholders.add('$H_{}'.format(term_suffix(term)))
+
+    if term in ('Atomic', 'Magnetic Field', 'Exchange Field'):
+        node = terms[term]
+    else:
+        node = terms[term]['symmetries'][symmetry]
+
+    for parameter in node['parameters']['variable']:
+        name = parameter_name(parameter)
+        placeholders.add('${}_{}_value'.format(name, suffix))
+        if has_scale_factor(term, parameter):
+            placeholders.add('${}_{}_scale'.format(name, suffix))
+
+    fixed = terms[term].get('parameters', dict()).get('fixed', ())
+    placeholders.update('${}'.format(name) for name in fixed)
+    return placeholders
+
+
+def parameter_placeholders(charge, edge, symmetry, cache=None):
+    """
+    Return the placeholders of the Hamiltonian parameters that are replaced
+    for an edge of the parameter tree. The charge and the edge are the
+    nodes of the tree, e.g. elements/Ni/charges/2+ and
+    elements/Ni/charges/2+/symmetries/Oh/experiments/XAS/edges/K (1s).
+    The placeholders of the terms can be cached between the edges of the
+    same charge.
+    """
+    if cache is None:
+        cache = dict()
+
+    placeholders = set()
+    for label, configuration in edge['configurations']:
+        suffix = configuration_suffix(label)
+        terms = charge['configurations'][configuration]['terms']
+        for term in edge['hamiltonian terms']:
+            key = (configuration, term, symmetry, suffix)
+            try:
+                placeholders.update(cache[key])
+            except KeyError:
+                cache[key] = term_placeholders(terms, term, symmetry, suffix)
+                placeholders.update(cache[key])
+    return placeholders
+
+
+class Template(object):
+    """
+    Quanty input template, split once into literal text and placeholders.
+
+    A placeholder is replaced by the value of the longest key of the
+    replacements that is a prefix of it; the remaining characters are kept.
+    This is needed for placeholders followed by text, e.g. $BaseName_iso.
+    """
+
+    def __init__(self, text):
+        # The placeholders are at the odd positions of the segments.
+        self.segments = PLACEHOLDER.split(text)
+        self.placeholders = self.segments[1::2]
+        self.names = frozenset(self.placeholders)
+
+    @staticmethod
+    def resolve(placeholder, replacements):
+        """
+        Return the key of the replacements matching a placeholder, or None.
+        """
+        for end in range(len(placeholder), 1, -1):
+            key = placeholder[:end]
+            if key in replacements:
+                return key
+        return None
+
+    def missing(self, replacements):
+        """Return the placeholders that have no replacement."""
+        return sorted(name for name in self.names
+                      if self.resolve(name, replacements) is None)
+
+    def render(self, replacements):
+        """
+        Substitute the placeholders in a single pass. The placeholders
+        without replacement are left unchanged (see missing).
+        """
+        values = dict()
+        for name in self.names:
+            key = self.resolve(name, replacements)
+            if key is None:
+                values[name] = name
+            else:
+                values[name] = str(replacements[key]) + name[len(key):]
+
+        segments = list(self.segments)
+        segments[1::2] = [values[name] for name in self.placeholders]
+        return ''.join(segments)
+
+
+class TemplateRegistry(object):
+    """
+    Registry of the Quanty input templates. On first use, all the templates
+    are read, either from a directory or from a bundle written by save, and
+    kept in memory; with compress=True, they are kept compressed, which
+    takes about five times less memory. A template is compiled the first
+    time it is requested.
+
+    The placeholders of the templates can be checked against the parameter
+    tree (see validate). This takes about a second for all the templates,
+    therefore it is done only when the problems are first requested, e.g.
+    by the batch runner before it starts the calculations.
+    """
+
+    def __init__(self, directory=None, bundle=None, compress=False,
+                 parameters=None):
+        self.directory = directory
+        self.bundle = bundle
+        self.compress = compress
+        self.parameters = parameters
+        self._problems = None
+        self._sources = None
+        self._templates = dict()
+        self._lock = threading.RLock()
+
+    def load(self):
+        """Read all the templates, unless this was already done."""
+        with self._lock:
+            if self._sources is not None:
+                return
+
+            if self.bundle is not None:
+                with gzip.open(self.bundle, 'rb') as fp:
+                    sources = json.loads(fp.read().decode('utf-8'))
+            else:
+                directory = self.directory
+                if directory is None:
+                    directory = resource_filename('quanty:templates')
+                sources = dict()
+                for path in glob.glob(os.path.join(directory, '*.lua')):
+                    with open(path, 'rb') as fp:
+                        sources[os.path.basename(path)] = fp.read().decode(
+                            'utf-8')
+
+            if self.compress:
+                sources = dict(
+                    (name, zlib.compress(source.encode('utf-8')))
+                    for name, source in sources.items())
+            self._sources = sources
+
+    @property
+    def problems(self):
+        """The result of validate, calculated on first use."""
+        with self._lock:
+            if self._problems is None:
+                self._problems = self.validate()
+            return self._problems
+
+    def names(self):
+        self.load()
+        return sorted(self._sources)
+
+    def __contains__(self, name):
+        self.load()
+        return name in self._sources
+
+    def __len__(self):
+        self.load()
+        return len(self._sources)
+
+    def source(self, name):
+        """Return the text of a template."""
+        self.load()
+        try:
+            source = self._sources[name]
+        except KeyError:
+            raise IOError('The template {} does not exist.'.format(name))
+        if self.compress:
+            source = zlib.decompress(source).decode('utf-8')
+        return source
+
+    def get(self, name):
+        """Return the compiled template with the given file name."""
+        with self._lock:
+            try:
+                return self._templates[name]
+            except KeyError:
+                pass
+            template = self._templates[name] = Template(self.source(name))
+            return template
+
+    def save(self, path):
+        """Write all the templates to a compressed bundle."""
+        sources = OrderedDict(
+            (name, self.source(name)) for name in self.names())
+        with gzip.open(path, 'wb') as fp:
+            fp.write(json.dumps(sources).encode('utf-8'))
+
+    def validate(self, parameters=None):
+        """
+        Check the placeholders of the Hamiltonian parameters against the
+        parameter tree. Return a dictionary with the templates that have
+        problems; for each, 'absent' is True if the template does not exist,
+        'missing' lists the placeholders of the template that are not
+        replaced for some edge of the tree, and 'unused' the parameters of
+        the tree that are not used by the template.
+        """
+        if parameters is None:
+            parameters = self.parameters
+        if parameters is None:
+            path = resource_filename('quanty:parameters/parameters.json.gz')
+            with gzip.open(path, 'rb') as fp:
+                parameters = json.loads(fp.read().decode('utf-8'))
+
+        expected = dict()
+        for element in parameters['elements'].values():
+            for charge in element['charges'].values():
+                cache = dict()
+                for symmetryName, symmetry in charge['symmetries'].items():
+                    experiments = symmetry['experiments']
+                    for experiment in experiments.values():
+                        for edge in experiment['edges'].values():
+                            name = edge['template name']
+                            placeholders = parameter_placeholders(
+                                charge, edge, symmetryName, cache)
+                            expected.setdefault(name, list()).append(
+                                placeholders)
+
+        problems = OrderedDict()
+        for name in sorted(expected):
+            if name not in self:
+                problems[name] = {'absent': True, 'missing': [], 'unused': []}
+                continue
+
+            names = set(PLACEHOLDER.findall(self.source(name)))
+            used = set(placeholder for placeholder in names
+                       if PARAMETER_PLACEHOLDER.match(placeholder))
+            missing, unused = set(), set()
+            for placeholders in expected[name]:
+                missing.update(used - placeholders)
+                unused.update(placeholders - names)
+
+            if missing or unused:
+                problems[name] = {
+                    'absent': False,
+                    'missing': sorted(missing),
+                    'unused': sorted(unused),
+                }
+        return problems
+
+
+registry = TemplateRegistry()
+
+
+def get_template(name):
+    """Return the compiled template with the given file name."""
+    return registry.get(name)
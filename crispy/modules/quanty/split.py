@@ -0,0 +1,125 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+
+"""
+Split a calculation along the incident energy. The window of incident
+energies is divided into consecutive parts, which are calculated by
+separate Quanty processes; the spectra of the parts are then stitched into
+the spectra of the whole window.
+
+The points of the parts are points of the whole window, so that the
+stitched spectra have the same energies as those of an unsplit calculation.
+Where the spectra are broadened by a convolution after they are
+calculated, the parts overlap by a margin: the points close to the limits
+of a part, which are affected by the limits of the convolution, are taken
+from the neighboring parts.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import numpy as np
+import shutil
+from collections import namedtuple
+
+from .parser import read_spec_columns, write_spec
+
+
+# The limits and the number of intervals of the energies calculated in a
+# part, and the range first:last of these points that are kept.
+Window = namedtuple('Window', ('emin', 'emax', 'intervals', 'first', 'last'))
+
+
+def split_window(emin, emax, intervals, parts, margin=0):
+    """
+    Split the window of energies from emin to emax, with the given number of
+    intervals, into parts of consecutive points. The parts are extended by
+    margin points on each side, within the limits of the window. Each part
+    has at least two points, so there can be fewer parts than requested.
+    """
+    points = intervals + 1
+    parts = max(1, min(int(parts), points // 2))
+    step = (emax - emin) / intervals if intervals else 0.0
+
+    bounds = np.linspace(0, points, parts + 1).round().astype(int)
+
+    windows = list()
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        lower = max(0, start - margin)
+        upper = min(points, stop + margin)
+        windows.append(Window(
+            emin + lower * step, emin + (upper - 1) * step, upper - 1 - lower,
+            start - lower, stop - lower))
+    return windows
+
+
+def stitch_spectra(parts, axis=0):
+    """
+    Stitch the spectra of the parts of a window. The parts are given as a
+    list of (energies, spectra, window), with the arrays read from the .spec
+    files. The window is along the rows of the spectra (axis=0), or, for the
+    resonant spectra, along their columns (axis=1), which are the spectra
+    at the incident energies.
+    """
+    if axis == 0:
+        energies = np.concatenate([
+            energies[window.first:window.last]
+            for energies, _, window in parts])
+        spectra = np.concatenate([
+            spectra[window.first:window.last]
+            for _, spectra, window in parts])
+    else:
+        energies = parts[0][0]
+        spectra = np.concatenate([
+            spectra[:, window.first:window.last]
+            for _, spectra, window in parts], axis=1)
+    return energies, spectra
+
+
+def stitch_spec(sources, path, axis=0):
+    """
+    Stitch the .spec files of the parts of a window into a single file. The
+    sources are given as a list of (path, window); a single source without
+    window is moved to the path.
+    """
+    if len(sources) == 1 and sources[0][1] is None:
+        shutil.move(sources[0][0], path)
+        return
+
+    parts = list()
+    header = None
+    for source, window in sources:
+        part_header, energies, spectra = read_spec_columns(source)
+        if header is None:
+            header = part_header
+        parts.append((energies, spectra, window))
+
+    energies, spectra = stitch_spectra(parts, axis)
+    write_spec(path, header, energies, spectra)
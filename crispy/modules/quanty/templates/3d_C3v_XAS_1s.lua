@@ -755,7 +755,6 @@ if H_3d_4p_hybridization == 1 then
         Gl = Gl_1s_3d + Gl_1s_4p
         SaveSpectrum(Gr, 'r')
         SaveSpectrum(Gl, 'l')
-        SaveSpectrum(Gr - Gl, 'cd')
     end
 
     spectrum = 'Linear Dichroism'
@@ -768,7 +767,6 @@ if H_3d_4p_hybridization == 1 then
         Gh = Gh_1s_3d + Gh_1s_4p
         SaveSpectrum(Gv, 'v')
         SaveSpectrum(Gh, 'h')
-        SaveSpectrum(Gv - Gh, 'ld')
     end
 else
     spectrum = 'Isotropic'
@@ -784,7 +782,6 @@ else
         Gl = GetSpectrum(G_1s_3d, T_1s_3d, Psis_i, indices_1s_3d[spectrum][2], dZ_1s_3d)
         SaveSpectrum(Gr, 'r')
         SaveSpectrum(Gl, 'l')
-        SaveSpectrum(Gr - Gl, 'cd')
     end
 
     spectrum = 'Linear Dichroism'
@@ -793,7 +790,6 @@ else
         Gh = GetSpectrum(G_1s_3d, T_1s_3d, Psis_i, indices_1s_3d[spectrum][2], dZ_1s_3d)
         SaveSpectrum(Gv, 'v')
         SaveSpectrum(Gh, 'h')
-        SaveSpectrum(Gv - Gh, 'ld')
     end
 end
 
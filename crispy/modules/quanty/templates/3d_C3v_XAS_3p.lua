@@ -542,7 +542,6 @@ if ValueInTable(spectrum, spectra) then
     Gl = Gl / Pcl_3p_3d
     SaveSpectrum(Gr, 'r')
     SaveSpectrum(Gl, 'l')
-    SaveSpectrum(Gr - Gl, 'cd')
 end
 
 spectrum = 'Linear Dichroism'
@@ -553,6 +552,5 @@ if ValueInTable(spectrum, spectra) then
     Gh = Gh / Pcl_3p_3d
     SaveSpectrum(Gv, 'v')
     SaveSpectrum(Gh, 'h')
-    SaveSpectrum(Gv - Gh, 'ld')
 end
 
@@ -773,7 +773,6 @@ if ValueInTable(spectrum, spectra) then
     Gl = Gl / Pcl_2p_3d
     SaveSpectrum(Gr, 'r')
     SaveSpectrum(Gl, 'l')
-    SaveSpectrum(Gr - Gl, 'cd')
 end
 
 spectrum = 'Linear Dichroism'
@@ -784,6 +783,5 @@ if ValueInTable(spectrum, spectra) then
     Gh = Gh / Pcl_2p_3d
     SaveSpectrum(Gv, 'v')
     SaveSpectrum(Gh, 'h')
-    SaveSpectrum(Gv - Gh, 'ld')
 end
 
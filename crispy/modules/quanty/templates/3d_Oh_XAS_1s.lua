@@ -695,7 +695,6 @@ if ValueInTable(spectrum, spectra) then
     Gl = Gl / Pcl_1s_3d
     SaveSpectrum(Gr, 'r')
     SaveSpectrum(Gl, 'l')
-    SaveSpectrum(Gr - Gl, 'cd')
 end
 
 spectrum = 'Linear Dichroism'
@@ -706,6 +705,5 @@ if ValueInTable(spectrum, spectra) then
     Gh = Gh / Pcl_1s_3d
     SaveSpectrum(Gv, 'v')
     SaveSpectrum(Gh, 'h')
-    SaveSpectrum(Gv - Gh, 'ld')
 end
 
@@ -534,7 +534,6 @@ if ValueInTable(spectrum, spectra) then
     Gl = Gl / Pcl_4s_4d
     SaveSpectrum(Gr, 'r')
     SaveSpectrum(Gl, 'l')
-    SaveSpectrum(Gr - Gl, 'cd')
 end
 
 spectrum = 'Linear Dichroism'
@@ -545,6 +544,5 @@ if ValueInTable(spectrum, spectra) then
     Gh = Gh / Pcl_4s_4d
     SaveSpectrum(Gv, 'v')
     SaveSpectrum(Gh, 'h')
-    SaveSpectrum(Gv - Gh, 'ld')
 end
 
@@ -532,7 +532,6 @@ if ValueInTable(spectrum, spectra) then
     Gl = Gl / Pcl_3s_4d
     SaveSpectrum(Gr, 'r')
     SaveSpectrum(Gl, 'l')
-    SaveSpectrum(Gr - Gl, 'cd')
 end
 
 spectrum = 'Linear Dichroism'
@@ -543,6 +542,5 @@ if ValueInTable(spectrum, spectra) then
     Gh = Gh / Pcl_3s_4d
     SaveSpectrum(Gv, 'v')
     SaveSpectrum(Gh, 'h')
-    SaveSpectrum(Gv - Gh, 'ld')
 end
 
@@ -761,7 +761,6 @@ if ValueInTable(spectrum, spectra) then
     Gl = Gl / Pcl_2s_4d
     SaveSpectrum(Gr, 'r')
     SaveSpectrum(Gl, 'l')
-    SaveSpectrum(Gr - Gl, 'cd')
 end
 
 spectrum = 'Linear Dichroism'
@@ -772,6 +771,5 @@ if ValueInTable(spectrum, spectra) then
     Gh = Gh / Pcl_2s_4d
     SaveSpectrum(Gv, 'v')
     SaveSpectrum(Gh, 'h')
-    SaveSpectrum(Gv - Gh, 'ld')
 end
 
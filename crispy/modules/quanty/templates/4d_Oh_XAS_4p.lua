@@ -707,7 +707,6 @@ if ValueInTable(spectrum, spectra) then
     Gl = Gl / Pcl_4p_4d
     SaveSpectrum(Gr, 'r')
     SaveSpectrum(Gl, 'l')
-    SaveSpectrum(Gr - Gl, 'cd')
 end
 
 spectrum = 'Linear Dichroism'
@@ -718,6 +717,5 @@ if ValueInTable(spectrum, spectra) then
     Gh = Gh / Pcl_4p_4d
     SaveSpectrum(Gv, 'v')
     SaveSpectrum(Gh, 'h')
-    SaveSpectrum(Gv - Gh, 'ld')
 end
 
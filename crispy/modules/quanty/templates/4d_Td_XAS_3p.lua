@@ -706,7 +706,6 @@ if ValueInTable(spectrum, spectra) then
     Gl = Gl / Pcl_3p_4d
     SaveSpectrum(Gr, 'r')
     SaveSpectrum(Gl, 'l')
-    SaveSpectrum(Gr - Gl, 'cd')
 end
 
 spectrum = 'Linear Dichroism'
@@ -717,6 +716,5 @@ if ValueInTable(spectrum, spectra) then
     Gh = Gh / Pcl_3p_4d
     SaveSpectrum(Gv, 'v')
     SaveSpectrum(Gh, 'h')
-    SaveSpectrum(Gv - Gh, 'ld')
 end
 
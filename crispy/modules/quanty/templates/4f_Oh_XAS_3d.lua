@@ -679,7 +679,6 @@ if ValueInTable(spectrum, spectra) then
     Gl = Gl / Pcl_3d_4f
     SaveSpectrum(Gr, 'r')
     SaveSpectrum(Gl, 'l')
-    SaveSpectrum(Gr - Gl, 'cd')
 end
 
 spectrum = 'Linear Dichroism'
@@ -690,6 +689,5 @@ if ValueInTable(spectrum, spectra) then
     Gh = Gh / Pcl_3d_4f
     SaveSpectrum(Gv, 'v')
     SaveSpectrum(Gh, 'h')
-    SaveSpectrum(Gv - Gh, 'ld')
 end
 
@@ -675,7 +675,6 @@ if ValueInTable(spectrum, spectra) then
     Gl = Gl / Pcl_3p_5f
     SaveSpectrum(Gr, 'r')
     SaveSpectrum(Gl, 'l')
-    SaveSpectrum(Gr - Gl, 'cd')
 end
 
 spectrum = 'Linear Dichroism'
@@ -686,6 +685,5 @@ if ValueInTable(spectrum, spectra) then
     Gh = Gh / Pcl_3p_5f
     SaveSpectrum(Gv, 'v')
     SaveSpectrum(Gh, 'h')
-    SaveSpectrum(Gv - Gh, 'ld')
 end
 
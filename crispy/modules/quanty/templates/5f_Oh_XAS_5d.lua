@@ -549,7 +549,6 @@ if ValueInTable(spectrum, spectra) then
         Gl = GetSpectrum(G_5d_5f, T_5d_5f, Psis_i, indices_5d_5f[spectrum][2], dZ_5d_5f)
         SaveSpectrum(Gr, 'r')
         SaveSpectrum(Gl, 'l')
-        SaveSpectrum(Gr - Gl, 'cd')
 end
 
 spectrum = 'Linear Dichroism'
@@ -558,6 +557,5 @@ if ValueInTable(spectrum, spectra) then
         Gh = GetSpectrum(G_5d_5f, T_5d_5f, Psis_i, indices_5d_5f[spectrum][2], dZ_5d_5f)
         SaveSpectrum(Gv, 'v')
         SaveSpectrum(Gh, 'h')
-        SaveSpectrum(Gv - Gh, 'ld')
 end
 
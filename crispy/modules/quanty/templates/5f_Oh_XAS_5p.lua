@@ -544,7 +544,6 @@ if ValueInTable(spectrum, spectra) then
         Gl = GetSpectrum(G_5p_5f, T_5p_5f, Psis_i, indices_5p_5f[spectrum][2], dZ_5p_5f)
         SaveSpectrum(Gr, 'r')
         SaveSpectrum(Gl, 'l')
-        SaveSpectrum(Gr - Gl, 'cd')
 end
 
 spectrum = 'Linear Dichroism'
@@ -553,6 +552,5 @@ if ValueInTable(spectrum, spectra) then
         Gh = GetSpectrum(G_5p_5f, T_5p_5f, Psis_i, indices_5p_5f[spectrum][2], dZ_5p_5f)
         SaveSpectrum(Gv, 'v')
         SaveSpectrum(Gh, 'h')
-        SaveSpectrum(Gv - Gh, 'ld')
 end
 
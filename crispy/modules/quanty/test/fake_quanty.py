@@ -0,0 +1,180 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+# Scripted replacement of the Quanty executable, used to test the handling of
+# the output of a running calculation. It prints an analysis of the initial
+# Hamiltonian, and writes the .spec files of the spectra listed in the input
+# file one after the other, with a delay between them.
+#
+# If the input has the window of energies of an absorption spectrum, the
+# spectra are sums of Lorentzians on this window, broadened by a convolution
+# like in the templates; otherwise they are random.
+#
+# Usage: python fake_quanty.py input.lua [delay]
+
+import numpy as np
+import os
+import re
+import sys
+import time
+
+SUFFIXES = {
+    'Isotropic': ('iso', ),
+    'Circular Dichroism': ('r', 'l'),
+    'Linear Dichroism': ('v', 'h'),
+}
+
+ANALYSIS = """Analysis of the initial Hamiltonian:
+==============================================================
+State         <E>     <S^2>     <L^2>     <J^2>          dZ
+==============================================================
+    1   -2.433625    2.0000   12.0000    7.6564    3.33E-01
+    2   -2.433625    2.0000   12.0000    7.6564    3.33E-01
+    3   -2.433625    2.0000   12.0000    7.6564    3.33E-01
+==============================================================
+"""
+
+
+def write_spec(path, energies, spectra):
+    """
+    Write a .spec file in the format used by Quanty. The spectra argument is
+    a complex array of shape (energies, spectra).
+    """
+    spectra = np.asarray(spectra, dtype=np.complex128).reshape(
+        len(energies), -1)
+    dE = energies[1] - energies[0]
+
+    lines = list()
+    lines.append('#Spectra: {}'.format(spectra.shape[1]))
+    lines.append('Emin______Emax      {:22.15E} {:22.15E}'.format(
+        energies[0], energies[-1]))
+    lines.append('EminPole__EmaxPole  {:22.15E} {:22.15E}'.format(
+        energies[0], energies[-1]))
+    lines.append('dE________Gamma     {:22.15E} {:22.15E}'.format(dE, 0.1))
+    lines.append('Energy            ' + ''.join(
+        '  {:<21}  {:<21}'.format('Re[{}]'.format(i), 'Im[{}]'.format(i))
+        for i in range(spectra.shape[1])))
+
+    columns = np.empty((len(energies), 2 * spectra.shape[1]))
+    columns[:, 0::2] = spectra.real
+    columns[:, 1::2] = spectra.imag
+    fmt = '{:19.12E}' + ' {:22.15E}' * columns.shape[1]
+    for energy, row in zip(energies, columns):
+        lines.append(fmt.format(energy, *row))
+
+    with open(path, 'w') as fp:
+        fp.write('\n'.join(lines) + '\n')
+
+
+NUMBER = r'([-+0-9.eE]+)'
+
+
+def read_window(text):
+    """Return the energies, Gamma, and the width of the convolution."""
+    patterns = (
+        r'^Eedge1 = {}$', r'^Emin = \({} - Eedge1\)',
+        r'^Emax = \({} - Eedge1\)', r'^NE = {}$', r'^Gamma = {}$',
+        r'^    Gmin1 = {} - Gamma$')
+    values = list()
+    for pattern in patterns:
+        match = re.search(pattern.format(NUMBER), text, re.MULTILINE)
+        if match is None:
+            return None
+        values.append(float(match.group(1)))
+    edge, emin, emax, intervals, gamma, fwhm = values
+
+    energies = np.linspace(emin, emax, int(intervals) + 1) - edge
+    return energies, gamma, fwhm - gamma
+
+
+def lorentzians(energies, gamma, fwhm, random):
+    poles = random.uniform(-5.0, 10.0, 8)
+    weights = random.rand(8)
+    values = np.sum(
+        weights / (energies[:, np.newaxis] - poles + 0.5j * gamma), axis=1)
+
+    # Broaden with a Lorentzian truncated at the limits of the window.
+    if fwhm > 0 and energies.size > 1:
+        step = energies[1] - energies[0]
+        offsets = step * np.arange(1 - energies.size, energies.size)
+        kernel = fwhm / (2 * np.pi) / (offsets**2 + fwhm**2 / 4) * step
+        values = np.convolve(values, kernel)[energies.size - 1:][
+            :energies.size]
+    return values
+
+
+def write(text):
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+def main(argv):
+    inputName = argv[1]
+    delay = float(argv[2]) if len(argv) > 2 else 0.2
+
+    with open(inputName) as fp:
+        text = fp.read()
+    spectra = re.findall(r"'([^']*)'", re.search(
+        r'spectra = \{(.*)\}', text).group(1))
+
+    baseName = os.path.splitext(inputName)[0]
+    window = read_window(text)
+    if window is None:
+        energies = np.linspace(-15.0, 25.0, 1001)
+    else:
+        energies = window[0]
+    random = np.random.RandomState(0)
+
+    write('Start of BlockGroundState. Use up to 2 Slater determinants.\n')
+    time.sleep(delay)
+    # Write the table in two chunks, to check the incremental parsing.
+    write(ANALYSIS[:150])
+    time.sleep(delay / 4)
+    write(ANALYSIS[150:])
+
+    for spectrum in spectra:
+        for suffix in SUFFIXES[spectrum]:
+            time.sleep(delay)
+            if window is None:
+                values = random.rand(energies.size) + 1j * random.rand(
+                    energies.size)
+            else:
+                # The spectrum doesn't depend on the others in the input.
+                values = lorentzians(
+                    energies, window[1], window[2],
+                    np.random.RandomState(sum(map(ord, suffix))))
+            write_spec('{}_{}.spec'.format(baseName, suffix), energies, values)
+
+    time.sleep(delay)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,168 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+from ....batch import (
+    create_calculation, read_jobs, run_calculation, run_jobs)
+
+
+class CountingSemaphore(object):
+    """A semaphore that records the largest number of holders."""
+
+    def __init__(self, value):
+        self.semaphore = threading.BoundedSemaphore(value)
+        self.lock = threading.Lock()
+        self.holders = 0
+        self.maxHolders = 0
+        self.count = 0
+
+    def __enter__(self):
+        self.semaphore.acquire()
+        with self.lock:
+            self.holders += 1
+            self.count += 1
+            self.maxHolders = max(self.maxHolders, self.holders)
+
+    def __exit__(self, *args):
+        with self.lock:
+            self.holders -= 1
+        self.semaphore.release()
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.job = {
+            'element': 'Ni', 'charge': '2+', 'symmetry': 'Oh',
+            'experiment': 'XAS', 'edge': 'L2,3 (2p)'}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testReadJobs(self):
+        path = os.path.join(self.directory, 'jobs.json')
+        with open(path, 'w') as fp:
+            json.dump({'defaults': self.job,
+                       'jobs': [{'temperature': 10}, {'edge': 'K (1s)'}]}, fp)
+        jobs = read_jobs(path)
+        self.assertEqual(jobs[0], dict(self.job, temperature=10))
+        self.assertEqual(jobs[1]['edge'], 'K (1s)')
+
+        path = os.path.join(self.directory, 'jobs.csv')
+        with open(path, 'w') as fp:
+            fp.write('element,edge,temperature,spectra,"Atomic/Initial '
+                     'Hamiltonian/F2(3d,3d)"\n')
+            fp.write('Ni,"L2,3 (2p)",10,"[""Isotropic""]",\n')
+        self.assertEqual(read_jobs(path), [{
+            'element': 'Ni', 'edge': 'L2,3 (2p)', 'temperature': 10,
+            'spectra': ['Isotropic']}])
+
+    def testCreateCalculation(self):
+        job = dict(self.job, temperature=300, spectra=['Linear Dichroism'])
+        job['Atomic/Initial Hamiltonian/F2(3d,3d)'] = 11.0
+        job['Atomic/Final Hamiltonian/zeta(2p)'] = [11.5, 0.9]
+        calculation = create_calculation(job)
+
+        self.assertEqual(calculation.temperature, 300)
+        self.assertEqual(
+            calculation.spectra.toCalculateChecked, ['Linear Dichroism'])
+        data = calculation.hamiltonianData['Atomic']
+        self.assertEqual(data['Initial Hamiltonian']['F2(3d,3d)'], [11.0, 0.8])
+        self.assertEqual(data['Final Hamiltonian']['ζ(2p)'], [11.5, 0.9])
+
+        for key, value in (('edge', 'M9'), ('temperatur', 3),
+                           ('spectra', 'RIXS'),
+                           ('Atomic/Initial Hamiltonian/F9(3d,3d)', 1.0)):
+            self.assertRaises(
+                ValueError, create_calculation, dict(self.job, **{key: value}))
+
+    def testRunJobs(self):
+        script = os.path.join(os.path.dirname(__file__), 'fake_quanty.py')
+        jobs = [self.job, dict(self.job, temperature=-1, edge='M9')]
+        results = run_jobs(
+            jobs, [sys.executable, script], self.directory, processes=2)
+
+        self.assertEqual(results[0].spectra.processed.shortNames, ['Iso'])
+        self.assertIn('Analysis', results[0].output)
+        self.assertIsInstance(results[1], ValueError)
+        # The directories of the successful jobs are removed.
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def testParts(self):
+        script = os.path.join(os.path.dirname(__file__), 'fake_quanty.py')
+        semaphore = CountingSemaphore(2)
+        calculation = run_calculation(
+            create_calculation(self.job), [sys.executable, script],
+            self.directory, parts=3, semaphore=semaphore)
+
+        self.assertEqual(calculation.spectra.processed.shortNames, ['Iso'])
+        self.assertEqual(semaphore.count, 3)
+        self.assertLessEqual(semaphore.maxHolders, 2)
+
+        # The parts count against the number of processes.
+        directory = os.path.join(self.directory, 'jobs')
+        results = run_jobs(
+            [self.job, self.job], [sys.executable, script], directory,
+            processes=1, parts=2)
+        for result in results:
+            self.assertEqual(result.spectra.processed.shortNames, ['Iso'])
+
+    def testUnknownPlaceholders(self):
+        # The template of this edge uses parameters that are not in the
+        # parameter tree; Quanty is not started.
+        script = os.path.join(os.path.dirname(__file__), 'fake_quanty.py')
+        job = dict(self.job, element='Yb')
+        results = run_jobs([job], [sys.executable, script], self.directory)
+
+        self.assertIsInstance(results[0], ValueError)
+        self.assertIn('$F2(4f,4f)_f_value', str(results[0]))
+        # The job was rejected before it started.
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+def suite():
+    loader = unittest.defaultTestLoader
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(loader.loadTestsFromTestCase(TestBatch))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,112 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from ..cache import ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ResultCache(os.path.join(self.directory, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def writeSpec(self, name, size=1000):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as fp:
+            fp.write(b'0' * size)
+        return path
+
+    def testKey(self):
+        key = self.cache.key('Emin = 1', sys.executable)
+        self.assertEqual(key, self.cache.key('Emin = 1', sys.executable))
+        self.assertNotEqual(key, self.cache.key('Emin = 2', sys.executable))
+        self.assertNotEqual(key, self.cache.key('Emin = 1', __file__))
+
+    def testStoreRestore(self):
+        key = self.cache.key('input', sys.executable)
+        self.assertIsNone(self.cache.restore(key, self.directory))
+
+        path = self.writeSpec('input_iso.spec')
+        self.cache.store(key, [path], 'output')
+        os.remove(path)
+        self.assertIn(key, self.cache)
+
+        self.assertEqual(self.cache.restore(key, self.directory), 'output')
+        self.assertEqual(os.path.getsize(path), 1000)
+
+        info = self.cache.info()
+        self.assertEqual((info['hits'], info['misses']), (1, 1))
+        self.assertEqual(info['entries'], 1)
+        self.assertGreaterEqual(info['size'], 1000)
+
+        self.cache.clear()
+        self.assertNotIn(key, self.cache)
+        self.assertEqual(self.cache.info()['hits'], 0)
+
+    def testEviction(self):
+        self.cache.maxsize = 2500
+        keys = [self.cache.key(str(i), sys.executable) for i in range(3)]
+        path = self.writeSpec('input_iso.spec')
+
+        self.cache.store(keys[0], [path], '')
+        self.cache.store(keys[1], [path], '')
+        # Use the first entry, so that the second one is evicted.
+        past = time.time() - 10
+        os.utime(self.cache.path(keys[1]), (past, past))
+        self.cache.restore(keys[0], self.directory)
+        self.cache.store(keys[2], [path], '')
+
+        self.assertIn(keys[0], self.cache)
+        self.assertNotIn(keys[1], self.cache)
+        self.assertIn(keys[2], self.cache)
+        self.assertLessEqual(self.cache.size(), self.cache.maxsize)
+
+
+def suite():
+    loader = unittest.defaultTestLoader
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(loader.loadTestsFromTestCase(TestResultCache))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
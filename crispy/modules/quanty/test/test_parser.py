@@ -0,0 +1,266 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import numpy as np
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import unittest
+
+from . import fake_quanty
+from .fake_quanty import write_spec
+from ..parser import (
+    OutputParser, SpecWatcher, load_spec, load_specs, read_spec,
+    read_spec_header, remove_spec_cache, spec_cache_path)
+
+
+class TestParser(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        random = np.random.RandomState(7)
+        self.energies = np.linspace(-15.0, 25.0, 1001)
+        self.spectra = (random.randn(1001, 3) + 1j * random.randn(1001, 3))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def testHeader(self):
+        path = os.path.join(self.path, 'input_iso.spec')
+        write_spec(path, self.energies, self.spectra)
+        with open(path, 'rb') as fp:
+            header = read_spec_header(fp)
+        self.assertEqual(header['spectra'], 3)
+        self.assertEqual(header['points'], 1001)
+        self.assertAlmostEqual(header['dE'], 0.04)
+
+    def testReadSpec(self):
+        path = os.path.join(self.path, 'input_iso.spec')
+        write_spec(path, self.energies, self.spectra)
+        reference = np.loadtxt(path, skiprows=5)[:, 2::2]
+        self.assertTrue(np.array_equal(read_spec(path), reference))
+
+        out = np.zeros((2, ) + reference.shape)
+        read_spec(path, out=out[1])
+        self.assertTrue(np.array_equal(out[1], reference))
+
+    def testVariableWidth(self):
+        # Files without fixed width columns are read with np.loadtxt.
+        path = os.path.join(self.path, 'input_iso.spec')
+        write_spec(path, self.energies, self.spectra)
+        with open(path) as fp:
+            lines = fp.readlines()
+        with open(path, 'w') as fp:
+            fp.writelines(lines[:5])
+            fp.writelines(' '.join(line.split()) + '\n' for line in lines[5:])
+        reference = np.loadtxt(path, skiprows=5)[:, 2::2]
+        self.assertTrue(np.array_equal(read_spec(path), reference))
+
+    def testReference(self):
+        root = os.path.join(os.path.dirname(__file__), 'tests')
+        for index in ('001', '002'):
+            for name in os.listdir(os.path.join(root, index)):
+                if not name.endswith('.spec'):
+                    continue
+                path = os.path.join(root, index, name)
+                reference = np.loadtxt(path, skiprows=5)[:, 2::2]
+                self.assertTrue(np.array_equal(read_spec(path), reference))
+
+    def testCache(self):
+        path = os.path.join(self.path, 'input_iso.spec')
+        write_spec(path, self.energies, self.spectra)
+        reference = read_spec(path)
+
+        data = load_spec(path)
+        self.assertTrue(os.path.exists(spec_cache_path(path)))
+        self.assertNotIsInstance(data, np.memmap)
+        data = load_spec(path)
+        self.assertIsInstance(data, np.memmap)
+        self.assertTrue(np.array_equal(data, reference))
+        del data
+
+        # Modifying the file invalidates the sidecar.
+        sidecar = spec_cache_path(path)
+        write_spec(path, self.energies, 2 * self.spectra)
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+        data = load_spec(path)
+        self.assertNotIsInstance(data, np.memmap)
+        self.assertTrue(np.array_equal(data, read_spec(path)))
+        self.assertFalse(os.path.exists(sidecar))
+
+        remove_spec_cache(path)
+        self.assertFalse(os.path.exists(spec_cache_path(path)))
+
+    def testLoadSpecs(self):
+        paths = list()
+        for index in range(5):
+            path = os.path.join(self.path, 'input_{}.spec'.format(index))
+            write_spec(path, self.energies, self.spectra * index)
+            paths.append(path)
+        for processes in (None, 1, 3):
+            spectra = load_specs(paths, cache=False, processes=processes)
+            self.assertEqual(len(spectra), len(paths))
+            for path, spectrum in zip(paths, spectra):
+                self.assertTrue(np.array_equal(spectrum, read_spec(path)))
+
+    def testOutputParser(self):
+        parser = OutputParser()
+        events = list()
+        for index in range(0, len(fake_quanty.ANALYSIS), 7):
+            events.extend(parser.feed(fake_quanty.ANALYSIS[index:index + 7]))
+        self.assertEqual(events, ['analysis'])
+        self.assertEqual(len(parser.analysis), 3)
+        self.assertEqual(parser.analysis[0]['State'], 1)
+        self.assertEqual(parser.analysis[0]['<E>'], -2.433625)
+        self.assertEqual(parser.analysis[2]['dZ'], 3.33e-1)
+        self.assertEqual(parser.phase, 'spectra')
+        parser.finish()
+        self.assertEqual(list(parser.timings()), ['eigensystem', 'spectra'])
+
+    def testStreaming(self):
+        # Run the scripted Quanty and follow its output and files.
+        inputName = os.path.join(self.path, 'input.lua')
+        with open(inputName, 'w') as fp:
+            fp.write("spectra = {'Isotropic', 'Circular Dichroism'}\n")
+        paths = [os.path.join(self.path, 'input_{}.spec'.format(suffix))
+                 for suffix in ('iso', 'r', 'l')]
+
+        parser = OutputParser()
+        watcher = SpecWatcher(paths)
+        process = subprocess.Popen(
+            [sys.executable, fake_quanty.__file__, inputName, '0.3'],
+            stdout=subprocess.PIPE, cwd=self.path)
+
+        def read():
+            for line in iter(process.stdout.readline, b''):
+                parser.feed(line.decode('utf-8'))
+        reader = threading.Thread(target=read)
+        reader.start()
+
+        spectra = dict()
+        partial = None
+        while process.poll() is None:
+            spectra.update(watcher.poll())
+            if paths[0] in spectra and partial is None:
+                partial = [path in spectra for path in paths]
+            time.sleep(0.02)
+        reader.join()
+        parser.finish()
+        spectra.update(watcher.poll())
+        spectra.update(watcher.poll())
+
+        # The isotropic spectrum is available before the other ones.
+        self.assertEqual(partial, [True, False, False])
+        self.assertEqual(list(watcher.times), paths)
+        self.assertEqual(sorted(spectra), sorted(paths))
+        for path in paths:
+            self.assertTrue(np.array_equal(spectra[path], read_spec(path)))
+
+        self.assertEqual(len(parser.analysis), 3)
+        timings = parser.timings()
+        self.assertGreater(timings['eigensystem'], 0.2)
+        self.assertGreater(timings['spectra'], 0.8)
+
+    def testSpecWatcherUnreadable(self):
+        path = os.path.join(self.path, 'input_iso.spec')
+        watcher = SpecWatcher([path])
+        with open(path, 'w') as fp:
+            fp.write('Energy\n')
+
+        # The file is read only once it doesn't change between two calls.
+        self.assertEqual(watcher.ready(), list())
+        self.assertEqual(watcher.ready(), [path])
+        self.assertEqual(watcher.poll(), dict())
+        # A file that cannot be read is not read again until it changes.
+        self.assertEqual(watcher.ready(), list())
+        self.assertEqual(watcher.pending, [path])
+
+        write_spec(path, self.energies, self.spectra)
+        self.assertEqual(watcher.poll(), dict())
+        spectra = watcher.poll()
+        self.assertTrue(np.array_equal(spectra[path], read_spec(path)))
+        self.assertEqual(watcher.pending, list())
+
+
+@unittest.skipUnless(os.environ.get('CRISPY_BENCHMARK'),
+                     'Set CRISPY_BENCHMARK to run the benchmarks.')
+class TestParserBenchmark(unittest.TestCase):
+
+    def testBenchmark(self):
+        """
+        Compare the reader with np.loadtxt for spectra of typical sizes: an
+        XAS spectrum and a RIXS map with 1001 x 1001 points.
+        """
+        path = tempfile.mkdtemp()
+        random = np.random.RandomState(0)
+        energies = np.linspace(-15.0, 25.0, 1001)
+        try:
+            for name, spectra in (('1D', 1), ('2D', 1001)):
+                fileName = os.path.join(path, 'input_{}.spec'.format(name))
+                write_spec(fileName, energies, random.randn(1001, spectra))
+
+                def reference():
+                    return np.loadtxt(fileName, skiprows=5)[:, 2::2]
+
+                def reader():
+                    return read_spec(fileName)
+
+                def cache():
+                    return load_spec(fileName)
+
+                load_spec(fileName)
+                times = list()
+                for function in (reference, reader, cache):
+                    times.append(min(timeit.repeat(
+                        function, number=1, repeat=3)))
+                print('{}: np.loadtxt {:.3g} s, read_spec {:.3g} s, '
+                      'load_spec (cached) {:.3g} s'.format(name, *times))
+        finally:
+            shutil.rmtree(path)
+
+
+def suite():
+    loader = unittest.defaultTestLoader
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(loader.loadTestsFromTestCase(TestParser))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestParserBenchmark))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -44,6 +44,8 @@ from silx.resources import resource_filename as resourceFileName
 
 # from ....utils.odict import odict
 from ....gui.config import Config
+from ....gui.quanty import QuantySpectra
+from ..parser import read_spec
 
 
 class TestQuanty(unittest.TestCase):
@@ -85,7 +87,7 @@ class TestQuanty(unittest.TestCase):
     def loadSpectrum(self, fileName):
         experiment = self.parameters['experiment']
         if experiment == 'XAS':
-            spectrum = np.loadtxt(fileName, skiprows=5, usecols=2)
+            spectrum = read_spec(fileName)[:, 0]
         return spectrum
 
     def setUp(self):
@@ -134,9 +136,24 @@ class TestQuanty(unittest.TestCase):
     def testSpectrum(self):
         suffix = self.parameters['suffix']
 
-        spectrumName = 'input_{}.spec'.format(suffix)
-        spectrumPath = os.path.join(self.rootPath, spectrumName)
-        spectrum = self.loadSpectrum(spectrumPath)
+        # The dichroic spectra are derived from their components.
+        if suffix in QuantySpectra.components:
+            suffixes = QuantySpectra.components[suffix]
+        else:
+            suffixes = (suffix, )
+
+        spectra = list()
+        for suffix in suffixes:
+            spectrumName = 'input_{}.spec'.format(suffix)
+            spectrumPath = os.path.join(self.rootPath, spectrumName)
+            spectra.append(self.loadSpectrum(spectrumPath))
+
+        if len(spectra) == 2:
+            spectrum = spectra[0] - spectra[1]
+        else:
+            spectrum, = spectra
+
+        suffix = self.parameters['suffix']
 
         referenceName = 'reference_{}.spec'.format(suffix)
         referencePath = os.path.join(self.rootPath, referenceName)
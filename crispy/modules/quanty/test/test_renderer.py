@@ -0,0 +1,152 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ..renderer import Template, TemplateRegistry, get_template
+
+
+class TestRenderer(unittest.TestCase):
+
+    def testRender(self):
+        template = Template(
+            'F2 = $F2(3d,3d)_i_value * $F2(3d,3d)_i_scale\n'
+            'Save("$BaseName_iso.spec")\n'
+            'T = $T; $Unknown = 1\n')
+        replacements = {
+            '$F2(3d,3d)_i_value': 10.5,
+            '$F2(3d,3d)_i_scale': 0.8,
+            '$BaseName': 'input',
+            '$T': 10,
+        }
+        self.assertEqual(template.render(replacements), (
+            'F2 = 10.5 * 0.8\n'
+            'Save("input_iso.spec")\n'
+            'T = 10; $Unknown = 1\n'))
+        self.assertEqual(template.missing(replacements), ['$Unknown'])
+
+    def testSequentialReplace(self):
+        # The result is the same as replacing the keys one after the other,
+        # the longest keys first.
+        template = get_template('3d_Oh_XAS_2p.lua')
+        replacements = dict(
+            (name, '<{}>'.format(i))
+            for i, name in enumerate(sorted(template.names)))
+        replacements['$BaseName'] = 'input'
+
+        reference = ''.join(template.segments)
+        for key in sorted(replacements, key=len, reverse=True):
+            reference = reference.replace(key, str(replacements[key]))
+        self.assertEqual(template.render(replacements), reference)
+        self.assertIs(get_template('3d_Oh_XAS_2p.lua'), template)
+
+
+class TestTemplateRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        templates = {
+            'a_XAS.lua': 'H = $H_atomic * $F2(3d,3d)_i_value'
+                         ' * $F2(3d,3d)_i_scale * $zeta(3d)_i_value'
+                         ' * $zeta(3d)_i_scale\nT = $T\n',
+            'b_XAS.lua': 'H = $H_atomic * $zeta(3d)_i_value\n',
+        }
+        for name, text in templates.items():
+            with open(os.path.join(self.directory, name), 'w') as fp:
+                fp.write(text)
+
+        edge = {
+            'configurations': [['Initial', '3d8']],
+            'hamiltonian terms': ['Atomic'],
+        }
+        terms = {'Atomic': {'parameters': {'variable': {
+            'F2(3d,3d)': 12.2, 'ζ(3d)': 0.08}}}}
+        edges = dict(
+            (name, dict(edge, **{'template name': name}))
+            for name in ('a_XAS.lua', 'b_XAS.lua', 'c_XAS.lua'))
+        self.parameters = {'elements': {'Ni': {'charges': {'2+': {
+            'symmetries': {'Oh': {'experiments': {'XAS': {'edges': edges}}}},
+            'configurations': {'3d8': {'terms': terms}},
+        }}}}}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testLoad(self):
+        registry = TemplateRegistry(self.directory)
+        self.assertEqual(registry.names(), ['a_XAS.lua', 'b_XAS.lua'])
+        template = registry.get('a_XAS.lua')
+        self.assertIs(registry.get('a_XAS.lua'), template)
+        self.assertRaises(IOError, registry.get, 'c_XAS.lua')
+
+        # The templates are the same when read from a bundle, or when they
+        # are kept compressed.
+        bundle = os.path.join(self.directory, 'templates.json.gz')
+        registry.save(bundle)
+        for other in (TemplateRegistry(bundle=bundle),
+                      TemplateRegistry(self.directory, compress=True)):
+            self.assertEqual(other.names(), registry.names())
+            for name in registry.names():
+                self.assertEqual(other.source(name), registry.source(name))
+
+    def testValidate(self):
+        registry = TemplateRegistry(
+            self.directory, parameters=self.parameters)
+        # The templates are validated only when the problems are requested.
+        registry.load()
+        self.assertIsNone(registry._problems)
+        problems = registry.problems
+        self.assertEqual(list(problems), ['b_XAS.lua', 'c_XAS.lua'])
+        self.assertEqual(problems['b_XAS.lua']['missing'], [])
+        self.assertEqual(problems['b_XAS.lua']['unused'], [
+            '$F2(3d,3d)_i_scale', '$F2(3d,3d)_i_value',
+            '$zeta(3d)_i_scale'])
+        self.assertTrue(problems['c_XAS.lua']['absent'])
+
+    def testTemplates(self):
+        registry = TemplateRegistry()
+        self.assertEqual(len(registry), 249)
+
+
+def suite():
+    loader = unittest.defaultTestLoader
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(loader.loadTestsFromTestCase(TestRenderer))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestTemplateRegistry))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
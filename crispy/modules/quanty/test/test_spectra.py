@@ -0,0 +1,227 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import numpy as np
+import unittest
+
+from ....gui.quanty import (
+    Axis, QuantyCalculation, QuantySpectra, Spectrum1D, Spectrum2D,
+    SpectrumStack, StickSpectrum)
+from ....utils.broaden import (
+    broaden, broaden_variable, energy_dependent_fwhm, evaluate_sticks)
+
+
+class TestQuantySpectra(unittest.TestCase):
+
+    def setUp(self):
+        self.x = Axis.linspace(700.0, 720.0, 2001)
+        x = np.asarray(self.x)
+
+        # Lorentzian lines with a width of 0.2 eV, as calculated by Quanty.
+        data = np.zeros((2, x.size))
+        for index, center in enumerate((705.0, 714.0)):
+            data[index] = 0.1 / ((x - center)**2 + 0.1**2)
+
+        self.data = data
+        self.scale = (x.max() - x.min()) / x.size
+
+        self.spectra = QuantySpectra()
+        self.spectra.raw = SpectrumStack(self.x, data)
+        self.spectra.appliedLorentzian = ([0.2], )
+
+    def testLorentzian(self):
+        self.spectra.broadenings = {'lorentzian': ([0.5], ), }
+        self.spectra.process()
+
+        expected = broaden(self.data, 0.3 / self.scale, 'lorentzian')
+        self.assertTrue(np.allclose(self.spectra.processed.data, expected))
+
+    def testAppliedLorentzian(self):
+        self.spectra.broadenings = {'lorentzian': ([0.2], ), }
+        self.spectra.process()
+
+        self.assertTrue(np.array_equal(
+            self.spectra.processed.data, self.data))
+
+    def testEnergyDependentLorentzian(self):
+        self.spectra.broadenings = {'lorentzian': ([0.2, 0.6], ), }
+        self.spectra.process()
+
+        fwhm = energy_dependent_fwhm(self.x, [0.0, 0.4]) / self.scale
+        expected = broaden_variable(self.data, fwhm, 'lorentzian')
+        self.assertTrue(np.allclose(self.spectra.processed.data, expected))
+
+        # The lines below the middle of the interval are unchanged.
+        self.assertTrue(np.array_equal(
+            self.spectra.processed.data[0, :900], self.data[0, :900]))
+
+    def testVoigt(self):
+        self.spectra.broadenings = {
+            'gaussian': (0.4, ),
+            'lorentzian': ([0.5], ), }
+
+        self.assertEqual(
+            self.spectra.postBroadenings(), {'voigt': ((0.4, 0.3), ), })
+
+        self.spectra.process()
+        fwhm = [0.4 / self.scale, 0.3 / self.scale]
+        expected = broaden(self.data, fwhm, 'voigt')
+        self.assertTrue(np.allclose(self.spectra.processed.data, expected))
+
+    def testNormalizeArea(self):
+        self.spectra.normalization = 'Area'
+        self.spectra.scale = -2.0
+        self.spectra.process()
+
+        stack = self.spectra.processed
+        x = np.asarray(self.x)
+        for index, spectrum in enumerate(stack):
+            area = np.sum((spectrum.y[1:] + spectrum.y[:-1]) / 2 * np.diff(x))
+            self.assertAlmostEqual(area, -1.0)
+            # The spectra of the stack and the individual spectra agree.
+            spectrum = Spectrum1D(self.x, self.data[index])
+            spectrum.normalize('Area')
+            self.assertTrue(np.allclose(spectrum.y, -stack.values[index]))
+
+    def testNarrowerLorentzian(self):
+        broadenings = {'lorentzian': ([0.1], ), }
+        with self.assertRaises(ValueError):
+            self.spectra.postBroadenings(broadenings)
+
+    def testEnergyDependentLorentzian2D(self):
+        y = Axis.linspace(0.0, 5.0, 51)
+        z = np.ones((3, self.x.size, y.size))
+        self.spectra.raw = SpectrumStack(self.x, z, y)
+        self.spectra.appliedLorentzian = ([0.2], [0.1])
+
+        broadenings = {'lorentzian': ([0.2, 0.4], [0.1]), }
+        with self.assertRaises(ValueError):
+            self.spectra.postBroadenings(broadenings)
+
+        spectrum = Spectrum2D(self.x, y, z[0])
+        with self.assertRaises(ValueError):
+            spectrum.broaden(broadenings)
+
+
+    def testRIXS(self):
+        calculation = QuantyCalculation(
+            experiment='RIXS', edge='L2,3-M4,5 (2p3d)')
+        x = Axis.linspace(850.0, 860.0, 101)
+        y = Axis.linspace(0.0, 5.0, 51)
+        z = np.ones((1, y.size, x.size))
+        self.spectra.raw = SpectrumStack(x, z, y)
+        self.spectra.appliedLorentzian = calculation.appliedLorentzian()
+
+        # The energy dependent broadening along the incident energy is
+        # that of the intermediate states, and is not added again.
+        broadenings = {
+            'gaussian': (0.2, 0.3),
+            'lorentzian': (calculation.xLorentzian,
+                           calculation.yLorentzian), }
+        self.assertEqual(self.spectra.postBroadenings(broadenings),
+                         {'gaussian': (0.2, 0.3), })
+
+        broadenings['lorentzian'] = (calculation.xLorentzian, [0.3])
+        postBroadenings = self.spectra.postBroadenings(broadenings)
+        self.assertEqual(postBroadenings['voigt'][0], (0.2, 0.0))
+        self.assertAlmostEqual(postBroadenings['voigt'][1][1], 0.2)
+
+        self.spectra.broadenings = broadenings
+        self.spectra.process()
+        self.assertEqual(self.spectra.processed.data.shape, z.shape)
+
+
+class TestStickSpectra(unittest.TestCase):
+
+    def setUp(self):
+        self.calculation = QuantyCalculation()
+        self.calculation.xGaussian = 0.0
+        self.x = np.asarray(Axis.linspace(
+            self.calculation.xMin, self.calculation.xMax,
+            self.calculation.xNPoints + 1))
+
+        random = np.random.RandomState(0)
+        self.sticks = dict()
+        for name in ('Isotropic', 'Right Polarized (R)',
+                     'Left Polarized (L)'):
+            energies = random.uniform(850.0, 875.0, 20)
+            weights = random.rand(20)
+            self.sticks[name] = StickSpectrum(energies, weights, name=name)
+
+    def evaluate(self, name):
+        stick = self.sticks[name]
+        fwhm = energy_dependent_fwhm(
+            self.x, self.calculation.xLorentzian, stick.energies)
+        return evaluate_sticks(
+            self.x, stick.energies, stick.weights, fwhm, 'lorentzian')
+
+    def testIsotropic(self):
+        spectra = self.calculation.spectra
+        spectra.toCalculateChecked = ['Isotropic']
+        spectra.loadSticks(self.calculation, self.sticks)
+
+        self.assertEqual(spectra.processed.names, ['Isotropic'])
+        self.assertTrue(np.allclose(
+            spectra.processed.data[0], self.evaluate('Isotropic')))
+
+    def testDichroism(self):
+        spectra = self.calculation.spectra
+        spectra.toCalculateChecked = ['Circular Dichroism']
+        # Only the components of the dichroic spectrum have sticks.
+        sticks = dict(self.sticks)
+        del sticks['Isotropic']
+        spectra.loadSticks(self.calculation, sticks)
+
+        names = spectra.processed.names
+        self.assertEqual(names, [
+            'Circular Dichroism (R-L)', 'Right Polarized (R)',
+            'Left Polarized (L)'])
+
+        right = self.evaluate('Right Polarized (R)')
+        left = self.evaluate('Left Polarized (L)')
+        data = spectra.processed.data
+        self.assertTrue(np.allclose(data[1], right))
+        self.assertTrue(np.allclose(data[2], left))
+        self.assertTrue(np.allclose(data[0], right - left))
+
+
+def suite():
+    loader = unittest.defaultTestLoader
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(loader.loadTestsFromTestCase(TestQuantySpectra))
+    test_suite.addTest(loader.loadTestsFromTestCase(TestStickSpectra))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,190 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+
+import numpy as np
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from . import fake_quanty
+from ..parser import read_spec, read_spec_columns, write_spec
+from ..split import split_window, stitch_spec
+from ....batch import create_calculation, run_calculation
+
+
+class TestSplit(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.header = {
+            'eminPole': -5.0, 'emaxPole': 10.0, 'dE': 0.04, 'gamma': 0.1}
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testWriteSpec(self):
+        # The values read from the files of Quanty are written unchanged.
+        random = np.random.RandomState(2)
+        energies = np.linspace(-15.0, 25.0, 1001)
+        spectra = random.randn(1001, 3) + 1j * random.randn(1001, 3)
+        path = os.path.join(self.directory, 'quanty.spec')
+        fake_quanty.write_spec(path, energies, spectra)
+
+        header, result, values = read_spec_columns(path)
+        self.assertEqual(header['spectra'], 3)
+        self.assertTrue(np.array_equal(result, np.loadtxt(
+            path, skiprows=5)[:, 0]))
+
+        copy = os.path.join(self.directory, 'copy.spec')
+        write_spec(copy, header, result, values)
+        self.assertTrue(np.array_equal(read_spec(copy), read_spec(path)))
+        self.assertTrue(np.array_equal(
+            np.loadtxt(copy, skiprows=5), np.loadtxt(path, skiprows=5)))
+
+    def testSplitWindow(self):
+        energies = np.linspace(-10.0, 30.0, 1001)
+        windows = split_window(-10.0, 30.0, 1000, 3, margin=25)
+        self.assertEqual(len(windows), 3)
+
+        stitched = list()
+        for window in windows:
+            part = np.linspace(window.emin, window.emax, window.intervals + 1)
+            stitched.append(part[window.first:window.last])
+        self.assertTrue(np.allclose(np.concatenate(stitched), energies))
+
+        self.assertEqual(windows[0].emin, -10.0)
+        self.assertEqual(windows[0].first, 0)
+        self.assertEqual(windows[1].first, 25)
+        self.assertEqual(len(split_window(0.0, 1.0, 2, 8)), 1)
+
+    def testStitchSpec(self):
+        random = np.random.RandomState(1)
+        energies = np.linspace(-2.0, 2.0, 101)
+        spectra = random.randn(101, 31) + 1j * random.randn(101, 31)
+
+        # Along the energies of the rows.
+        sources = list()
+        for index, window in enumerate(split_window(-2.0, 2.0, 100, 4, 3)):
+            lower = int(round((window.emin + 2.0) / 0.04))
+            rows = slice(lower, lower + window.intervals + 1)
+            path = os.path.join(self.directory, 'rows{}.spec'.format(index))
+            write_spec(path, self.header, energies[rows], spectra[rows])
+            sources.append((path, window))
+        path = os.path.join(self.directory, 'rows.spec')
+        stitch_spec(sources, path)
+        header, result, values = read_spec_columns(path)
+        self.assertTrue(np.allclose(result, energies))
+        self.assertTrue(np.allclose(values, spectra, rtol=1e-14, atol=0))
+        self.assertEqual(header['points'], 101)
+
+        # Along the incident energies of the columns.
+        sources = list()
+        for index, window in enumerate(split_window(0.0, 3.0, 30, 3)):
+            lower = int(round(window.emin / 0.1))
+            columns = slice(lower, lower + window.intervals + 1)
+            path = os.path.join(self.directory, 'cols{}.spec'.format(index))
+            write_spec(path, self.header, energies, spectra[:, columns])
+            sources.append((path, window))
+        path = os.path.join(self.directory, 'cols.spec')
+        stitch_spec(sources, path, axis=1)
+        self.assertTrue(
+            np.allclose(read_spec(path), spectra.imag, rtol=1e-14, atol=0))
+
+    def testRunParts(self):
+        # The stitched spectra agree with those of an unsplit calculation,
+        # up to the truncation of the broadening at the limits of the parts.
+        script = os.path.join(os.path.dirname(__file__), 'fake_quanty.py')
+        job = {
+            'element': 'Ni', 'charge': '2+', 'symmetry': 'Oh',
+            'experiment': 'XAS', 'edge': 'L2,3 (2p)', 'xLorentzian': [0.5]}
+
+        spectra = list()
+        for parts in (1, 5):
+            calculation = create_calculation(job)
+            directory = os.path.join(self.directory, str(parts))
+            os.mkdir(directory)
+            run_calculation(
+                calculation, [sys.executable, script], directory, parts)
+            spectra.append(calculation.spectra.raw['Isotropic'].y)
+
+        reference, result = spectra
+        self.assertEqual(result.shape, reference.shape)
+        delta = np.abs(result - reference).max() / np.abs(reference).max()
+        self.assertLess(delta, 5e-3)
+        self.assertTrue(
+            os.path.isdir(os.path.join(self.directory, '5', 'part4')))
+
+    def testSplitSpectra(self):
+        script = os.path.join(os.path.dirname(__file__), 'fake_quanty.py')
+        job = {
+            'element': 'Ni', 'charge': '2+', 'symmetry': 'Oh',
+            'experiment': 'XAS', 'edge': 'L2,3 (2p)', 'xLorentzian': [0.5],
+            'spectra': ['Isotropic', 'Circular Dichroism',
+                        'Linear Dichroism']}
+
+        calculations = list()
+        for parts, split in ((1, False), (1, True), (2, True)):
+            calculation = create_calculation(job)
+            directory = os.path.join(
+                self.directory, '{}_{}'.format(parts, split))
+            os.mkdir(directory)
+            run_calculation(
+                calculation, [sys.executable, script], directory, parts,
+                split)
+            calculations.append(calculation)
+        reference = calculations[0].spectra.raw
+
+        # Each of the spectra is calculated by its own process.
+        self.assertEqual(len(calculations[1].renderParts(1, True)), 3)
+        self.assertEqual(len(calculations[2].renderParts(2, True)), 6)
+
+        for calculation, tolerance in zip(calculations[1:], (0, 5e-3)):
+            result = calculation.spectra.raw
+            self.assertEqual(result.names, reference.names)
+            for name in reference.names:
+                delta = np.abs(result[name].y - reference[name].y).max()
+                self.assertLessEqual(
+                    delta, tolerance * np.abs(reference[name].y).max())
+
+
+def suite():
+    loader = unittest.defaultTestLoader
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(loader.loadTestsFromTestCase(TestSplit))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
@@ -0,0 +1,138 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import numpy as np
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from collections import OrderedDict
+
+from ....batch import create_calculation
+from ....sweep import Sweep, SweepStack, parameter_paths, set_value
+
+
+class TestSweep(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.calculation = create_calculation({
+            'element': 'Ni', 'charge': '2+', 'symmetry': 'Oh',
+            'experiment': 'XAS', 'edge': 'L2,3 (2p)'})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testSetValue(self):
+        paths = parameter_paths(self.calculation)
+        self.assertIn('fk', paths)
+        self.assertIn('Crystal Field/Initial Hamiltonian/10Dq(3d)', paths)
+
+        set_value(self.calculation, 'fk', 0.7)
+        data = self.calculation.hamiltonianData['Atomic']
+        self.assertEqual(data['Final Hamiltonian']['F2(3d,3d)'][1], 0.7)
+        self.assertEqual(data['Final Hamiltonian']['ζ(2p)'][1], 1.0)
+
+        set_value(self.calculation,
+                  'Crystal Field/Final Hamiltonian/10Dq(3d)', 1.5)
+        data = self.calculation.hamiltonianData['Crystal Field']
+        self.assertEqual(data['Final Hamiltonian']['10Dq(3d)'], 1.5)
+
+        self.assertRaises(ValueError, set_value, self.calculation, 'Dq', 1)
+
+    def testCalculations(self):
+        sweep = Sweep(self.calculation, [
+            ('Crystal Field/Initial Hamiltonian/10Dq(3d)', [0.5, 1.0, 1.5]),
+            ('temperature', [10, 300])])
+        self.assertEqual(sweep.shape, (3, 2))
+
+        calculations = sweep.calculations()
+        self.assertEqual(len(calculations), 6)
+        calculation = calculations[3]
+        data = calculation.hamiltonianData['Crystal Field']
+        self.assertEqual(data['Initial Hamiltonian']['10Dq(3d)'], 1.0)
+        self.assertEqual(calculation.temperature, 300)
+        self.assertEqual(len(set(c.baseName for c in calculations)), 6)
+
+        self.assertRaises(
+            ValueError, Sweep, self.calculation, [('zeta', [1.0])] * 2)
+        self.assertRaises(
+            ValueError, Sweep, self.calculation, [('Atomic/F2', [1.0])])
+
+    def testRun(self):
+        script = os.path.join(os.path.dirname(__file__), 'fake_quanty.py')
+        values = np.linspace(0.0, 2.0, 5)
+        sweep = Sweep(self.calculation, [('fk', values)])
+        stack = sweep.run(
+            [sys.executable, script], self.directory, processes=3)
+
+        self.assertEqual(stack.data.shape, (5, stack.x.size))
+        self.assertTrue(np.array_equal(stack.coordinates['fk'], values))
+        result = sweep.results[2]
+        self.assertTrue(np.allclose(
+            stack.data[2], result.spectra.processed['Isotropic'].y))
+
+        image = stack.image()
+        self.assertEqual(image.z.shape, stack.data.shape)
+        self.assertEqual(image.yLimits, (0.0, 2.0, 5))
+
+        path = os.path.join(self.directory, 'sweep.npz')
+        stack.save(path)
+        with np.load(path) as data:
+            self.assertTrue(np.array_equal(data['data'], stack.data))
+            self.assertEqual(list(data['paths']), ['fk'])
+
+    def testImage(self):
+        x = np.linspace(850.0, 860.0, 11)
+        values = np.array([0.0, 0.5, 2.0])
+        # The spectra change linearly with the value of the parameter.
+        data = values[:, np.newaxis] * np.ones(x.size)
+        stack = SweepStack(data, OrderedDict([('fk', values)]), x)
+
+        image = stack.image()
+        self.assertEqual(image.yLimits, (0.0, 2.0, 3))
+        self.assertTrue(np.allclose(image.z[:, 0], [0.0, 1.0, 2.0]))
+
+        stack.coordinates['fk'] = np.array([0.0, 1.0, 1.0])
+        self.assertRaises(ValueError, stack.image)
+
+
+def suite():
+    loader = unittest.defaultTestLoader
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(loader.loadTestsFromTestCase(TestSweep))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
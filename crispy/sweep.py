@@ -0,0 +1,285 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+"""
+Sweep one or two parameters of a Quanty calculation:
+
+    import numpy as np
+    from crispy.gui.quanty import QuantyCalculation
+    from crispy.sweep import Sweep
+
+    calculation = QuantyCalculation(
+        element='Ni', charge='2+', symmetry='Oh', experiment='XAS',
+        edge='L2,3 (2p)')
+    sweep = Sweep(calculation, [
+        ('Crystal Field/Initial Hamiltonian/10Dq(3d)', np.linspace(0, 2, 21)),
+        ('Crystal Field/Final Hamiltonian/10Dq(3d)', np.linspace(0, 2, 21))])
+    stack = sweep.run('/usr/local/bin/Quanty', 'sweep', processes=16)
+    stack.data.shape  # (21, 21, energies)
+
+The parameters are given by their paths (see set_value). The variants of
+the calculation are run in parallel, and their spectra are stacked into a
+single array, indexed by the values of the parameters.
+"""
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import copy
+import itertools
+import numpy as np
+from collections import OrderedDict
+
+from .batch import DEFAULTS, run_calculations, set_parameter
+from .gui.quanty import Axis, QuantyCalculation, Spectrum2D
+
+
+# The scale factors of the Slater integrals and of the spin-orbit coupling.
+SCALE_FACTORS = ('fk', 'gk', 'zeta')
+
+# The attributes of the calculation, besides the scale factors, that can be
+# swept.
+ATTRIBUTES = ('temperature', )
+
+
+def parameter_paths(calculation):
+    """Return the paths of the parameters of a calculation to sweep."""
+    paths = list(SCALE_FACTORS) + list(ATTRIBUTES)
+    for term, configurations in calculation.hamiltonianData.items():
+        for configuration, parameters in configurations.items():
+            for parameter in parameters:
+                paths.append('/'.join((term, configuration, parameter)))
+    return paths
+
+
+def set_value(calculation, path, value):
+    """
+    Set the value of a parameter of a calculation. The path is either the
+    path of a Hamiltonian parameter (see batch.set_parameter), one of the
+    scale factors fk, gk, and zeta, or the temperature.
+    """
+    if path in SCALE_FACTORS:
+        calculation.setScaleFactors(**{str(path): value})
+    elif path in ATTRIBUTES:
+        setattr(calculation, path, value)
+    elif '/' in path:
+        set_parameter(calculation, path, value)
+    else:
+        raise ValueError('Invalid parameter path: {}.'.format(path))
+
+
+class SweepStack(object):
+    """
+    The spectra of a sweep, stacked in a single array. The first dimensions
+    of data are those of the sweep, indexed by the values of the parameters
+    in coordinates; the others are those of the spectra, with the axes x
+    and, for 2D spectra, y. The spectra of the failed calculations are NaN.
+    """
+
+    def __init__(self, data, coordinates, x, y=None, name=None,
+                 xLabel=None, yLabel=None):
+        self.data = data
+        self.coordinates = coordinates
+        self.x = x
+        self.y = y
+        self.name = name
+        self.xLabel = xLabel
+        self.yLabel = yLabel
+
+    @property
+    def paths(self):
+        return list(self.coordinates)
+
+    def image(self, index=0):
+        """
+        Return the map of the first parameter versus the energy as a 2D
+        spectrum. For sweeps of two parameters, the second parameter is
+        fixed to the value with the given index. The maps are plotted on
+        uniform grids; if the values of the parameter are not evenly
+        spaced, the spectra are interpolated linearly onto a grid with the
+        same number of points.
+        """
+        if self.y is not None:
+            raise ValueError('The spectra of the sweep are not 1D spectra.')
+
+        data = self.data
+        if data.ndim == 3:
+            data = data[:, index]
+
+        path, values = list(self.coordinates.items())[0]
+        values = np.asarray(values)
+        y = Axis.linspace(values[0], values[-1], len(values))
+        if not np.allclose(np.asarray(y), values):
+            order = np.argsort(values)
+            values = values[order]
+            if np.any(np.diff(values) == 0):
+                raise ValueError(
+                    'The values of {} are repeated.'.format(path))
+            y = Axis.linspace(values[0], values[-1], len(values))
+            grid = np.asarray(y)
+
+            indices = np.clip(
+                np.searchsorted(values, grid), 1, len(values) - 1)
+            lower, upper = values[indices - 1], values[indices]
+            weights = ((grid - lower) / (upper - lower))[:, np.newaxis]
+            data = data[order]
+            data = (data[indices - 1] * (1 - weights)
+                    + data[indices] * weights)
+
+        return Spectrum2D(
+            self.x, y, data, name=self.name, xLabel=self.xLabel,
+            yLabel=path)
+
+    def save(self, path):
+        """Save the stack and its coordinates in a .npz file."""
+        arrays = dict(data=self.data, x=self.x)
+        if self.y is not None:
+            arrays['y'] = self.y
+        for index, values in enumerate(self.coordinates.values()):
+            arrays['coordinates{}'.format(index)] = values
+        np.savez(path, paths=np.array(self.paths), **arrays)
+
+
+class Sweep(object):
+    """
+    Sweep of one or two parameters of a calculation. The parameters are
+    given as a list of (path, values) pairs; a variant of the calculation is
+    created for each combination of values, in row-major order.
+    """
+
+    def __init__(self, calculation, parameters):
+        if len(parameters) not in (1, 2):
+            raise ValueError('One or two parameters can be swept.')
+
+        self.calculation = calculation
+        self.coordinates = OrderedDict()
+        for path, values in parameters:
+            if path in self.coordinates:
+                raise ValueError('The parameter {} is repeated.'.format(path))
+            values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+            if values.ndim != 1 or values.size == 0:
+                raise ValueError('Invalid values of {}.'.format(path))
+            self.coordinates[path] = values
+
+        # Fail early on invalid paths.
+        calculation = copy.deepcopy(self.calculation)
+        for path, values in self.coordinates.items():
+            set_value(calculation, path, values[0])
+
+        self.results = [None] * self.size
+
+    @property
+    def shape(self):
+        return tuple(values.size for values in self.coordinates.values())
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def points(self):
+        """Return the values of the parameters of each variant."""
+        return list(itertools.product(*self.coordinates.values()))
+
+    def calculations(self):
+        """Create the variants of the calculation."""
+        calculations = list()
+        for index, point in enumerate(self.points()):
+            calculation = copy.deepcopy(self.calculation)
+            for path, value in zip(self.coordinates, point):
+                set_value(calculation, path, float(value))
+            calculation.baseName = '{}_{:04d}'.format(
+                self.calculation.baseName, index)
+            calculations.append(calculation)
+        return calculations
+
+    def isComplete(self):
+        return all(result is not None for result in self.results)
+
+    def setResult(self, index, result):
+        """Set the calculation of a variant, or the error it raised."""
+        self.results[index] = result
+
+    def run(self, executable, directory, processes=None, keep=False,
+            callback=None):
+        """
+        Run the variants of the calculation in parallel (see
+        batch.run_calculations), and return the stack of their spectra.
+        """
+        calculations = self.calculations()
+        for calculation in calculations:
+            for key, value in DEFAULTS.items():
+                if getattr(calculation, key) is None:
+                    setattr(calculation, key, value)
+
+        def store(index, result):
+            self.setResult(index, result)
+            if callback is not None:
+                callback(index, result)
+
+        run_calculations(
+            calculations, executable, directory, processes, keep, store)
+        return self.stack()
+
+    def stack(self, name=None):
+        """
+        Stack the processed spectra with the given name, by default the
+        first spectrum of the calculations.
+        """
+        results = [result for result in self.results
+                   if isinstance(result, QuantyCalculation) and
+                   hasattr(result.spectra, 'processed')]
+        if not results:
+            raise ValueError('None of the calculations was successful.')
+
+        processed = results[0].spectra.processed
+        if name is None:
+            name = processed.names[0]
+        first = processed[name]
+
+        if processed.ndim == 1:
+            shape = first.y.shape
+            y = None
+        else:
+            shape = first.z.shape
+            y = first.y
+
+        data = np.full((self.size, ) + shape, np.nan)
+        for index, result in enumerate(self.results):
+            if not isinstance(result, QuantyCalculation):
+                continue
+            try:
+                spectrum = result.spectra.processed[name]
+            except (AttributeError, ValueError):
+                continue
+            data[index] = spectrum.y if y is None else spectrum.z
+        data = data.reshape(self.shape + shape)
+
+        return SweepStack(
+            data, self.coordinates, first.x, y, name,
+            first.xLabel, first.yLabel)
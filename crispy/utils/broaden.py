@@ -29,11 +29,156 @@ __authors__ = ['Marius Retegan']
 __license__ = 'MIT'
 __date__ = '04/10/2017'
 
+from collections import OrderedDict
+import functools
 import numpy as np
+import threading
+import timeit
 
 MIN_KERNEL_SUM = 1e-8
 
+# Relative costs of the convolution methods, in seconds per elementary
+# operation. The defaults are replaced by the values measured on the host
+# the first time a method is selected automatically (see calibrate_methods).
+METHOD_COSTS = {
+    'direct': 1e-9,
+    'fft': 5e-9,
+    'block': 2e-5,
+}
+_methods_calibrated = False
 
+
+class KernelCache(object):
+    """
+    Bounded least recently used cache for the convolution kernels and their
+    Fourier transforms. The cached arrays are made read-only, as they are
+    shared between all the callers.
+
+    The cache is bounded both by the number of entries and by the memory
+    used by the arrays, since the transforms of the two-dimensional kernels
+    can be much larger than the kernels themselves.
+    """
+
+    def __init__(self, maxsize=128, maxbytes=128 * 2**20):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, factory):
+        """
+        Return the value stored for the key. If the key is missing, the value
+        is created by calling the factory and stored in the cache.
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                value = factory()
+                if isinstance(value, np.ndarray):
+                    value.setflags(write=False)
+            else:
+                self.hits += 1
+                self.nbytes -= getattr(value, 'nbytes', 0)
+
+            self._data[key] = value
+            self.nbytes += getattr(value, 'nbytes', 0)
+            # An array larger than the cache is returned, but not kept.
+            while self._data and (len(self._data) > self.maxsize or
+                                  self.nbytes > self.maxbytes):
+                _, evicted = self._data.popitem(last=False)
+                self.nbytes -= getattr(evicted, 'nbytes', 0)
+
+        return value
+
+    def info(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'nbytes': self.nbytes,
+            'maxbytes': self.maxbytes,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+kernel_cache = KernelCache()
+
+
+def _freeze(value):
+    value = np.asarray(value, dtype=np.float64)
+    if value.ndim == 0:
+        return float(value)
+    return tuple(value.ravel().tolist())
+
+
+def cached_kernel(function):
+    """
+    Store the kernels returned by the function in the kernel cache. The key
+    is made of the name of the function, i.e. the kind of the kernel, and
+    the values of its arguments (the widths, in units of the grid spacing,
+    and the truncation). The key is available as the key attribute of the
+    decorated function.
+    """
+    code = function.__code__
+    names = code.co_varnames[:code.co_argcount]
+    defaults = dict(zip(names[len(names) - len(function.__defaults__):],
+                        function.__defaults__))
+
+    def key(*args, **kwargs):
+        values = dict(defaults)
+        values.update(zip(names, args))
+        values.update(kwargs)
+        return (function.__name__, ) + tuple(
+            _freeze(values[name]) for name in names)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        return kernel_cache.get(
+            key(*args, **kwargs), lambda: function(*args, **kwargs))
+
+    wrapper.key = key
+    return wrapper
+
+
+def cache_info():
+    """Return the hit and miss statistics of the kernel cache."""
+    return kernel_cache.info()
+
+
+def kernel_rfft(kernel, shape, key=None):
+    """
+    Return the real-input FFT of the kernel, zero padded to the given shape.
+    If a kernel key is given, the transform is stored in the kernel cache.
+    """
+    shape = tuple(int(size) for size in shape)
+    axes = tuple(range(len(shape)))
+
+    if key is None:
+        return np.fft.rfftn(kernel, shape, axes)
+
+    key = key + ('rfft', shape, np.asarray(kernel).dtype.str)
+    return kernel_cache.get(key, lambda: np.fft.rfftn(kernel, shape, axes))
+
+
+@cached_kernel
 def gaussian_kernel1d(sigma=None, truncate=6):
     size = int(2 * truncate * sigma)
     if size % 2 == 0:
@@ -52,6 +197,7 @@ def gaussian_kernel1d(sigma=None, truncate=6):
     return kernel
 
 
+@cached_kernel
 def gaussian_kernel2d(sigma=None, truncate=(6, 6)):
     if sigma.size != 2 or len(truncate) != 2:
         raise Exception('Sigma and the truncation parameter don\'t have the '
@@ -62,6 +208,49 @@ def gaussian_kernel2d(sigma=None, truncate=(6, 6)):
     return kernel
 
 
+@cached_kernel
+def lorentzian_kernel1d(gamma=None, truncate=50):
+    """
+    Lorentzian kernel with half width at half maximum gamma, in units of
+    the grid spacing. The tails of the Lorentzian decay slowly, therefore
+    the kernel is truncated at a larger multiple of the width than the
+    Gaussian one.
+    """
+    size = int(2 * truncate * gamma)
+    if size % 2 == 0:
+        size = size + 1
+    x = np.arange(size)
+    mu = np.median(x)
+    # The prefactor 1 / np.pi drops in the normalization.
+    kernel = gamma / ((x - mu)**2 + gamma**2)
+    if kernel.sum() < MIN_KERNEL_SUM:
+        raise Exception(
+            'The kernel can\'t be normalized, because its sum is close to '
+            'zero. The sum of the kernel is < {0}'.format(MIN_KERNEL_SUM))
+    kernel /= kernel.sum()
+    return kernel
+
+
+@cached_kernel
+def voigt_kernel1d(sigma=None, gamma=None, truncate=(6, 50)):
+    """
+    Voigt kernel, i.e. the convolution of a Gaussian with standard
+    deviation sigma and a Lorentzian with half width at half maximum
+    gamma. If one of the widths is zero, the other profile is returned.
+    """
+    if sigma <= 0 and gamma <= 0:
+        return np.ones(1)
+    elif gamma <= 0:
+        return gaussian_kernel1d(sigma, truncate[0])
+    elif sigma <= 0:
+        return lorentzian_kernel1d(gamma, truncate[1])
+
+    kernel = np.convolve(gaussian_kernel1d(sigma, truncate[0]),
+                         lorentzian_kernel1d(gamma, truncate[1]))
+    kernel /= kernel.sum()
+    return kernel
+
+
 def convolve_fft(array, kernel):
     """
     Convolve an array with a kernel using FFT.
@@ -70,8 +259,8 @@ def convolve_fft(array, kernel):
     https://github.com/astropy/astropy/blob/master/astropy/convolution/convolve.py
     """
 
-    array = np.asarray(array, dtype=np.complex)
-    kernel = np.asarray(kernel, dtype=np.complex)
+    array = np.asarray(array, dtype=np.complex128)
+    kernel = np.asarray(kernel, dtype=np.complex128)
 
     if array.ndim != kernel.ndim:
         raise ValueError("Image and kernel must have same number of "
@@ -95,13 +284,13 @@ def convolve_fft(array, kernel):
     kernel_slices = tuple(kernel_slices)
 
     if not np.all(new_shape == array_shape):
-        big_array = np.zeros(new_shape, dtype=np.complex)
+        big_array = np.zeros(new_shape, dtype=np.complex128)
         big_array[array_slices] = array
     else:
         big_array = array
 
     if not np.all(new_shape == kernel_shape):
-        big_kernel = np.zeros(new_shape, dtype=np.complex)
+        big_kernel = np.zeros(new_shape, dtype=np.complex128)
         big_kernel[kernel_slices] = kernel
     else:
         big_kernel = kernel
@@ -114,22 +303,715 @@ def convolve_fft(array, kernel):
     return rifft[array_slices].real
 
 
-def broaden(array, fwhm=None, kind='gaussian'):
-    if fwhm is None:
-        return
+def _real_dtype(array, dtype=None):
+    if dtype is None:
+        if array.dtype in (np.float32, np.float64):
+            dtype = array.dtype
+        else:
+            dtype = np.float64
+    return np.dtype(dtype)
 
-    fwhm = np.array(fwhm)
-    if (fwhm <= 0).any():
-        return array
+
+def next_fast_len(size):
+    """
+    Return the smallest 5-smooth number (a product of 2, 3 and 5) that is
+    larger or equal to size. The FFT is fastest for these lengths.
+    """
+    if size <= 6:
+        return max(int(size), 1)
+
+    best = 2 ** int(np.ceil(np.log2(size)))
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            # Smallest power of two such that p35 * p2 >= size.
+            quotient = -(-size // p35)
+            p2 = 2 ** int(np.ceil(np.log2(quotient)))
+            candidate = p2 * p35
+            if candidate < best:
+                best = candidate
+            p35 *= 3
+        p5 *= 5
+    return int(best)
+
+
+def convolve_rfft(array, kernel, dtype=None, key=None):
+    """
+    Convolve a real array with a real kernel using the real-input FFT.
+
+    The result has the same shape as the array and is centered with
+    respect to the kernel, i.e. it is identical to the output of
+    convolve_fft, but it requires roughly half the memory and half the
+    number of operations. Both inputs are zero padded to fast FFT lengths.
+
+    :param array: Array to be convolved.
+    :param kernel: Convolution kernel, with an odd size in every dimension.
+    :param dtype: Floating point type used for the calculation (np.float32
+                  or np.float64). By default the type of the array is used
+                  if it is a floating point type, otherwise np.float64.
+    :param key: Cache key of the kernel (see cached_kernel). If given, the
+                transform of the kernel is taken from the kernel cache.
+    """
+    array = np.asarray(array)
+    kernel = np.asarray(kernel)
+
+    if array.ndim != kernel.ndim:
+        raise ValueError("Image and kernel must have same number of "
+                         "dimensions")
+
+    dtype = _real_dtype(array, dtype)
+
+    array = np.asarray(array, dtype=dtype)
+    kernel = np.asarray(kernel, dtype=dtype)
+
+    axes = tuple(range(array.ndim))
+    shape = [next_fast_len(a + k - 1)
+             for a, k in zip(array.shape, kernel.shape)]
+
+    array_fft = np.fft.rfftn(array, shape, axes)
+    kernel_fft = kernel_rfft(kernel, shape, key)
+
+    result = np.fft.irfftn(array_fft * kernel_fft, shape, axes)
+
+    # Select the central part of the full convolution.
+    slices = tuple(slice(k // 2, k // 2 + a)
+                   for a, k in zip(array.shape, kernel.shape))
+
+    return np.asarray(result[slices], dtype=dtype)
+
+
+def convolve_rfft_axis(array, kernel, axis=-1, dtype=None, key=None):
+    """
+    Convolve a real array with a real one-dimensional kernel along a
+    single axis using the real-input FFT. The other axes are transformed
+    independently, which makes this the building block for separable
+    kernels.
+    """
+    array = np.asarray(array)
+    kernel = np.asarray(kernel)
+
+    if kernel.ndim != 1:
+        raise ValueError('The kernel must be one-dimensional.')
+
+    dtype = _real_dtype(array, dtype)
+
+    array = np.asarray(array, dtype=dtype)
+    kernel = np.asarray(kernel, dtype=dtype)
+
+    axis = axis % array.ndim
+    size = array.shape[axis]
+    n = next_fast_len(size + kernel.size - 1)
+
+    # Reshape the kernel transform so that it broadcasts along the axis.
+    kernel_fft = kernel_rfft(kernel, (n, ), key)
+    shape = [1] * array.ndim
+    shape[axis] = kernel_fft.size
+    kernel_fft = kernel_fft.reshape(shape)
+
+    array_fft = np.fft.rfft(array, n, axis=axis)
+    array_fft *= kernel_fft
+    result = np.fft.irfft(array_fft, n, axis=axis)
+
+    start = kernel.size // 2
+    slices = [slice(None)] * array.ndim
+    slices[axis] = slice(start, start + size)
+    result = result[tuple(slices)]
+
+    return np.asarray(result, dtype=dtype)
+
+
+def convolve_separable(array, kernels, dtype=None, keys=None):
+    """
+    Convolve a real array with a separable kernel, given as a list of
+    one-dimensional kernels, one for each axis of the array. The result
+    is identical to the convolution with their outer product, but the
+    arrays are only padded along one axis at a time.
+    """
+    if len(kernels) != np.ndim(array):
+        raise ValueError('The number of kernels must match the number of '
+                         'dimensions of the array.')
+
+    if keys is None:
+        keys = [None] * len(kernels)
+
+    result = array
+    for axis, (kernel, key) in enumerate(zip(kernels, keys)):
+        result = convolve_rfft_axis(result, kernel, axis, dtype, key)
+    return result
+
+
+def convolve_direct(array, kernel, dtype=None):
+    """
+    Convolve a one-dimensional array with a kernel in the direct space. This
+    is the fastest method for narrow kernels.
+    """
+    array = np.asarray(array)
+    dtype = _real_dtype(array, dtype)
+
+    array = np.asarray(array, dtype=dtype)
+    kernel = np.asarray(kernel, dtype=dtype)
+
+    if array.ndim != 1 or kernel.ndim != 1:
+        raise ValueError('The array and kernel must be one-dimensional.')
+
+    start = kernel.size // 2
+    result = np.convolve(array, kernel)[start:start + array.size]
+
+    return np.asarray(result, dtype=dtype)
+
+
+def _overlap_add_fft_size(kernel_size):
+    return next_fast_len(max(8 * kernel_size, 1024))
+
+
+def convolve_overlap_add(array, kernel, dtype=None, key=None):
+    """
+    Convolve a long one-dimensional array with a much shorter kernel using
+    the overlap-add method. The array is split into blocks that are
+    convolved using short FFTs, and the results are added together.
+    """
+    array = np.asarray(array)
+    dtype = _real_dtype(array, dtype)
+
+    array = np.asarray(array, dtype=dtype)
+    kernel = np.asarray(kernel, dtype=dtype)
+
+    if array.ndim != 1 or kernel.ndim != 1:
+        raise ValueError('The array and kernel must be one-dimensional.')
+
+    n = _overlap_add_fft_size(kernel.size)
+    block_size = n - kernel.size + 1
+
+    kernel_fft = kernel_rfft(kernel, (n, ), key)
+
+    result = np.zeros(array.size + n, dtype=dtype)
+    for start in range(0, array.size, block_size):
+        block = array[start:start + block_size]
+        result[start:start + n] += np.fft.irfft(
+            np.fft.rfft(block, n) * kernel_fft, n)
+
+    start = kernel.size // 2
+    return result[start:start + array.size]
+
+
+def _best_time(function, repeat=3):
+    times = list()
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        function()
+        times.append(timeit.default_timer() - start)
+    return min(times)
+
+
+def calibrate_methods(repeat=3):
+    """
+    Measure the cost of the convolution methods on the current host and
+    update METHOD_COSTS. The micro-benchmark takes a few tens of
+    milliseconds.
+    """
+    global _methods_calibrated
+
+    random = np.random.RandomState(0)
+
+    array = random.rand(4096)
+    kernel = gaussian_kernel1d(5.0)
+    t = _best_time(lambda: convolve_direct(array, kernel), repeat)
+    METHOD_COSTS['direct'] = t / (array.size * kernel.size)
+
+    array = random.rand(2**15)
+    size = next_fast_len(array.size + kernel.size - 1)
+    t = _best_time(lambda: convolve_rfft(array, kernel), repeat)
+    METHOD_COSTS['fft'] = float(t / (size * np.log2(size)))
+
+    # The overhead of a block is the part of the overlap-add time that is
+    # not explained by the FFTs.
+    n = _overlap_add_fft_size(kernel.size)
+    blocks = np.ceil(array.size / (n - kernel.size + 1))
+    t = _best_time(lambda: convolve_overlap_add(array, kernel), repeat)
+    overhead = t / blocks - METHOD_COSTS['fft'] * n * np.log2(n)
+    METHOD_COSTS['block'] = max(float(overhead), 0.0)
+
+    _methods_calibrated = True
+    return dict(METHOD_COSTS)
+
+
+def estimate_costs(array_shape, kernel_shape, costs=None):
+    """
+    Return the estimated time needed by each of the convolution methods
+    for the given array and kernel shapes. The costs of the elementary
+    operations default to METHOD_COSTS.
+    """
+    if costs is None:
+        costs = METHOD_COSTS
+
+    size = int(np.prod(array_shape))
+    kernel_size = int(np.prod(kernel_shape))
+
+    n = 1
+    for a, k in zip(array_shape, kernel_shape):
+        n *= next_fast_len(a + k - 1)
+    estimates = {'fft': costs['fft'] * n * np.log2(max(n, 2))}
+
+    if len(array_shape) == 1 and len(kernel_shape) == 1:
+        estimates['direct'] = costs['direct'] * size * kernel_size
+
+        n = _overlap_add_fft_size(kernel_size)
+        blocks = np.ceil(size / (n - kernel_size + 1))
+        estimates['overlap-add'] = blocks * (
+            costs['fft'] * n * np.log2(n) + costs['block'])
+
+    return estimates
+
+
+def choose_method(array_shape, kernel_shape, costs=None):
+    """
+    Select the fastest convolution method, 'direct', 'fft' or
+    'overlap-add', for the given array and kernel shapes. The direct and
+    overlap-add methods are only considered for one-dimensional arrays.
+
+    The costs of the elementary operations can be given, in the format of
+    METHOD_COSTS; otherwise those measured on the host are used.
+    """
+    if costs is None and not _methods_calibrated:
+        calibrate_methods()
+
+    estimates = estimate_costs(
+        tuple(array_shape), tuple(kernel_shape), costs)
+    return min(sorted(estimates), key=lambda method: estimates[method])
+
+
+def convolve(array, kernel, method='auto', dtype=None, key=None):
+    """
+    Convolve a real array with a real kernel using the given method, or
+    using the one selected by choose_method if method is 'auto'. The key
+    of the kernel is used to cache its transform.
+    """
+    array = np.asarray(array)
+    kernel = np.asarray(kernel)
+
+    if method == 'auto':
+        method = choose_method(array.shape, kernel.shape)
+
+    if method == 'direct':
+        return convolve_direct(array, kernel, dtype)
+    elif method == 'overlap-add':
+        return convolve_overlap_add(array, kernel, dtype, key)
+    elif method == 'fft':
+        return convolve_rfft(array, kernel, dtype, key)
+    else:
+        raise ValueError('Unknown convolution method: {}.'.format(method))
+
+
+def energy_dependent_fwhm(x, widths, energies=None):
+    """
+    Return the FWHM at every point of the x axis, using the same convention
+    as the Lorentzian broadening of the Quanty calculations: widths is a
+    list with one (constant), two (the width changes from the first to the
+    second value at the middle of the interval) or three elements (the
+    third element is the energy where the width changes).
+
+    If energies are given, the widths are returned for these energies
+    instead, e.g. for the poles of a stick spectrum, while x still defines
+    the interval.
+    """
+    x = np.asarray(x)
+    widths = [float(width) for width in widths]
+
+    if energies is None:
+        energies = x
+    energies = np.asarray(energies)
+
+    if len(widths) == 1:
+        return np.full(energies.shape, widths[0])
+
+    if len(widths) == 2:
+        pivot = (x.min() + x.max()) / 2
+    else:
+        pivot = widths[2]
+
+    return np.where(energies < pivot, widths[0], widths[1])
+
+
+def lorentzian_difference(x, widths, applied):
+    """
+    Return the Lorentzian broadening that must be added to a spectrum
+    already broadened with the applied widths to obtain the given widths.
+    Both widths, and the result, follow the convention of
+    energy_dependent_fwhm. The convolution of two Lorentzians is a
+    Lorentzian with the sum of their widths, therefore the result is the
+    difference of the widths.
+
+    A ValueError is raised if the given widths are smaller than the applied
+    ones, or if the two change at different energies.
+    """
+    x = np.asarray(x)
+
+    def explicit(values):
+        values = [float(value) for value in values]
+        if len(values) == 1 or values[0] == values[1]:
+            return values[0], values[0], None
+        if len(values) == 2:
+            return values[0], values[1], float(x.min() + x.max()) / 2
+        return values[0], values[1], values[2]
+
+    first, second, pivot = explicit(widths)
+    applied_first, applied_second, applied_pivot = explicit(applied)
+
+    if pivot is None:
+        pivot = applied_pivot
+    elif applied_pivot is not None and not np.isclose(pivot, applied_pivot):
+        raise ValueError(
+            'The Lorentzian broadening must change at the same energy as '
+            'the one of the calculation.')
+
+    first = first - applied_first
+    second = second - applied_second
+    tolerance = 1e-9
+    if min(first, second) < -tolerance:
+        raise ValueError(
+            'The Lorentzian broadening cannot be smaller than the one of the '
+            'calculation.')
+    first, second = max(first, 0.0), max(second, 0.0)
+
+    if pivot is None or abs(first - second) <= tolerance:
+        return [first]
+    return [first, second, pivot]
+
+
+def broaden_variable(array, fwhm, kind='lorentzian', truncate=None,
+                     chunk_size=256):
+    """
+    Broaden a one-dimensional array, or a stack of arrays along the last
+    axis, with a kernel whose FWHM changes along the array. The fwhm
+    argument contains the width, in units of the grid spacing, that is used
+    for every point of the result; the points with a zero width are left
+    unchanged.
+
+    The convolution cannot be done using FFTs; instead the kernels are
+    evaluated for blocks of chunk_size points at a time, which keeps the
+    memory usage bounded. For a constant width the result is identical to
+    the one returned by broaden().
+    """
+    array = np.asarray(array, dtype=np.float64)
+    size = array.shape[-1]
+    fwhm = np.broadcast_to(np.asarray(fwhm, dtype=np.float64), (size, ))
 
     if kind == 'gaussian':
+        if truncate is None:
+            truncate = 6
         sigma = fwhm / (2 * np.sqrt(2 * np.log(2)))
-        if fwhm.size == 1:
-            kernel = gaussian_kernel1d(sigma)
-        elif fwhm.size == 2:
-            kernel = gaussian_kernel2d(sigma)
+    elif kind == 'lorentzian':
+        if truncate is None:
+            truncate = 50
+        sigma = fwhm / 2
     else:
         print('Unvailable type of broadening.')
         return array
 
-    return convolve_fft(array, kernel)
+    if (sigma < 0).any():
+        raise ValueError('The width of the kernel cannot be negative.')
+
+    # The points with a zero width are left unchanged.
+    zero = sigma == 0
+    sigma = np.where(zero, 1.0, sigma)
+
+    # Half size of the kernel at every point, following the convention used
+    # by the constant width kernels.
+    sizes = (2 * truncate * sigma).astype(int)
+    sizes = sizes + (sizes % 2 == 0)
+    half_sizes = sizes // 2
+    half_size = half_sizes.max()
+
+    rows = array.reshape(-1, size)
+    offsets = np.arange(-half_size, half_size + 1)
+    padded = np.zeros((rows.shape[0], size + 2 * half_size))
+    padded[:, half_size:half_size + size] = rows
+
+    # The kernels are shared by all the rows of the stack.
+    chunk_size = max(1, chunk_size // rows.shape[0])
+
+    result = np.empty_like(rows)
+    for start in range(0, size, chunk_size):
+        stop = min(start + chunk_size, size)
+        index = np.arange(start, stop)[:, np.newaxis]
+        width = sigma[start:stop, np.newaxis]
+
+        if kind == 'gaussian':
+            kernels = np.exp(-0.5 * (offsets**2 / width**2))
+        else:
+            kernels = width / (offsets**2 + width**2)
+
+        mask = np.abs(offsets) <= half_sizes[start:stop, np.newaxis]
+        kernels = np.where(mask, kernels, 0.0)
+        kernels /= kernels.sum(axis=1)[:, np.newaxis]
+
+        values = padded[:, index - offsets + half_size]
+        result[:, start:stop] = np.einsum('ck,rck->rc', kernels, values)
+
+    result[:, zero] = rows[:, zero]
+
+    return result.reshape(array.shape)
+
+
+def evaluate_sticks(x, energies, weights, fwhm, kind='gaussian',
+                    chunk_size=2**20):
+    """
+    Evaluate a stick spectrum, i.e. a list of poles with given energies and
+    weights, on an arbitrary energy grid. Every stick is replaced by a line
+    shape with unit area, so the weights are the integrated intensities.
+
+    The kind can be 'gaussian', 'lorentzian' or 'voigt'. The FWHM is given
+    in energy units and can be different for every stick; for a Voigt
+    profile it is a (Gaussian, Lorentzian) pair, and the line shape is
+    approximated by the pseudo-Voigt function of Thompson, Cox and Hastings,
+    which is accurate to about one percent.
+
+    The line shapes are evaluated for blocks of points so that at most
+    chunk_size values are held in memory at a time.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    energies = np.asarray(energies, dtype=np.float64).ravel()
+    weights = np.asarray(weights, dtype=np.float64).ravel()
+
+    if energies.size != weights.size:
+        raise ValueError('The energies and weights must have the same size.')
+
+    fwhm = np.asarray(fwhm, dtype=np.float64)
+    if kind == 'voigt':
+        fwhm = np.broadcast_to(fwhm, (energies.size, 2))
+        gaussian, lorentzian = fwhm[:, 0], fwhm[:, 1]
+        # Total width and mixing parameter of the pseudo-Voigt profile.
+        total = (gaussian**5 + 2.69269 * gaussian**4 * lorentzian +
+                 2.42843 * gaussian**3 * lorentzian**2 +
+                 4.47163 * gaussian**2 * lorentzian**3 +
+                 0.07842 * gaussian * lorentzian**4 + lorentzian**5)**0.2
+        ratio = lorentzian / total
+        eta = 1.36603 * ratio - 0.47719 * ratio**2 + 0.11116 * ratio**3
+        fwhm = total
+    elif kind in ('gaussian', 'lorentzian'):
+        fwhm = np.broadcast_to(fwhm, energies.shape)
+        eta = 1.0 if kind == 'lorentzian' else 0.0
+    else:
+        raise ValueError('Unvailable type of broadening.')
+
+    if (fwhm <= 0).any():
+        raise ValueError('The width of the line shapes must be positive.')
+
+    eta = np.broadcast_to(eta, energies.shape)
+    sigma = fwhm / (2 * np.sqrt(2 * np.log(2)))
+    gamma = fwhm / 2
+
+    shape = x.shape
+    x = x.ravel()
+    result = np.zeros(x.size)
+
+    step = max(1, chunk_size // max(energies.size, 1))
+    for start in range(0, x.size, step):
+        stop = min(start + step, x.size)
+        delta = x[start:stop, np.newaxis] - energies
+
+        profiles = np.zeros(delta.shape)
+        if (eta < 1).any():
+            profiles += (1 - eta) * np.exp(-0.5 * (delta / sigma)**2) / (
+                sigma * np.sqrt(2 * np.pi))
+        if (eta > 0).any():
+            profiles += eta * gamma / np.pi / (delta**2 + gamma**2)
+
+        result[start:stop] = np.dot(profiles, weights)
+
+    return result.reshape(shape)
+
+
+def broadening_kernels(fwhm, kind='gaussian'):
+    """
+    Return the one-dimensional kernels, and their cache keys, needed to
+    broaden an array with the given FWHM (in units of the grid spacing).
+    The kernels are ordered by axis, i.e. the first element of the FWHM
+    corresponds to the last kernel.
+    """
+    fwhm = np.array(fwhm)
+
+    kernels = list()
+    keys = list()
+    if kind == 'gaussian':
+        for value in fwhm.flat:
+            sigma = value / (2 * np.sqrt(2 * np.log(2)))
+            kernels.append(gaussian_kernel1d(sigma))
+            keys.append(gaussian_kernel1d.key(sigma))
+    elif kind == 'lorentzian':
+        for value in fwhm.flat:
+            kernels.append(lorentzian_kernel1d(value / 2))
+            keys.append(lorentzian_kernel1d.key(value / 2))
+    elif kind == 'voigt':
+        for gaussian, lorentzian in fwhm.reshape(-1, 2):
+            sigma = gaussian / (2 * np.sqrt(2 * np.log(2)))
+            kernels.append(voigt_kernel1d(sigma, lorentzian / 2))
+            keys.append(voigt_kernel1d.key(sigma, lorentzian / 2))
+    else:
+        raise ValueError('Unvailable type of broadening.')
+
+    kernels.reverse()
+    keys.reverse()
+
+    return kernels, keys
+
+
+def _skip_broadening(fwhm, kind):
+    if kind == 'voigt':
+        return (fwhm < 0).any() or not fwhm.any()
+    return (fwhm <= 0).any()
+
+
+class RealTransform(object):
+    """
+    Forward real-input FFT of an array, kept in memory so that the array
+    can be convolved with different kernels at the cost of a kernel
+    transform, a multiplication and an inverse FFT.
+
+    The transform is padded with enough room for kernels twice as large as
+    the largest one used so far; it is recomputed only when a kernel does
+    not fit.
+
+    By default the array is transformed along all its axes. For a stack of
+    spectra, only the energy axis is transformed, e.g. axes=(-1, ).
+    """
+
+    def __init__(self, array, dtype=None, axes=None):
+        self.array = np.asarray(array)
+        self.dtype = _real_dtype(self.array, dtype)
+        if axes is None:
+            axes = range(self.array.ndim)
+        self.axes = tuple(sorted(axis % self.array.ndim for axis in axes))
+        self.shape = None
+        self.data = None
+
+    def _update(self, kernel_sizes):
+        sizes = [self.array.shape[axis] for axis in self.axes]
+        required = [a + k - 1 for a, k in zip(sizes, kernel_sizes)]
+        if self.shape is not None and all(
+                s >= r for s, r in zip(self.shape, required)):
+            return
+
+        self.shape = tuple(
+            next_fast_len(a + 2 * k) for a, k in zip(sizes, kernel_sizes))
+        array = np.asarray(self.array, dtype=self.dtype)
+        self.data = np.fft.rfftn(array, self.shape, self.axes)
+
+    def convolve(self, kernels, keys=None):
+        """
+        Convolve the array with a separable kernel, given as a list of
+        one-dimensional kernels, one for each transformed axis.
+        """
+        if len(kernels) != len(self.axes):
+            raise ValueError('The number of kernels must match the number of '
+                             'transformed axes.')
+
+        if keys is None:
+            keys = [None] * len(kernels)
+
+        kernels = [np.asarray(kernel, dtype=self.dtype) for kernel in kernels]
+        self._update([kernel.size for kernel in kernels])
+
+        # The transform of the separable kernel is the outer product of the
+        # transforms along each axis. The last axis uses the real-input FFT.
+        result = self.data
+        last = self.axes[-1]
+        for axis, n, kernel, key in zip(self.axes, self.shape, kernels, keys):
+            if axis == last:
+                kernel_fft = kernel_rfft(kernel, (n, ), key)
+            elif key is None:
+                kernel_fft = np.fft.fft(kernel, n)
+            else:
+                kernel_fft = kernel_cache.get(
+                    key + ('fft', (n, ), kernel.dtype.str),
+                    lambda: np.fft.fft(kernel, n))
+            shape = [1] * self.array.ndim
+            shape[axis] = kernel_fft.size
+            result = result * kernel_fft.reshape(shape)
+
+        result = np.fft.irfftn(result, self.shape, self.axes)
+
+        slices = [slice(None)] * self.array.ndim
+        for axis, kernel in zip(self.axes, kernels):
+            start = kernel.size // 2
+            slices[axis] = slice(start, start + self.array.shape[axis])
+
+        return np.asarray(result[tuple(slices)], dtype=self.dtype)
+
+    def broaden(self, fwhm=None, kind='gaussian'):
+        """Same as broaden(), but using the stored transform."""
+        if fwhm is None:
+            return
+
+        fwhm = np.array(fwhm)
+        if _skip_broadening(fwhm, kind):
+            return self.array
+
+        kernels, keys = broadening_kernels(fwhm, kind)
+        return self.convolve(kernels, keys)
+
+
+def broaden(array, fwhm=None, kind='gaussian', dtype=None, separable=False,
+            method='auto', axis=-1):
+    """
+    Broaden an array with a kernel of a given full width at half maximum.
+
+    The FWHM is expressed in units of the grid spacing. Real arrays are
+    convolved using the real-input FFT (see convolve_rfft); the dtype
+    argument selects the floating point precision of the calculation.
+    Complex arrays are convolved using the complex FFT.
+
+    For two-dimensional arrays the first element of the FWHM corresponds to
+    the last axis of the array. If separable is True, the array is
+    convolved successively along each axis with one-dimensional kernels
+    instead of a single two-dimensional kernel.
+
+    The kind of the broadening can be 'gaussian', 'lorentzian' or 'voigt'.
+    For a Voigt profile, the FWHM is given as a (Gaussian, Lorentzian) pair
+    for each dimension. The Lorentzian and Voigt kernels are always applied
+    separably.
+
+    The method argument selects the convolution method used for
+    one-dimensional kernels: 'direct', 'fft', 'overlap-add' or 'auto'. In
+    the latter case the method is chosen by choose_method.
+
+    If a single FWHM is given for a multi-dimensional array, the array is
+    treated as a stack of spectra, which are all broadened along the given
+    axis using a single vectorized FFT.
+    """
+    if fwhm is None:
+        return
+
+    fwhm = np.array(fwhm)
+    if _skip_broadening(fwhm, kind):
+        return array
+
+    try:
+        kernels, keys = broadening_kernels(fwhm, kind)
+    except ValueError as e:
+        print(e)
+        return array
+
+    if len(kernels) == 1 and np.ndim(array) > 1:
+        kernel, key = kernels[0], keys[0]
+        if np.iscomplexobj(array):
+            return (convolve_rfft_axis(array.real, kernel, axis, dtype, key) +
+                    1j * convolve_rfft_axis(
+                        array.imag, kernel, axis, dtype, key))
+        return convolve_rfft_axis(array, kernel, axis, dtype, key)
+    elif len(kernels) == 1:
+        kernel, key = kernels[0], keys[0]
+    elif np.iscomplexobj(array):
+        kernel, key = np.outer(kernels[0], kernels[1]), None
+    elif separable or kind != 'gaussian':
+        return convolve_separable(array, kernels, dtype, keys)
+    else:
+        sigma = fwhm / (2 * np.sqrt(2 * np.log(2)))
+        kernel = gaussian_kernel2d(sigma)
+        key = gaussian_kernel2d.key(sigma)
+
+    if np.iscomplexobj(array):
+        return convolve_fft(array, kernel)
+
+    return convolve(array, kernel, method, dtype, key)
@@ -0,0 +1,299 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2016-2019 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+from __future__ import absolute_import, division, unicode_literals
+
+__authors__ = ['Marius Retegan']
+__license__ = 'MIT'
+__date__ = '14/01/2019'
+
+
+import numpy as np
+import unittest
+
+from ..broaden import (
+    KernelCache, RealTransform, broaden, broaden_variable, choose_method,
+    convolve, convolve_fft, convolve_rfft, convolve_rfft_axis,
+    energy_dependent_fwhm, evaluate_sticks, gaussian_kernel1d,
+    gaussian_kernel2d, kernel_cache, lorentzian_difference,
+    lorentzian_kernel1d, next_fast_len)
+
+
+class TestBroaden(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(42)
+        self.spectrum1d = random.rand(1001)
+        self.spectrum2d = random.rand(201, 301)
+
+    def testNextFastLen(self):
+        for size in (1, 7, 11, 97, 1000, 1025, 4097):
+            length = next_fast_len(size)
+            self.assertGreaterEqual(length, size)
+            factor = length
+            for prime in (2, 3, 5):
+                while factor % prime == 0:
+                    factor //= prime
+            self.assertEqual(factor, 1)
+        self.assertEqual(next_fast_len(1025), 1080)
+
+    def testConvolveRfft1D(self):
+        kernel = gaussian_kernel1d(12.3)
+        reference = convolve_fft(self.spectrum1d, kernel)
+        result = convolve_rfft(self.spectrum1d, kernel)
+        self.assertEqual(result.shape, self.spectrum1d.shape)
+        self.assertTrue(np.allclose(result, reference, atol=1e-12))
+
+    def testConvolveRfft2D(self):
+        kernel = gaussian_kernel2d(np.array([4.2, 7.1]))
+        reference = convolve_fft(self.spectrum2d, kernel)
+        result = convolve_rfft(self.spectrum2d, kernel)
+        self.assertEqual(result.shape, self.spectrum2d.shape)
+        self.assertTrue(np.allclose(result, reference, atol=1e-12))
+
+    def testConvolveRfftAxis(self):
+        kernel = gaussian_kernel1d(3.7)
+        result = convolve_rfft_axis(self.spectrum2d, kernel, axis=0)
+        reference = convolve_rfft(self.spectrum2d[:, 17], kernel)
+        self.assertTrue(np.allclose(result[:, 17], reference, atol=1e-12))
+
+    def testSeparable(self):
+        fwhm = [9.5, 14.0]
+        reference = broaden(self.spectrum2d, fwhm)
+        result = broaden(self.spectrum2d, fwhm, separable=True)
+        self.assertEqual(result.shape, self.spectrum2d.shape)
+        self.assertTrue(np.allclose(result, reference, atol=1e-12))
+
+    def testConvolutionMethods(self):
+        array = np.random.RandomState(0).rand(20001)
+        for sigma in (0.8, 10.0, 150.0):
+            kernel = gaussian_kernel1d(sigma)
+            reference = convolve_fft(array, kernel)
+            for method in ('direct', 'fft', 'overlap-add', 'auto'):
+                result = convolve(array, kernel, method)
+                self.assertEqual(result.shape, array.shape)
+                self.assertTrue(np.allclose(result, reference, atol=1e-12))
+
+    def testChooseMethod(self):
+        # Use fixed costs, so that the result doesn't depend on the host.
+        costs = {'direct': 1e-9, 'fft': 5e-9, 'block': 2e-5}
+        self.assertEqual(
+            choose_method((100001, ), (3, ), costs), 'direct')
+        self.assertEqual(
+            choose_method((201, 301), (31, 51), costs), 'fft')
+        self.assertEqual(
+            choose_method((1000001, ), (2001, ), costs), 'overlap-add')
+        self.assertEqual(
+            choose_method((1000001, ), (2001, ), dict(costs, block=1e-2)),
+            'fft')
+
+    def testLorentzianKernel(self):
+        gamma = 4.0
+        kernel = lorentzian_kernel1d(gamma)
+        center = kernel.size // 2
+        self.assertAlmostEqual(kernel.sum(), 1.0)
+        self.assertAlmostEqual(kernel[center + 4] / kernel[center], 0.5)
+
+    def testVoigt(self):
+        # A Voigt profile is a Gaussian broadening of a Lorentzian one. The
+        # results differ only close to the edges of the array.
+        reference = broaden(broaden(self.spectrum1d, 8.0, 'lorentzian'), 6.0)
+        result = broaden(self.spectrum1d, [6.0, 8.0], 'voigt')
+        self.assertTrue(np.allclose(result[50:-50], reference[50:-50]))
+
+        result = broaden(self.spectrum1d, [6.0, 0.0], 'voigt')
+        self.assertTrue(np.allclose(result, broaden(self.spectrum1d, 6.0)))
+
+    def testVariableBroadening(self):
+        reference = broaden(self.spectrum1d, 6.0, 'lorentzian')
+        result = broaden_variable(self.spectrum1d, 6.0, 'lorentzian')
+        self.assertTrue(np.allclose(result, reference, atol=1e-12))
+
+        x = np.linspace(0.0, 10.0, self.spectrum1d.size)
+        fwhm = energy_dependent_fwhm(x, [2.0, 12.0, 3.0])
+        self.assertEqual(fwhm[0], 2.0)
+        self.assertEqual(fwhm[-1], 12.0)
+        result = broaden_variable(self.spectrum1d, fwhm, 'lorentzian')
+        narrow = broaden(self.spectrum1d, 2.0, 'lorentzian')
+        wide = broaden(self.spectrum1d, 12.0, 'lorentzian')
+        self.assertTrue(np.allclose(result[:100], narrow[:100]))
+        self.assertTrue(np.allclose(result[-100:], wide[-100:]))
+
+        # The points with a zero width are unchanged.
+        fwhm = energy_dependent_fwhm(x, [0.0, 12.0, 3.0])
+        result = broaden_variable(self.spectrum1d, fwhm, 'lorentzian')
+        self.assertTrue(np.array_equal(
+            result[:100], self.spectrum1d[:100]))
+
+    def testLorentzianDifference(self):
+        x = np.linspace(0.0, 10.0, 101)
+        self.assertEqual(lorentzian_difference(x, [0.5], [0.2]), [0.3])
+        self.assertTrue(np.allclose(
+            lorentzian_difference(x, [0.4, 0.6], [0.2]), [0.2, 0.4, 5.0]))
+        self.assertTrue(np.allclose(
+            lorentzian_difference(x, [0.6], [0.2, 0.4, 3.0]),
+            [0.4, 0.2, 3.0]))
+        self.assertEqual(lorentzian_difference(x, [0.2, 0.4], [0.2, 0.4]),
+                         [0.0])
+        with self.assertRaises(ValueError):
+            lorentzian_difference(x, [0.1], [0.2])
+        with self.assertRaises(ValueError):
+            lorentzian_difference(x, [0.2, 0.4, 3.0], [0.2, 0.4, 4.0])
+
+    def testStack(self):
+        stack = np.random.RandomState(1).rand(7, 1001)
+        result = broaden(stack, 15.0)
+        self.assertEqual(result.shape, stack.shape)
+        for row, spectrum in zip(result, stack):
+            reference = broaden(spectrum, 15.0)
+            self.assertTrue(np.allclose(row, reference, atol=1e-12))
+
+        transform = RealTransform(stack, axes=(-1, ))
+        self.assertTrue(np.allclose(transform.broaden(15.0), result))
+
+        fwhm = np.linspace(2.0, 10.0, stack.shape[1])
+        result = broaden_variable(stack, fwhm)
+        reference = broaden_variable(stack[3], fwhm)
+        self.assertTrue(np.allclose(result[3], reference, atol=1e-12))
+
+    def testRealTransform(self):
+        transform = RealTransform(self.spectrum1d)
+        for fwhm in (10.0, 20.0, 80.0, 15.0):
+            reference = broaden(self.spectrum1d, fwhm, method='fft')
+            result = transform.broaden(fwhm)
+            self.assertTrue(np.allclose(result, reference, atol=1e-12))
+
+        transform = RealTransform(self.spectrum2d)
+        for fwhm in ([5.0, 8.0], [12.0, 3.0]):
+            reference = broaden(self.spectrum2d, fwhm)
+            result = transform.broaden(fwhm)
+            self.assertTrue(np.allclose(result, reference, atol=1e-12))
+            reference = broaden(self.spectrum2d, fwhm, 'lorentzian')
+            result = transform.broaden(fwhm, 'lorentzian')
+            self.assertTrue(np.allclose(result, reference, atol=1e-12))
+
+    def testKernelCache(self):
+        kernel_cache.clear()
+        kernel = gaussian_kernel1d(7.25)
+        self.assertIs(gaussian_kernel1d(7.25, truncate=6), kernel)
+        self.assertFalse(kernel.flags.writeable)
+
+        for method in ('fft', 'overlap-add'):
+            reference = broaden(self.spectrum1d, 33.0, method=method)
+            info = kernel_cache.info()
+            result = broaden(self.spectrum1d, 33.0, method=method)
+            self.assertTrue(np.array_equal(result, reference))
+            # Both the kernel and its transform are found in the cache.
+            self.assertEqual(kernel_cache.info()['hits'], info['hits'] + 2)
+            self.assertEqual(kernel_cache.info()['misses'], info['misses'])
+
+    def testKernelCacheEviction(self):
+        cache = KernelCache(maxsize=2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: 1)
+        cache.get('c', lambda: 3)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.info(), {
+            'hits': 1, 'misses': 3, 'size': 2, 'maxsize': 2,
+            'nbytes': 0, 'maxbytes': cache.maxbytes})
+
+    def testKernelCacheMemory(self):
+        cache = KernelCache(maxbytes=2000)
+        cache.get('a', lambda: np.zeros(100))
+        cache.get('b', lambda: np.zeros(100))
+        cache.get('a', lambda: np.zeros(100))
+        self.assertEqual(cache.nbytes, 1600)
+        cache.get('c', lambda: np.zeros(100))
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.nbytes, 1600)
+
+        # An array larger than the cache is not kept.
+        value = cache.get('d', lambda: np.zeros(1000))
+        self.assertEqual(value.size, 1000)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.nbytes, 0)
+
+    def testSticks(self):
+        x = np.linspace(-20.0, 20.0, 4001)
+        random = np.random.RandomState(3)
+        energies = random.uniform(-5.0, 5.0, 50)
+        weights = random.rand(50)
+
+        # On a uniform grid, the stick spectrum is equivalent to the
+        # broadening of the weights placed on the grid points.
+        energies = np.round(energies, 2)
+        grid = np.zeros(x.size)
+        np.add.at(grid, np.round((energies - x[0]) / 0.01).astype(int),
+                  weights / 0.01)
+
+        result = evaluate_sticks(x, energies, weights, 0.5, 'gaussian')
+        reference = broaden(grid, 50.0, 'gaussian')
+        self.assertTrue(np.allclose(result, reference, atol=1e-6))
+        self.assertAlmostEqual(np.sum(result) * 0.01, weights.sum())
+
+        # The Lorentzian kernels are truncated, and the pseudo-Voigt profile
+        # is an approximation; the agreement is within a few percent.
+        result = evaluate_sticks(x, energies, weights, 0.4, 'lorentzian')
+        reference = broaden(grid, 40.0, 'lorentzian')
+        delta = np.abs(result - reference).max() / reference.max()
+        self.assertLess(delta, 0.02)
+
+        result = evaluate_sticks(x, energies, weights, (0.5, 0.4), 'voigt')
+        reference = broaden(grid, (50.0, 40.0), 'voigt')
+        delta = np.abs(result - reference).max() / reference.max()
+        self.assertLess(delta, 0.03)
+
+        # Energy-dependent widths and a small memory budget.
+        fwhm = np.where(energies < 0, 0.2, 0.6)
+        result = evaluate_sticks(x, energies, weights, fwhm, 'lorentzian',
+                                 chunk_size=1000)
+        self.assertEqual(result.shape, x.shape)
+
+    def testSinglePrecision(self):
+        reference = broaden(self.spectrum1d, 20.0)
+        result = broaden(self.spectrum1d, 20.0, dtype=np.float32)
+        self.assertEqual(result.dtype, np.float32)
+        self.assertTrue(np.allclose(result, reference, atol=1e-5))
+
+    def testComplexArray(self):
+        array = self.spectrum1d + 1j * self.spectrum1d
+        kernel = gaussian_kernel1d(20.0 / (2 * np.sqrt(2 * np.log(2))))
+        reference = convolve_fft(array, kernel)
+        result = broaden(array, 20.0)
+        self.assertTrue(np.allclose(result, reference))
+
+
+def suite():
+    loader = unittest.defaultTestLoader
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(loader.loadTestsFromTestCase(TestBroaden))
+    return test_suite
+
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='suite')
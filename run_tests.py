@@ -30,11 +30,27 @@ __license__ = 'MIT'
 __date__ = '14/01/2019'
 
 import unittest
+from crispy.modules.quanty.test.test_batch import suite as test_batch_suite
+from crispy.modules.quanty.test.test_cache import suite as test_cache_suite
+from crispy.modules.quanty.test.test_parser import suite as test_parser_suite
+from crispy.modules.quanty.test.test_renderer import suite as test_renderer_suite
+from crispy.modules.quanty.test.test_spectra import suite as test_spectra_suite
+from crispy.modules.quanty.test.test_split import suite as test_split_suite
+from crispy.modules.quanty.test.test_sweep import suite as test_sweep_suite
 from crispy.modules.quanty.test.test_quanty import suite as test_quanty_suite
+from crispy.utils.test.test_broaden import suite as test_broaden_suite
 
 
 def suite():
     test_suite = unittest.TestSuite()
+    test_suite.addTest(test_broaden_suite())
+    test_suite.addTest(test_parser_suite())
+    test_suite.addTest(test_cache_suite())
+    test_suite.addTest(test_batch_suite())
+    test_suite.addTest(test_split_suite())
+    test_suite.addTest(test_spectra_suite())
+    test_suite.addTest(test_sweep_suite())
+    test_suite.addTest(test_renderer_suite())
     test_suite.addTest(test_quanty_suite())
     return test_suite
 